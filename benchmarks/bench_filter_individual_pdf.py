@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader, PdfWriter
+import pdfplumber
+
+from merge_packing_lists import filter_individual_pdf, is_packing_slip_page
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_filter_individual_pdf(input_pdf_path, temp_dir):
+    """
+    The previous implementation: a new PdfReader is built for every kept page
+    """
+    with pdfplumber.open(input_pdf_path) as pdf:
+        pdf_writer = PdfWriter()
+        pages_kept = 0
+
+        for page_num, page in enumerate(pdf.pages):
+            text = page.extract_text(
+                x_tolerance=1,
+                y_tolerance=1,
+                keep_blank_chars=False
+            )
+
+            if is_packing_slip_page(text):
+                pdf_reader = PdfReader(input_pdf_path)
+                pdf_writer.add_page(pdf_reader.pages[page_num])
+                pages_kept += 1
+
+        if pages_kept > 0:
+            filtered_pdf_path = os.path.join(temp_dir, f"filtered_{os.path.basename(input_pdf_path)}")
+            with open(filtered_pdf_path, 'wb') as output_file:
+                pdf_writer.write(output_file)
+            return filtered_pdf_path
+
+    return None
+
+
+def measure(func, pdf_path, repeat):
+    """
+    Return (best wall time over `repeat` runs, peak traced memory).
+    tracemalloc slows the run down a lot, so memory is taken in a separate pass.
+    """
+    best_time = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            start = time.perf_counter()
+            func(pdf_path, temp_dir)
+            elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tracemalloc.start()
+        func(pdf_path, temp_dir)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return best_time, peak_memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filter_individual_pdf against the old implementation")
+    parser.add_argument("pdf", nargs="?", default=os.path.join(REPO_DIR, "Packing list_GUESS_US.pdf"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with pdfplumber.open(args.pdf) as pdf:
+        page_count = len(pdf.pages)
+    print(f"📄 {os.path.basename(args.pdf)}: {page_count} pages, best of {args.repeat}")
+
+    results = {
+        "legacy": measure(legacy_filter_individual_pdf, args.pdf, args.repeat),
+        "single-pass": measure(filter_individual_pdf, args.pdf, args.repeat),
+    }
+
+    for name, (elapsed, peak) in results.items():
+        print(f"   {name:<12} {elapsed:8.3f}s   peak {peak / 1024 / 1024:8.1f} MiB")
+
+    legacy_time, legacy_peak = results["legacy"]
+    new_time, new_peak = results["single-pass"]
+    print(f"   speedup {legacy_time / new_time:.2f}x, peak memory {new_peak / legacy_peak:.2f}x of legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import os
+import sys
+import glob
+import json
+import math
+import time
+import queue
+import shutil
+import argparse
+import resource
+import tempfile
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ("convert", "filter", "classify", "extract", "merge")
+
+# Measurements compared against a baseline; lower is better for all of them.
+# seconds is the median of the timed repeats.
+COMPARED_METRICS = ("seconds", "p95", "peak_rss_mb")
+
+# Untimed runs of a stage before the timed ones, which fill the OS page
+# cache and import everything the stage needs
+DEFAULT_WARMUP = 1
+
+DEFAULT_REPEAT = 5
+
+# Allowed slowdown against a baseline. Back-to-back runs of the same code
+# on a busy machine differ by up to about 20% even in their medians.
+DEFAULT_TOLERANCE = 0.3
+
+
+def fixture_workbooks():
+    paths = glob.glob(os.path.join(REPO_DIR, "IT5*-CA.xls")) + glob.glob(os.path.join(REPO_DIR, "*INV*.xlsm"))
+    # Skip Office lock files such as ~$FFL-COM-INV-...xlsm
+    return sorted(path for path in paths if not os.path.basename(path).startswith("~$"))
+
+
+def fixture_pdfs():
+    return [os.path.join(REPO_DIR, "Packing list_GUESS_US.pdf"),
+            os.path.join(REPO_DIR, "exp_006533(inv-8202).pdf")]
+
+
+def replicate(paths, scale, directory):
+    """
+    Make `scale` copies of every fixture in directory (hard links where the
+    filesystem allows) and return their paths. Copies keep the extension
+    and get a numeric suffix, so every file has a unique name.
+    """
+    copies = []
+    for path in paths:
+        stem, extension = os.path.splitext(os.path.basename(path))
+        for index in range(scale):
+            copy = os.path.join(directory, f"{stem}_{index:04d}{extension}")
+            try:
+                os.link(path, copy)
+            except OSError:
+                shutil.copyfile(path, copy)
+            copies.append(copy)
+    return sorted(copies)
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of values, or None if there are none
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench_convert(scale, work_dir):
+    """
+    run_script_1's conversion: every workbook through SofficeConverter, one
+    at a time (per-file latency) and then as one convert_batch call
+    """
+    from soffice_converter import SofficeConverter
+
+    workbooks = replicate(fixture_workbooks(), scale, os.path.join(work_dir, "in"))
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+
+    with SofficeConverter() as converter:
+        latencies = [timed(converter.convert, path, out_dir, True) for path in workbooks]
+
+    with SofficeConverter() as converter:
+        batch_seconds = timed(converter.convert_batch, workbooks, out_dir, True)
+
+    return len(workbooks), latencies, batch_seconds
+
+
+def bench_filter(scale, work_dir):
+    from merge_packing_lists import filter_individual_pdf
+
+    pdfs = replicate(fixture_pdfs(), scale, os.path.join(work_dir, "in"))
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+
+    start = time.perf_counter()
+    latencies = [timed(filter_individual_pdf, path, out_dir) for path in pdfs]
+    return len(pdfs), latencies, time.perf_counter() - start
+
+
+def bench_classify(scale, work_dir):
+    """
+    is_packing_slip_page on the text of every fixture page; the text is
+    extracted beforehand so only the classification is timed
+    """
+    import pdfplumber
+    from merge_packing_lists import is_packing_slip_page
+
+    texts = []
+    for path in fixture_pdfs():
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                texts.append(page.extract_text(x_tolerance=1, y_tolerance=1, keep_blank_chars=False))
+                page.close()
+    texts = texts * scale
+
+    start = time.perf_counter()
+    latencies = [timed(is_packing_slip_page, text) for text in texts]
+    return len(texts), latencies, time.perf_counter() - start
+
+
+def bench_extract(scale, work_dir):
+    """
+    extract_and_print_xls_data over the whole folder (per batch) and the
+    same extraction file by file (per-file latency)
+    """
+    from extract_packing_lists import extract_and_print_xls_data
+    from packing_list_all_processes import _extract_packing_slip_records
+
+    in_dir = os.path.join(work_dir, "in")
+    workbooks = replicate(fixture_workbooks(), scale, in_dir)
+
+    latencies = [timed(_extract_packing_slip_records, path) for path in workbooks]
+    batch_seconds = timed(extract_and_print_xls_data, in_dir, os.path.join(work_dir, "records.ndjson"))
+    return len(workbooks), latencies, batch_seconds
+
+
+def bench_merge(scale, work_dir):
+    """
+    CombinedPdf building combined_packing_slips.pdf from filtered PDFs; the
+    filtering is done beforehand so only the merge is timed
+    """
+    from combined_pdf import CombinedPdf
+    from merge_packing_lists import filter_individual_pdf
+    from result_cache import file_digest
+
+    filtered_dir = os.path.join(work_dir, "filtered")
+    os.makedirs(filtered_dir)
+    filtered = [filter_individual_pdf(path, filtered_dir) for path in fixture_pdfs()]
+    filtered = replicate([path for path in filtered if path], scale, os.path.join(work_dir, "in"))
+    digests = {path: file_digest(path) for path in filtered}
+
+    combined = CombinedPdf(os.path.join(work_dir, "combined_packing_slips.pdf"))
+    start = time.perf_counter()
+    for path in filtered:
+        combined.replace(os.path.basename(path), digests[path], path)
+    combined.save()
+    return len(filtered), [], time.perf_counter() - start
+
+
+BENCHMARKS = {
+    "convert": bench_convert,
+    "filter": bench_filter,
+    "classify": bench_classify,
+    "extract": bench_extract,
+    "merge": bench_merge,
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; soffice children count too
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def _run_in_child(stage, scale, warmup, repeat, results):
+    from logging_setup import configure_logging
+
+    # Status lines would be timed along with the work
+    configure_logging(quiet=True)
+    runs = []
+    for _ in range(warmup + repeat):
+        with tempfile.TemporaryDirectory(prefix=f"bench_{stage}_") as work_dir:
+            os.makedirs(os.path.join(work_dir, "in"))
+            runs.append(BENCHMARKS[stage](scale, work_dir))
+    results.put((runs[warmup:], _peak_rss_mb()))
+
+
+def run_stage(stage, scale, warmup=DEFAULT_WARMUP, repeat=DEFAULT_REPEAT):
+    """
+    Run one stage at one scale in a fresh interpreter, so peak RSS belongs
+    to that stage alone: `warmup` untimed runs, then `repeat` timed ones.
+    A single run is too noisy to compare against a baseline, so the result
+    holds the median (and minimum) time of the repeats and the median of
+    their latency percentiles.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_in_child, args=(stage, scale, warmup, max(1, repeat), results))
+    process.start()
+    try:
+        while True:
+            try:
+                runs, peak_rss_mb = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"{stage} x{scale} benchmark failed (exit code {process.exitcode})")
+    finally:
+        process.join()
+
+    items = runs[0][0]
+
+    def median_percentile(fraction):
+        values = [percentile(run_latencies, fraction) for _, run_latencies, _ in runs if run_latencies]
+        return statistics.median(values) if values else None
+
+    seconds = statistics.median(run_seconds for _, _, run_seconds in runs)
+    return {
+        "stage": stage,
+        "scale": scale,
+        "items": items,
+        "repeat": len(runs),
+        "seconds": round(seconds, 6),
+        "min_seconds": round(min(run_seconds for _, _, run_seconds in runs), 6),
+        "throughput": round(items / seconds, 3) if seconds else None,
+        "p50": median_percentile(0.50),
+        "p95": median_percentile(0.95),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+def _ms(value):
+    return "       -" if value is None else f"{value * 1000:8.2f}"
+
+
+def print_result(result):
+    print(f"   {result['stage']:<9} x{result['scale']:<5} {result['items']:7d} items "
+          f"{result['seconds']:9.3f}s (min {result['min_seconds']:.3f}s) {result['throughput'] or 0:10.1f}/s "
+          f"p50 {_ms(result['p50'])}ms p95 {_ms(result['p95'])}ms "
+          f"peak {result['peak_rss_mb']:7.1f} MiB")
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Regressions (one line each) of results against a saved run: a metric
+    more than `tolerance` (a fraction) above the baseline value
+    """
+    previous = {(entry["stage"], entry["scale"]): entry for entry in baseline["results"]}
+    regressions = []
+
+    for result in results:
+        old = previous.get((result["stage"], result["scale"]))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if result[metric] is None or not old.get(metric):
+                continue
+            ratio = result[metric] / old[metric]
+            if ratio > 1 + tolerance:
+                regressions.append(f"{result['stage']} x{result['scale']} {metric}: "
+                                   f"{old[metric]} -> {result[metric]} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage over replicated fixtures")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10],
+                        help="Replicate the fixtures this many times, e.g. 10 100 1000")
+    parser.add_argument("--save", metavar="PATH", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="Untimed runs of each stage before the timed ones")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Timed runs of each stage; the median is reported and compared")
+    args = parser.parse_args()
+
+    if "convert" in args.stages and shutil.which("soffice") is None:
+        print("⚠️ soffice not found, skipping the convert stage")
+        args.stages = [stage for stage in args.stages if stage != "convert"]
+
+    print(f"📄 {len(fixture_workbooks())} workbooks, {len(fixture_pdfs())} PDFs, scales {args.scales}, "
+          f"{args.warmup} warm-up and {args.repeat} timed run(s) per stage")
+
+    results = []
+    for scale in args.scales:
+        for stage in args.stages:
+            result = run_stage(stage, scale, args.warmup, args.repeat)
+            print_result(result)
+            results.append(result)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"💾 Saved results to: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"✅ No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
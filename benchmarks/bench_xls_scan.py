@@ -0,0 +1,153 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xlrd
+
+from extract_packing_lists import scan_packing_slip_blocks
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_scan(sheet):
+    """
+    The previous row loop: Cell objects for every row, every row kept in
+    all_rows, and str(row_values) rebuilt for each header check
+    """
+    po_number = None
+    all_rows = []
+    colors_list = []
+    cartons_list = []
+    pieces_list = []
+    total_gross_weight_list = []
+    cartons_col_index = None
+    pieces_col_index = None
+    total_gross_weight_col_index = None
+
+    for row_idx in range(sheet.nrows):
+        row_values = [cell.value for cell in sheet.row(row_idx)]
+        all_rows.append(row_values)
+
+        if (len(row_values) > 2 and
+            'PO' in str(row_values) and
+            'STYLE' in str(row_values) and
+            'COLOR' in str(row_values)):
+            if row_idx + 1 < sheet.nrows:
+                next_row = [cell.value for cell in sheet.row(row_idx + 1)]
+                po_col_index = None
+                for i, cell_value in enumerate(row_values):
+                    if str(cell_value).strip() == 'PO':
+                        po_col_index = i
+                        break
+                if po_col_index is not None and po_col_index < len(next_row):
+                    po_candidate = next_row[po_col_index]
+                    if po_candidate and str(po_candidate).strip():
+                        po_number = str(po_candidate).strip()
+
+        if ('# CARTONS' in str(row_values) and
+            'TOTAL PIECES' in str(row_values) and
+            'TOTAL G.W(kg)' in str(row_values)):
+            for i, cell_value in enumerate(row_values):
+                cell_str = str(cell_value).strip()
+                if cell_str == '# CARTONS':
+                    cartons_col_index = i
+                elif cell_str == 'TOTAL PIECES':
+                    pieces_col_index = i
+                elif cell_str == 'TOTAL G.W(kg)':
+                    total_gross_weight_col_index = i
+
+        if (len(row_values) > 2 and
+            str(row_values[0]).strip() == 'SUB TOTAL' and
+            row_values[2] and str(row_values[2]).strip()):
+            colors_list.append(str(row_values[2]).strip())
+            if cartons_col_index is not None and row_values[cartons_col_index]:
+                cartons_list.append(int(float(row_values[cartons_col_index])))
+            if pieces_col_index is not None and row_values[pieces_col_index]:
+                pieces_list.append(int(float(row_values[pieces_col_index])))
+            if total_gross_weight_col_index is not None and row_values[total_gross_weight_col_index]:
+                total_gross_weight_list.append(f"{float(row_values[total_gross_weight_col_index]):.3f}")
+
+    for row in all_rows:
+        print(row)
+
+    return {
+        'po_number': po_number,
+        'colors': colors_list,
+        'cartons': cartons_list,
+        'pieces': pieces_list,
+        'total_gross_weight': total_gross_weight_list,
+    }
+
+
+def streaming_scan(sheet):
+    rows = (sheet.row_values(row_idx) for row_idx in range(sheet.nrows))
+    return scan_packing_slip_blocks(rows)
+
+
+def packing_slip_sheets(paths):
+    sheets = []
+    for path in paths:
+        workbook = xlrd.open_workbook(path)
+        for sheet in workbook.sheets():
+            if any('PACKING SLIP' in [str(v).strip() for v in sheet.row_values(r)]
+                   for r in range(min(5, sheet.nrows))):
+                sheets.append(sheet)
+                break
+    return sheets
+
+
+def measure(scan, sheets, repeat):
+    # Console output is part of both loops; send it nowhere so the terminal
+    # does not dominate the numbers
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for sheet in sheets:
+                scan(sheet)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        for sheet in sheets:
+            scan(sheet)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark the packing slip row scan")
+    parser.add_argument("files", nargs="*",
+                        default=sorted(glob.glob(os.path.join(REPO_DIR, "IT5*-CA.xls"))))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    sheets = packing_slip_sheets(args.files)
+    rows = sum(sheet.nrows for sheet in sheets)
+    print(f"📄 {len(sheets)} packing slip sheets, {rows} rows, {args.repeat} repetitions")
+
+    for sheet in sheets:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            expected = legacy_scan(sheet)
+            # The scanner returns gross weights as numbers, not "%.3f" strings
+            expected['total_gross_weight'] = [float(w) for w in expected['total_gross_weight']]
+            # Each fixture sheet holds a single PO block
+            assert [expected] == streaming_scan(sheet), sheet.name
+
+    legacy_time, legacy_peak = measure(legacy_scan, sheets, args.repeat)
+    new_time, new_peak = measure(streaming_scan, sheets, args.repeat)
+
+    scanned = rows * args.repeat
+    print(f"   legacy     {legacy_time:7.3f}s  {scanned / legacy_time:10.0f} rows/s   peak {legacy_peak / 1024:7.1f} KiB")
+    print(f"   streaming  {new_time:7.3f}s  {scanned / new_time:10.0f} rows/s   peak {new_peak / 1024:7.1f} KiB")
+    print(f"   speedup {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import json
+import logging
+
+import run_report
+from result_cache import EXTRACTOR_VERSION, file_digest
+
+log = logging.getLogger(__name__)
+
+
+def manifest_path_for(output_pdf):
+    return f"{os.path.splitext(output_pdf)[0]}.manifest.json"
+
+
+class CombinedPdf:
+    """
+    combined_packing_slips.pdf plus a manifest recording which workbook
+    (by name and content hash) contributed which page range.
+
+    Workbooks whose hash still matches the manifest keep their pages: they
+    are copied straight out of the existing combined PDF, so only new,
+    replaced or removed workbooks have to be converted and filtered again.
+    PyPDF2 cannot write PDF incremental updates, so `save` still writes a
+    new file, but it does so by page copy and skips the write entirely when
+    nothing changed.
+    """
+
+    def __init__(self, output_pdf, mode="full"):
+        self.output_pdf = output_pdf
+        self.manifest_path = manifest_path_for(output_pdf)
+        self.mode = mode
+        self.segments = self._load_manifest()  # filename -> {"digest", "start", "pages"}
+        self.updates = {}                      # filename -> (digest, filtered PDF path or None)
+        self.removed = set()
+
+    def _load_manifest(self):
+        """
+        Old segments, or {} if the manifest is missing, from another version
+        or mode, or no longer describes the PDF on disk
+        """
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get("version") != EXTRACTOR_VERSION or manifest.get("mode") != self.mode:
+            return {}
+
+        has_pages = any(segment["pages"] for segment in manifest["segments"])
+        if has_pages:
+            if not os.path.exists(self.output_pdf) or file_digest(self.output_pdf) != manifest.get("pdf_digest"):
+                log.warning("⚠️ Combined PDF was changed outside the pipeline, rebuilding it")
+                return {}
+
+        return {segment["file"]: segment for segment in manifest["segments"]}
+
+    def is_current(self, filename, digest):
+        """
+        True if the combined PDF already holds this exact workbook
+        """
+        segment = self.segments.get(filename)
+        return segment is not None and segment["digest"] == digest
+
+    def replace(self, filename, digest, filtered_pdf):
+        """
+        Use filtered_pdf (None for no packing slip pages) as this workbook's segment
+        """
+        self.updates[filename] = (digest, filtered_pdf)
+        self.removed.discard(filename)
+
+    def remove(self, filename):
+        self.updates.pop(filename, None)
+        self.removed.add(filename)
+
+    def retain_only(self, filenames):
+        """
+        Drop the segments of every workbook not in filenames
+        """
+        keep = set(filenames)
+        for filename in list(self.segments) + list(self.updates):
+            if filename not in keep:
+                self.remove(filename)
+
+    def save(self):
+        """
+        Write the combined PDF and manifest, in filename order.
+        Returns (workbooks with packing slip pages, whether anything was written).
+        """
+        from PyPDF2 import PdfReader
+
+        changed = bool(self.updates) or bool(self.removed & set(self.segments))
+        order = sorted((set(self.segments) | set(self.updates)) - self.removed)
+
+        if not changed and os.path.exists(self.manifest_path):
+            return sum(1 for filename in order if self.segments[filename]["pages"]), False
+
+        # (filename, digest, pages, reader of the new filtered PDF or start
+        # page in the old combined PDF)
+        plan = []
+        for filename in order:
+            if filename in self.updates:
+                digest, filtered_pdf = self.updates[filename]
+                reader = PdfReader(filtered_pdf) if filtered_pdf else None
+                plan.append((filename, digest, len(reader.pages) if reader else 0, reader))
+            else:
+                segment = self.segments[filename]
+                plan.append((filename, segment["digest"], segment["pages"], segment["start"]))
+
+        contributing = sum(1 for _, _, pages, _ in plan if pages)
+        if contributing:
+            self._write(plan)
+        elif os.path.exists(self.output_pdf):
+            os.remove(self.output_pdf)
+
+        segments = []
+        start = 0
+        for filename, digest, pages, _ in plan:
+            segments.append({"file": filename, "digest": digest, "start": start, "pages": pages})
+            start += pages
+
+        manifest = {
+            "version": EXTRACTOR_VERSION,
+            "mode": self.mode,
+            "pdf_digest": file_digest(self.output_pdf) if contributing else None,
+            "segments": segments,
+        }
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        self.segments = {segment["file"]: segment for segment in segments}
+        self.updates, self.removed = {}, set()
+        return contributing, True
+
+    def _write(self, plan):
+        from PyPDF2 import PdfReader, PdfWriter
+
+        # Pages of unchanged workbooks are read from the current file, so
+        # write next to it and swap once done
+        temp_pdf = f"{self.output_pdf}.tmp"
+        old_pdf = None
+        if any(pages and isinstance(source, int) for _, _, pages, source in plan):
+            old_pdf = open(self.output_pdf, "rb")
+
+        try:
+            old_reader = PdfReader(old_pdf) if old_pdf else None
+            writer = PdfWriter()
+            for _, _, pages, source in plan:
+                if isinstance(source, int):
+                    # Unchanged workbook: copy its page range as is
+                    for page_num in range(source, source + pages):
+                        writer.add_page(old_reader.pages[page_num])
+                elif source is not None:
+                    for page in source.pages:
+                        writer.add_page(page)
+
+            with run_report.step("pdf_merge_write"), open(temp_pdf, "wb") as output_file:
+                writer.write(output_file)
+        finally:
+            if old_pdf:
+                old_pdf.close()
+
+        os.replace(temp_pdf, self.output_pdf)
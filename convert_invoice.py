@@ -1,28 +1,45 @@
 import os
+import logging
+import argparse
 import subprocess
 
-# Path to the source Excel file
-excel_path = "/home/pritom/Desktop/Packing List Extraction/Demo"
-output_dir = excel_path  # Output PDF will be saved in the same directory
-
-# Loop through all Excel files in the directory
-for filename in os.listdir(excel_path):
-    if filename.lower().endswith((".xls", ".xlsx", ".xlsm")):
-        if "INV" in filename.upper():
-            full_input_path = os.path.join(excel_path, filename)
-
-            try:
-                # Run LibreOffice in headless mode to convert to PDF
-                subprocess.run([
-                    "soffice", 
-                    "--headless", 
-                    "--convert-to", "pdf", 
-                    "--outdir", output_dir, 
-                    full_input_path
-                ], check=True)
-
-                print(f"✅ Converted: {filename}")
-            except subprocess.CalledProcessError as e:
-                print(f"❌ Failed to convert {filename}: {e}")
-        else:
-            print(f"⚠️ Skipped (not an invoice): {filename}")
\ No newline at end of file
+from logging_setup import add_logging_arguments, configure_logging_from_args
+from soffice_converter import SofficeConverter, add_conversion_arguments, converter_options_from_args
+
+log = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert every invoice workbook in a folder to PDF")
+    # Path to the source Excel file
+    parser.add_argument("excel_path", nargs="?",
+                        default="/home/pritom/Desktop/Packing List Extraction/Demo",
+                        help="Folder containing the Excel workbooks")
+    add_conversion_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    excel_path = args.excel_path
+    output_dir = excel_path  # Output PDF will be saved in the same directory
+
+    # Loop through all Excel files in the directory
+    with SofficeConverter(**converter_options_from_args(args)) as converter:
+        for filename in os.listdir(excel_path):
+            if filename.lower().endswith((".xls", ".xlsx", ".xlsm")):
+                if "INV" in filename.upper():
+                    full_input_path = os.path.join(excel_path, filename)
+
+                    try:
+                        # Convert through the persistent LibreOffice instance
+                        converter.convert(full_input_path, output_dir)
+
+                        log.info(f"✅ Converted: {filename}")
+                    except subprocess.CalledProcessError as e:
+                        log.error(f"❌ Failed to convert {filename}: {e}")
+                else:
+                    log.info(f"⚠️ Skipped (not an invoice): {filename}")
+
+        converter.print_latency_report()
+
+if __name__ == "__main__":
+    main()
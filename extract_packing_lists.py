@@ -1,222 +1,337 @@
-import xlrd # type: ignore
 import os
-import pandas as pd # type: ignore
+import json
+import argparse
+import itertools
+import logging
 
-def extract_and_print_xls_data(directory):
-    # List all .xls files in the directory
-    xls_files = [f for f in os.listdir(directory) if f.lower().endswith('.xls')]
+from logging_setup import add_logging_arguments, configure_logging_from_args
+import run_report
+from output_writers import OUTPUT_FORMATS, open_output_writer
+from packing_records import PackingListRecord, RecordAccumulator
+from workbook_reader import open_workbook
 
-    if not xls_files:
-        print("No .xls files found in the directory.")
-        return
+log = logging.getLogger(__name__)
 
-    # Create a list to store all DataFrames
-    all_dfs = []
+# Header cells that mark the PO row and the carton/pieces/weight columns
+PO_HEADER_CELLS = {'PO', 'STYLE', 'COLOR'}
+TOTALS_HEADER_CELLS = {'# CARTONS', 'TOTAL PIECES', 'TOTAL G.W(kg)'}
 
-    for filename in xls_files:
-        file_path = os.path.join(directory, filename)
-        print(f"\n==== Reading file: {filename} ====")
+def format_po_number(po_number):
+    """
+    Format PO number: if starts with "IT" or "OT" and doesn't have "-" right after
+    """
+    if (po_number.startswith(('IT', 'OT')) and 
+        not (len(po_number) > 2 and po_number[2] == '-')):
+        
+        # Remove everything after existing "-" if present
+        if '-' in po_number:
+            po_number = po_number.split('-')[0]
+        
+        # Insert "-" after 2 characters
+        if len(po_number) > 2:
+            po_number = po_number[:2] + "-" + po_number[2:]
+    
+    return po_number
 
-        try:
-            workbook = xlrd.open_workbook(file_path)
+def _new_block():
+    return {
+        'po_number': None,
+        'colors': [],  # List to store colors list from SUB TOTAL rows
+        'cartons': [],  # List to store cartons from SUB TOTAL rows
+        'pieces': [],  # List to store pieces from SUB TOTAL rows
+        'total_gross_weight': [],  # List to store total gross weight from SUB TOTAL rows
+    }
 
-            # Flag to track if we've found a packing slip in this file
-            packing_slip_found = False
-            
-            for sheet in workbook.sheets():
-                print(f"\n-- Sheet: {sheet.name} --")
-                
-                # Skip if we already found a packing slip in this file
-                if packing_slip_found:
-                    print("Skipping sheet - already found a packing slip in this file")
-                    continue
-                
-                # Check if this sheet has 'PACKING SLIP' as the first non-empty cell
-                has_packing_slip = False
-                for row_idx in range(min(5, sheet.nrows)):  # Check first 5 rows
-                    row_values = [str(cell.value).strip() for cell in sheet.row(row_idx)]
-                    if 'PACKING SLIP' in row_values:
-                        has_packing_slip = True
-                        break
-                
-                if not has_packing_slip:
-                    print("Skipping sheet - 'PACKING SLIP' not found in header")
-                    continue
-                
-                # Mark that we found a packing slip in this file
-                packing_slip_found = True
-                
-                # Extract PO number using the specific pattern from your example
-                po_number = None
-                all_rows = []
-                colors_list = []  # List to store colors list from SUB TOTAL rows
-                cartons_list = []  # List to store cartons from SUB TOTAL rows
-                pieces_list = []  # List to store pieces from SUB TOTAL rows
-                total_gross_weight_list = []  # List to store total gross weight from SUB TOTAL rows
-                
-                # Find column indices for cartons, pieces, and total gross weight
-                cartons_col_index = None
-                pieces_col_index = None
-                total_gross_weight_col_index = None
-                
-                for row_idx in range(sheet.nrows):
-                    row_values = [cell.value for cell in sheet.row(row_idx)]
-                    all_rows.append(row_values)
-                    
-                    # Look for the specific header row pattern
-                    if (len(row_values) > 2 and 
-                        'PO' in str(row_values) and 
-                        'STYLE' in str(row_values) and 
-                        'COLOR' in str(row_values)):
-                        
-                        # Check next row for the actual data
-                        if row_idx + 1 < sheet.nrows:
-                            next_row = [cell.value for cell in sheet.row(row_idx + 1)]
-                            
-                            # Find PO column index
-                            po_col_index = None
-                            for i, cell_value in enumerate(row_values):
-                                if str(cell_value).strip() == 'PO':
-                                    po_col_index = i
-                                    break
-                            
-                            # Extract PO number from next row
-                            if po_col_index is not None and po_col_index < len(next_row):
-                                po_candidate = next_row[po_col_index]
-                                if po_candidate and str(po_candidate).strip():
-                                    po_number = str(po_candidate).strip()
-                                    print(f"*** FOUND PO NUMBER: {po_number} ***")
-                    
-                    # Find column indices for cartons, pieces, and total gross weight
-                    if ('# CARTONS' in str(row_values) and 
-                        'TOTAL PIECES' in str(row_values) and 
-                        'TOTAL G.W(kg)' in str(row_values)):
-                        
-                        for i, cell_value in enumerate(row_values):
-                            cell_str = str(cell_value).strip()
-                            if cell_str == '# CARTONS':
-                                cartons_col_index = i
-                            elif cell_str == 'TOTAL PIECES':
-                                pieces_col_index = i
-                            elif cell_str == 'TOTAL G.W(kg)':
-                                total_gross_weight_col_index = i
-                        
-                        print(f"*** FOUND COLUMN INDICES - Cartons: {cartons_col_index}, Pieces: {pieces_col_index}, Total GW: {total_gross_weight_col_index} ***")
-                    
-                    # Extract data from rows starting with 'SUB TOTAL'
-                    if (len(row_values) > 2 and 
-                        str(row_values[0]).strip() == 'SUB TOTAL' and 
-                        row_values[2] and str(row_values[2]).strip()):
-                        
-                        color = str(row_values[2]).strip()
-                        colors_list.append(color)
-                        print(f"*** FOUND COLOR: {color} ***")
-                        
-                        # Extract cartons
-                        if cartons_col_index is not None and cartons_col_index < len(row_values):
-                            cartons_value = row_values[cartons_col_index]
-                            if cartons_value and str(cartons_value).strip():
-                                # Convert to integer
-                                cartons_int = int(float(cartons_value))
-                                cartons_list.append(cartons_int)
-                                print(f"*** FOUND CARTONS: {cartons_int} ***")
-                        
-                        # Extract pieces
-                        if pieces_col_index is not None and pieces_col_index < len(row_values):
-                            pieces_value = row_values[pieces_col_index]
-                            if pieces_value and str(pieces_value).strip():
-                                # Convert to integer
-                                pieces_int = int(float(pieces_value))
-                                pieces_list.append(pieces_int)
-                                print(f"*** FOUND PIECES: {pieces_int} ***")
-                        
-                        # Extract total gross weight
-                        if total_gross_weight_col_index is not None and total_gross_weight_col_index < len(row_values):
-                            total_gross_weight_value = row_values[total_gross_weight_col_index]
-                            if total_gross_weight_value and str(total_gross_weight_value).strip():
-                                # Format to 3 decimal places
-                                formatted_weight = f"{float(total_gross_weight_value):.3f}"
-                                total_gross_weight_list.append(formatted_weight)
-                                print(f"*** FOUND TOTAL GROSS WEIGHT: {formatted_weight} ***")
-                
-                # Print all rows
-                for row in all_rows:
-                    print(row)
-                
-                if po_number:
-                    print(f"\n*** EXTRACTED PO NUMBER: {po_number} ***")
-                else:
-                    print("\n*** PO NUMBER NOT FOUND ***")
-                
-                # Print extracted colors_list
-                if colors_list:
-                    colors_str = ', '.join(colors_list)
-                    print(f"*** EXTRACTED COLORS: [{colors_str}] ***")
-                else:
-                    print("*** NO COLORS FOUND ***")
+def _totals_columns(cells):
+    """
+    (cartons, pieces, total gross weight) column indices of a totals header row
+    """
+    cartons_col_index = pieces_col_index = total_gross_weight_col_index = None
+    for i, cell_str in enumerate(cells):
+        if cell_str == '# CARTONS':
+            cartons_col_index = i
+        elif cell_str == 'TOTAL PIECES':
+            pieces_col_index = i
+        elif cell_str == 'TOTAL G.W(kg)':
+            total_gross_weight_col_index = i
+    return cartons_col_index, pieces_col_index, total_gross_weight_col_index
+
+def scan_packing_slip_blocks(rows, format_po=False, layout_cache=None):
+    """
+    Single forward pass over the rows of a packing slip sheet, returning one
+    dict per PO block.
+
+    rows is any iterable of row value lists (e.g. WorkbookReader.iter_rows);
+    rows are not kept after they are scanned. Every PO/STYLE/COLOR header
+    starts a new block, and the SUB TOTAL rows that follow belong to it, so
+    consolidated sheets with several POs give several blocks. Header rows are
+    recognised by set membership on their stripped cell strings.
+
+    layout_cache maps a totals header row to its column indices; pass the
+    same dict for every sheet of a workbook so repeated block layouts are
+    parsed once. The indices stay in force until the next totals header.
+
+    Cartons and pieces come back as ints and gross weights as floats
+    rounded to 3 decimals.
+    """
+    if layout_cache is None:
+        layout_cache = {}
+
+    blocks = []
+    block = None
+    
+    # Column indices for PO, cartons, pieces, and total gross weight
+    po_col_index = None
+    cartons_col_index = None
+    pieces_col_index = None
+    total_gross_weight_col_index = None
+    
+    # Set when the previous row was the PO/STYLE/COLOR header
+    po_row_pending = False
+    
+    # Checked once: the per-row dump is only built when DEBUG is on
+    debug = log.isEnabledFor(logging.DEBUG)
+    
+    for row_values in rows:
+        if debug:
+            log.debug("%s", row_values)
+        
+        # The PO value sits in the row right below its header
+        if po_row_pending:
+            po_row_pending = False
+            if po_col_index is not None and po_col_index < len(row_values):
+                po_candidate = row_values[po_col_index]
+                if po_candidate and str(po_candidate).strip():
+                    po_number = str(po_candidate).strip()
+                    log.debug("*** FOUND PO NUMBER: %s ***", po_number)
+                    if format_po:
+                        po_number = format_po_number(po_number)
+                        log.debug("*** FORMATTED PO NUMBER: %s ***", po_number)
+                    block['po_number'] = po_number
+        
+        first_cell = str(row_values[0]).strip() if row_values else ''
+        
+        # Extract data from rows starting with 'SUB TOTAL'
+        if first_cell == 'SUB TOTAL':
+            if len(row_values) > 2 and row_values[2] and str(row_values[2]).strip():
+                if block is None:
+                    # SUB TOTAL rows ahead of any PO header
+                    block = _new_block()
+                    blocks.append(block)
+
+                color = str(row_values[2]).strip()
+                block['colors'].append(color)
+                log.debug("*** FOUND COLOR: %s ***", color)
                 
-                # Print extracted cartons
-                if cartons_list:
-                    cartons_str = ', '.join([str(c) for c in cartons_list])
-                    print(f"*** EXTRACTED CARTONS: [{cartons_str}] ***")
-                else:
-                    print("*** NO CARTONS FOUND ***")
+                # Extract cartons
+                if cartons_col_index is not None and cartons_col_index < len(row_values):
+                    cartons_value = row_values[cartons_col_index]
+                    if cartons_value and str(cartons_value).strip():
+                        # Convert to integer
+                        cartons_int = int(float(cartons_value))
+                        block['cartons'].append(cartons_int)
+                        log.debug("*** FOUND CARTONS: %s ***", cartons_int)
                 
-                # Print extracted pieces
-                if pieces_list:
-                    pieces_str = ', '.join([str(p) for p in pieces_list])
-                    print(f"*** EXTRACTED PIECES: [{pieces_str}] ***")
-                else:
-                    print("*** NO PIECES FOUND ***")
+                # Extract pieces
+                if pieces_col_index is not None and pieces_col_index < len(row_values):
+                    pieces_value = row_values[pieces_col_index]
+                    if pieces_value and str(pieces_value).strip():
+                        # Convert to integer
+                        pieces_int = int(float(pieces_value))
+                        block['pieces'].append(pieces_int)
+                        log.debug("*** FOUND PIECES: %s ***", pieces_int)
                 
-                # Print extracted total gross weight
-                if total_gross_weight_list:
-                    total_gross_weight_str = ', '.join(total_gross_weight_list)
-                    print(f"*** EXTRACTED TOTAL GROSS WEIGHT: [{total_gross_weight_str}] ***")
-                else:
-                    print("*** NO TOTAL GROSS WEIGHT FOUND ***")
-
-                # Create DataFrame for this packing list sheet (ONE ROW PER FILE)
-                if po_number:  # Only create DataFrame if we found a PO number
-                    df_data = {
-                        'PO_Number': [po_number],
-                        'Colors': [colors_list],
-                        'Cartons': [cartons_list],
-                        'Pieces': [pieces_list],
-                        'Total_Gross_Weight': [total_gross_weight_list]
-                    }
-                    
-                    df = pd.DataFrame(df_data)
-                    all_dfs.append(df)
-                    print(f"\n*** CREATED DATAFRAME FOR {filename} - {sheet.name} ***")
-                    print(df)
-
-        except Exception as e:
-            print(f"Error reading '{filename}': {e}")
-
-    # Combine all DataFrames into one master DataFrame
-    if all_dfs:
-        master_df = pd.concat(all_dfs, ignore_index=True)
-        print(f"\n{'='*50}")
-        print("MASTER DATAFRAME SUMMARY:")
-        print(f"{'='*50}")
-        print(f"Total files processed: {len(xls_files)}")
-        print(f"Total packing lists found: {len(all_dfs)}")
-        print(f"Master DataFrame shape: {master_df.shape}")
-        print(f"\nMaster DataFrame:")
-        print(master_df)
-
-        # Export to JSON and print
-        json_output = master_df.to_json(orient='records', indent=2)
-        print(json_output)
+                # Extract total gross weight
+                if total_gross_weight_col_index is not None and total_gross_weight_col_index < len(row_values):
+                    total_gross_weight_value = row_values[total_gross_weight_col_index]
+                    if total_gross_weight_value and str(total_gross_weight_value).strip():
+                        # Round to 3 decimal places, kept as a number
+                        total_gross_weight = round(float(total_gross_weight_value), 3)
+                        block['total_gross_weight'].append(total_gross_weight)
+                        log.debug("*** FOUND TOTAL GROSS WEIGHT: %.3f ***", total_gross_weight)
+            continue
+        
+        cells = [str(value).strip() for value in row_values]
+        cell_set = set(cells)
         
-        # # Save to CSV
-        # output_csv = os.path.join(directory, "packing_lists_summary.csv")
-        # master_df.to_csv(output_csv, index=False)
-        # print(f"\n*** Master DataFrame saved to: {output_csv} ***")
+        # Each PO/STYLE/COLOR header opens a new PO block
+        if len(row_values) > 2 and PO_HEADER_CELLS <= cell_set:
+            block = _new_block()
+            blocks.append(block)
+            po_col_index = cells.index('PO')
+            po_row_pending = True
+        
+        # Find column indices for cartons, pieces, and total gross weight
+        if TOTALS_HEADER_CELLS <= cell_set:
+            layout = tuple(cells)
+            if layout not in layout_cache:
+                layout_cache[layout] = _totals_columns(cells)
+            cartons_col_index, pieces_col_index, total_gross_weight_col_index = layout_cache[layout]
+            
+            log.debug("*** FOUND COLUMN INDICES - Cartons: %s, Pieces: %s, Total GW: %s ***",
+                      cartons_col_index, pieces_col_index, total_gross_weight_col_index)
+    
+    return blocks
+
+def log_packing_slip_block(block):
+    """
+    Status lines for one extracted PO block
+    """
+    if block['po_number']:
+        log.info(f"\n*** EXTRACTED PO NUMBER: {block['po_number']} ***")
+    else:
+        log.info("\n*** PO NUMBER NOT FOUND ***")
+
+    # Print extracted colors_list
+    if block['colors']:
+        colors_str = ', '.join(block['colors'])
+        log.info(f"*** EXTRACTED COLORS: [{colors_str}] ***")
     else:
-        print("\n*** No packing list data found to create DataFrame ***")
+        log.info("*** NO COLORS FOUND ***")
+
+    # Print extracted cartons
+    if block['cartons']:
+        cartons_str = ', '.join([str(c) for c in block['cartons']])
+        log.info(f"*** EXTRACTED CARTONS: [{cartons_str}] ***")
+    else:
+        log.info("*** NO CARTONS FOUND ***")
+
+    # Print extracted pieces
+    if block['pieces']:
+        pieces_str = ', '.join([str(p) for p in block['pieces']])
+        log.info(f"*** EXTRACTED PIECES: [{pieces_str}] ***")
+    else:
+        log.info("*** NO PIECES FOUND ***")
+
+    # Print extracted total gross weight
+    if block['total_gross_weight']:
+        total_gross_weight_str = ', '.join(f"{weight:.3f}" for weight in block['total_gross_weight'])
+        log.info(f"*** EXTRACTED TOTAL GROSS WEIGHT: [{total_gross_weight_str}] ***")
+    else:
+        log.info("*** NO TOTAL GROSS WEIGHT FOUND ***")
+
+def workbook_packing_slip_records(workbook, filename, format_po=False):
+    """
+    Yield a PackingListRecord for every PO block on every packing slip sheet
+    of an open WorkbookReader. Each sheet is read once; sheets without
+    'PACKING SLIP' in their first 5 rows are skipped after those rows.
+    """
+    layout_cache = {}
+
+    for sheet_idx, sheet_name in enumerate(workbook.sheet_names):
+        log.info(f"\n-- Sheet: {sheet_name} --")
+        rows = workbook.iter_rows(sheet_idx)
+
+        # Check if this sheet has 'PACKING SLIP' as the first non-empty cell
+        head = list(itertools.islice(rows, 5))  # Check first 5 rows
+        has_packing_slip = False
+        for row_values in head:
+            if 'PACKING SLIP' in [str(value).strip() for value in row_values]:
+                has_packing_slip = True
+                break
+
+        if not has_packing_slip:
+            log.info("Skipping sheet - 'PACKING SLIP' not found in header")
+            workbook.release_sheet(sheet_idx)
+            continue
+
+        # Walk the sheet once, carrying on from the rows already read
+        with run_report.step("row_scan"):
+            blocks = scan_packing_slip_blocks(itertools.chain(head, rows), format_po, layout_cache)
+        workbook.release_sheet(sheet_idx)
+
+        if not blocks:
+            log.info("\n*** PO NUMBER NOT FOUND ***")
+
+        for block in blocks:
+            log_packing_slip_block(block)
+
+            # One record per PO block; blocks without a PO number are dropped
+            if block['po_number']:
+                record = PackingListRecord(block['po_number'], block['colors'], block['cartons'],
+                                           block['pieces'], block['total_gross_weight'], filename, sheet_name)
+                log.info(f"\n*** CREATED RECORD FOR {filename} - {sheet_name} - {record.po_number} ***")
+                log.debug("%s", record)
+                yield record
+
+def extract_and_print_xls_data(directory, output_path=None, output_format=None):
+    """
+    Extract every packing slip in directory and print the master DataFrame.
+    With output_path the records are also written there as json, ndjson,
+    csv or parquet (see output_writers); otherwise the JSON goes to stdout.
+    """
+    # List all .xls files in the directory
+    xls_files = [f for f in os.listdir(directory) if f.lower().endswith((".xls", ".xlsx", ".xlsm"))]
+
+    if not xls_files:
+        log.info("No .xls files found in the directory.")
+        return
+
+    # Create a list to store all packing list records
+    all_records = []
+
+    writer = open_output_writer(output_path, output_format) if output_path else None
+
+    try:
+        for filename in xls_files:
+            file_path = os.path.join(directory, filename)
+            log.info(f"\n==== Reading file: {filename} ====")
+
+            try:
+                # Load sheets lazily so only the ones we look at are parsed
+                workbook = open_workbook(file_path)
+
+                try:
+                    for record in workbook_packing_slip_records(workbook, filename):
+                        all_records.append(record)
+                        if writer:
+                            writer.write_records([record])
+                finally:
+                    workbook.close()
+
+            except Exception as e:
+                log.error(f"Error reading '{filename}': {e}")
+    finally:
+        if writer:
+            writer.close()
+
+    if writer:
+        log.info(f"\n💾 Wrote {len(all_records)} packing list(s) to: {output_path}")
+
+    # Build the master DataFrame (one row per color) in a single pass
+    if all_records:
+        accumulator = RecordAccumulator()
+        accumulator.extend(all_records)
+        master_df = accumulator.to_dataframe()
+        log.info(f"\n{'='*50}")
+        log.info("MASTER DATAFRAME SUMMARY:")
+        log.info(f"{'='*50}")
+        log.info(f"Total files processed: {len(xls_files)}")
+        log.info(f"Total packing lists found: {len(all_records)}")
+        log.info(f"Master DataFrame shape: {master_df.shape}")
+        log.debug("\nMaster DataFrame:")
+        log.debug("%s", master_df)
+
+        # Export to JSON and print, unless it went to a file
+        if not output_path:
+            json_output = json.dumps([record.to_dict() for record in all_records], indent=2)
+            print(json_output)
+    else:
+        log.info("\n*** No packing list data found to create DataFrame ***")
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the packing slips of every workbook in a folder")
+    parser.add_argument("directory_path", nargs="?",
+                        default="/media/pritom/Products/New/Packing List Extraction/Demo",
+                        help="Folder containing the Excel workbooks")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the packing lists to this file instead of stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format (default: from the --output extension)")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+    extract_and_print_xls_data(args.directory_path, args.output, args.format)
 
 if __name__ == "__main__":
-    directory_path = "/media/pritom/Products/New/Packing List Extraction/Demo"
-    extract_and_print_xls_data(directory_path)
\ No newline at end of file
+    main()
@@ -0,0 +1,292 @@
+import os
+import re
+import logging
+import argparse
+
+from logging_setup import add_logging_arguments, configure_logging_from_args
+import run_report
+from extract_packing_lists import (PO_HEADER_CELLS, TOTALS_HEADER_CELLS, log_packing_slip_block,
+                                   scan_packing_slip_blocks)
+from output_writers import OUTPUT_FORMATS, open_output_writer
+from packing_records import PackingListRecord, RecordAccumulator
+
+log = logging.getLogger(__name__)
+
+# Pages per pool task: enough that opening the PDF again in the worker
+# is cheap next to laying the pages out
+DEFAULT_PAGES_PER_TASK = 8
+
+# A number printed with thousands separators, e.g. 1,132 or 1,132.50
+THOUSANDS_PATTERN = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+
+
+# A cell rule splits a word only when it falls between two of its
+# characters, give or take this many points
+RULE_GAP_TOLERANCE = 0.5
+
+
+def _split_at_rules(word, rules):
+    """
+    (x centre, y centre, text) pieces of a pdfplumber word (with its chars),
+    cut wherever a cell rule passes between two of its characters.
+
+    Text of two cells drawn edge to edge (a PO number against its style)
+    comes out of extract_words as one word; it is split here. A header
+    whose last letter runs over the rule ('CARTONS') has a character
+    straddling it and stays whole.
+    """
+    pieces = [[word["chars"][0]]]
+    for previous, char in zip(word["chars"], word["chars"][1:]):
+        if any(previous["x1"] - RULE_GAP_TOLERANCE <= rule <= char["x0"] + RULE_GAP_TOLERANCE
+               and previous["x0"] < rule < char["x1"] for rule in rules):
+            pieces.append([])
+        pieces[-1].append(char)
+
+    y = (word["top"] + word["bottom"]) / 2
+    return [((chars[0]["x0"] + chars[-1]["x1"]) / 2, y, "".join(char["text"] for char in chars))
+            for chars in pieces]
+
+
+def _cell_text(words, bbox):
+    x0, top, x1, bottom = bbox
+    text = " ".join(text for x, y, text in words if x0 <= x < x1 and top <= y < bottom)
+    if THOUSANDS_PATTERN.fullmatch(text):
+        text = text.replace(",", "")
+    return text
+
+
+def _join_stacked_headers(rows):
+    """
+    Header cells printed over two rows, like TOTAL above G.W(kg), become
+    one cell ('TOTAL G.W(kg)') where that gives a totals header the row
+    scanner knows
+    """
+    for previous, row in zip(rows, rows[1:]):
+        for index, cell in enumerate(row):
+            if cell and index < len(previous) and previous[index]:
+                joined = f"{previous[index]} {cell}"
+                if joined in TOTALS_HEADER_CELLS:
+                    row[index] = joined
+    return rows
+
+
+# Rows of a page and of its overflow page match when their tops are this
+# close (in points)
+ROW_ALIGNMENT = 2.0
+
+
+def page_table_rows(page):
+    """
+    The rows of every ruled table on a page as (top, cells), cells being
+    strings ('' for empty cells) like worksheet row values.
+
+    Words are placed in cells by their centre, after being split at the
+    cell rules that pass between their characters (see _split_at_rules).
+    pdfplumber's own extract_tables places single characters, which splits
+    headers running past their cell border ('COLOR T' / 'OTAL CARTONS').
+    """
+    words = page.extract_words(x_tolerance=1.5, y_tolerance=2, return_chars=True)
+
+    rows = []
+    for table in page.find_tables():
+        for row in table.rows:
+            _, top, _, bottom = row.bbox
+            rules = {x for bbox in row.cells if bbox is not None for x in (bbox[0], bbox[2])}
+            row_words = [piece for word in words if top <= (word["top"] + word["bottom"]) / 2 < bottom
+                         for piece in _split_at_rules(word, rules)]
+            rows.append((top, ['' if bbox is None else _cell_text(row_words, bbox) for bbox in row.cells]))
+    return rows
+
+
+def _page_range_rows(path, start, stop):
+    """
+    [(page number, table rows)] for pages start..stop-1 (0-based) of a PDF
+    """
+    import pdfplumber
+
+    pages = []
+    with pdfplumber.open(path, pages=range(start + 1, stop + 1)) as pdf:
+        for page in pdf.pages:
+            with run_report.step("pdf_tables"):
+                pages.append((page.page_number, page_table_rows(page)))
+            page.close()
+    return pages
+
+
+def _page_range_task(task):
+    """
+    Pool task: the rows of one page range and the run report steps spent on it
+    """
+    run_report.reset_worker_report()
+    pages = _page_range_rows(*task)
+    return pages, run_report.take_worker_report()
+
+
+def iter_pdf_table_rows(path, workers=1, pages_per_task=DEFAULT_PAGES_PER_TASK):
+    """
+    Yield (page number, table rows) for every page of a PDF, in page order.
+    With workers > 1 the pages are split into ranges of pages_per_task and
+    laid out by a process pool of that size.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        page_count = len(pdf.pages)
+
+    pages_per_task = max(1, pages_per_task)
+    tasks = [(path, start, min(start + pages_per_task, page_count))
+             for start in range(0, page_count, pages_per_task)]
+
+    if workers <= 1 or len(tasks) <= 1:
+        yield from _page_range_rows(path, 0, page_count)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=run_report.init_worker,
+                             initargs=(run_report.worker_config(),)) as pool:
+        for pages, worker_report in pool.map(_page_range_task, tasks):
+            run_report.merge_worker_report(worker_report)
+            yield from pages
+
+
+def _is_po_header(row):
+    return len(row) > 2 and PO_HEADER_CELLS <= set(row)
+
+
+def _stitch_overflow(rows, overflow_rows):
+    """
+    Append the cells of an overflow page (the columns of a wide sheet that
+    did not fit across the page before it) to the rows they continue,
+    matched by their top. Returns how many rows matched; when none do, the
+    rows are left untouched.
+    """
+    continuations = [next((overflow_cells for overflow_top, overflow_cells in overflow_rows
+                           if abs(overflow_top - top) <= ROW_ALIGNMENT), None)
+                     for top, _ in rows]
+    matched = sum(continuation is not None for continuation in continuations)
+    if not matched:
+        return 0
+
+    width = max(len(cells) for _, cells in overflow_rows)
+    for (_, cells), continuation in zip(rows, continuations):
+        continuation = continuation or []
+        cells.extend(continuation + [''] * (width - len(continuation)))
+    return matched
+
+
+def pdf_packing_slip_records(path, workers=1, pages_per_task=DEFAULT_PAGES_PER_TASK, format_po=False):
+    """
+    A PackingListRecord for every PO block in the packing slip tables of a
+    PDF, in the xls extractor's schema; the sheet is the page holding the
+    block's PO header ('Page 3').
+
+    Like sheets, pages without 'PACKING SLIP' in their first 5 rows are
+    skipped, unless they carry on the SUB TOTAL rows of the page before or
+    hold the columns of a sheet too wide for it (stitched back onto it).
+    The kept rows are scanned in one pass in page order, so a block split
+    over two pages stays whole.
+    """
+    filename = os.path.basename(path)
+    pages = []
+    in_packing_slip = False
+
+    for page_number, rows in iter_pdf_table_rows(path, workers, pages_per_task):
+        cells = [row for _, row in rows]
+        if any('PACKING SLIP' in row for row in cells[:5]):
+            in_packing_slip = True
+        elif in_packing_slip and any(row and row[0] == 'SUB TOTAL' for row in cells):
+            pass
+        elif (in_packing_slip and not any(_is_po_header(row) for row in cells)
+              and _stitch_overflow(pages[-1][1], rows)):
+            continue
+        else:
+            in_packing_slip = False
+            continue
+        pages.append((page_number, rows))
+
+    kept_rows = []
+    block_pages = []
+    for page_number, rows in pages:
+        cells = _join_stacked_headers([row for _, row in rows])
+        if not kept_rows:
+            # SUB TOTAL rows ahead of any PO header get a block of their own
+            block_pages.append(page_number)
+        block_pages.extend(page_number for row in cells if _is_po_header(row))
+        kept_rows.extend(cells)
+
+    with run_report.step("row_scan"):
+        blocks = scan_packing_slip_blocks(kept_rows, format_po)
+    if len(blocks) < len(block_pages):
+        # No header-less leading block after all
+        block_pages = block_pages[1:]
+
+    if not blocks:
+        log.info(f"\n*** NO PACKING SLIP TABLE FOUND IN {filename} ***")
+
+    records = []
+    for block, page_number in zip(blocks, block_pages):
+        log_packing_slip_block(block)
+        if block['po_number']:
+            sheet = f"Page {page_number}"
+            record = PackingListRecord(block['po_number'], block['colors'], block['cartons'],
+                                       block['pieces'], block['total_gross_weight'], filename, sheet)
+            log.info(f"\n*** CREATED RECORD FOR {filename} - {sheet} - {record.po_number} ***")
+            log.debug("%s", record)
+            records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract packing lists from the tables of PDF packing lists")
+    parser.add_argument("paths", nargs="+", metavar="PDF",
+                        help="PDF packing lists, or folders of them")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Lay out page ranges in parallel with N worker processes")
+    parser.add_argument("--pages-per-task", metavar="N", type=int, default=DEFAULT_PAGES_PER_TASK,
+                        help="Pages handed to a worker at a time")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the packing lists to this file instead of stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format (default: from the --output extension)")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    pdf_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            pdf_paths.extend(sorted(os.path.join(path, filename) for filename in os.listdir(path)
+                                    if filename.lower().endswith(".pdf")))
+        else:
+            pdf_paths.append(path)
+
+    all_records = []
+    writer = open_output_writer(args.output, args.format) if args.output else None
+    try:
+        for pdf_path in pdf_paths:
+            log.info(f"\n==== Reading file: {os.path.basename(pdf_path)} ====")
+            records = pdf_packing_slip_records(pdf_path, args.workers, args.pages_per_task, format_po=True)
+            all_records.extend(records)
+            if writer:
+                writer.write_records(records)
+    finally:
+        if writer:
+            writer.close()
+
+    if writer:
+        log.info(f"\n💾 Wrote {len(all_records)} packing list(s) to: {args.output}")
+    elif all_records:
+        import json
+
+        print(json.dumps([record.to_dict() for record in all_records], indent=2))
+
+    if all_records:
+        accumulator = RecordAccumulator()
+        accumulator.extend(all_records)
+        log.info(f"Total packing lists found: {len(all_records)}")
+        log.info(f"Master DataFrame shape: {accumulator.to_dataframe().shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import signal
+import asyncio
+import logging
+import argparse
+import tempfile
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from logging_setup import add_logging_arguments, configure_logging_from_args
+from job_planner import EXCEL_EXTENSIONS, IMAGE_EXTENSIONS
+import packing_list_all_processes as pipeline
+import run_report
+from result_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from sheet_renderer import RENDERERS
+from soffice_converter import add_conversion_arguments, converter_options_from_args
+
+log = logging.getLogger(__name__)
+
+UPLOAD_EXTENSIONS = EXCEL_EXTENSIONS + (".pdf",) + IMAGE_EXTENSIONS
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_UPLOAD_MB = 64
+
+# Finished jobs kept for polling; the oldest are dropped beyond this
+DEFAULT_KEEP_JOBS = 200
+
+# Longest ?wait= a client may block on a job's result, in seconds
+MAX_WAIT = 300
+
+STATUS_TEXT = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+# Queued and running jobs, then finished ones
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _init_service_worker(sheet_renderer, converter_options, report_config):
+    """
+    Pool worker start-up: the pipeline's own worker set-up, plus the heavy
+    imports done once here rather than in the first job each worker runs
+    """
+    pipeline._init_worker(sheet_renderer, converter_options, report_config)
+
+    import pandas  # noqa: F401
+    import pdfplumber  # noqa: F401
+    import extract_packing_lists  # noqa: F401
+    import merge_packing_lists  # noqa: F401
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def run_job(path, job_dir, sheet_only=False, header_only=False, cache_config=None):
+    """
+    Pool task for one uploaded file: its packing list records, the PDF of
+    its packing slip pages (workbooks and PDFs only) and a run report of
+    the work. Workbooks are converted and filtered like script 2 does,
+    with the same result cache.
+    """
+    report = run_report.start_report()
+    error = None
+    # Each job is a run of its own for the quarantine list
+    pipeline._start_run()
+
+    with run_report.stage("extract"):
+        records = pipeline.extract_packing_slip_file(path, cache_config)
+
+    filtered_pdf = None
+    with run_report.stage("filter"):
+        lower = path.lower()
+        if lower.endswith(EXCEL_EXTENSIONS):
+            filtered_pdf, _ = pipeline.convert_and_filter_file(path, job_dir, sheet_only, header_only,
+                                                               cache_config=cache_config)
+            if filtered_pdf is False:
+                error = "Conversion to PDF failed"
+                filtered_pdf = None
+        elif lower.endswith(".pdf"):
+            from merge_packing_lists import filter_individual_pdf
+
+            filtered_pdf = filter_individual_pdf(path, job_dir, header_only)
+
+    return {
+        "records": [record.to_dict() for record in records],
+        "pdf": filtered_pdf,
+        "error": error,
+        "report": report.to_dict(),
+    }
+
+
+class Job:
+    """
+    One uploaded file on its way through the queue
+    """
+
+    def __init__(self, job_id, filename, path):
+        self.id = job_id
+        self.filename = filename
+        self.path = path
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.records = None
+        self.pdf = None
+        self.error = None
+        self.report = None
+        self.done = asyncio.Event()
+
+    @property
+    def directory(self):
+        return os.path.dirname(self.path)
+
+    def summary(self):
+        summary = {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.status in (DONE, FAILED):
+            summary["records"] = self.records
+            summary["has_pdf"] = self.pdf is not None
+            summary["error"] = self.error
+        return summary
+
+    def timings(self):
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "queued_seconds": round((self.started or now) - self.submitted, 6),
+            "run_seconds": None if self.started is None else round((self.finished or now) - self.started, 6),
+            "report": self.report,
+        }
+
+
+class ExtractionService:
+    """
+    Local HTTP front end to the extraction pipeline.
+
+    Uploads land in a bounded in-process queue; once it holds queue_size
+    jobs further uploads are turned away with 503 and Retry-After until
+    it drains. `workers` consumer tasks feed the queue to a process pool
+    of the same size whose workers are started (and have pandas and
+    pdfplumber imported) once, not per upload.
+    """
+
+    def __init__(self, work_dir, workers=1, queue_size=None, max_upload_bytes=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024,
+                 keep_jobs=DEFAULT_KEEP_JOBS, sheet_only=False, header_only=False, cache_config=None,
+                 sheet_renderer="soffice", converter_options=None):
+        self.work_dir = work_dir
+        self.workers = max(1, workers)
+        self.queue_size = queue_size or 4 * self.workers
+        self.max_upload_bytes = max_upload_bytes
+        self.keep_jobs = keep_jobs
+        self.sheet_only = sheet_only or sheet_renderer == "native"
+        self.header_only = header_only
+        self.cache_config = cache_config
+        self.sheet_renderer = sheet_renderer
+        self.converter_options = converter_options or {}
+
+        self.jobs = OrderedDict()
+        self.running = 0
+        self.queue = None
+        self.pool = None
+
+    # Job handling
+
+    def submit(self, filename, data):
+        """
+        Queue an upload; returns its Job, or None if the queue is full
+        """
+        if self.queue.full():
+            return None
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.work_dir, job_id)
+        os.makedirs(job_dir)
+        path = os.path.join(job_dir, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        job = Job(job_id, filename, path)
+        self.jobs[job_id] = job
+        self.queue.put_nowait(job)
+        log.info(f"📥 Queued {filename} as job {job_id} ({self.queue.qsize()} waiting)")
+        return job
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = RUNNING
+            job.started = time.time()
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(self.pool, run_job, job.path, job.directory, self.sheet_only,
+                                                    self.header_only, self.cache_config)
+                job.records = result["records"]
+                job.pdf = result["pdf"]
+                job.error = result["error"]
+                job.report = result["report"]
+                job.status = FAILED if job.error else DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                self.running -= 1
+                job.finished = time.time()
+                job.done.set()
+                self.queue.task_done()
+
+            if job.status == DONE:
+                log.info(f"✅ Job {job.id} ({job.filename}): {len(job.records)} packing list(s) "
+                         f"in {job.finished - job.started:.2f}s")
+            else:
+                log.error(f"❌ Job {job.id} ({job.filename}) failed: {job.error}")
+            self._forget_old_jobs()
+
+    def _forget_old_jobs(self):
+        finished = [job for job in self.jobs.values() if job.done.is_set()]
+        for job in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    # HTTP
+
+    async def route(self, method, path, query, headers, body):
+        """
+        (status, content type, body) for one request; body is bytes, or a
+        file path to stream
+        """
+        parts = [part for part in path.split("/") if part]
+
+        if parts == ["health"] and method == "GET":
+            return self._json(200, {"status": "ok", "workers": self.workers, "running": self.running,
+                                    "queued": self.queue.qsize(), "queue_size": self.queue_size,
+                                    "jobs": len(self.jobs)})
+
+        if parts == ["jobs"]:
+            if method == "GET":
+                return self._json(200, [job.summary() for job in self.jobs.values()])
+            if method == "POST":
+                return self._upload(query, headers, body)
+            return self._json(405, {"error": "Use GET or POST"})
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return self._json(404, {"error": f"No job {parts[1]}"})
+            if method != "GET":
+                return self._json(405, {"error": "Use GET"})
+            action = parts[2] if len(parts) == 3 else None
+            if action is None:
+                return self._json(200, job.summary())
+            if action == "result":
+                return await self._result(job, query)
+            if action == "pdf":
+                return self._pdf(job)
+            if action == "timings":
+                return self._json(200, job.timings())
+
+        return self._json(404, {"error": f"No route for {method} {path}"})
+
+    def _upload(self, query, headers, body):
+        filename = os.path.basename(query.get("filename", [""])[0] or headers.get("x-filename", ""))
+        if not filename.lower().endswith(UPLOAD_EXTENSIONS):
+            return self._json(400, {"error": f"Pass ?filename= ending in one of {', '.join(UPLOAD_EXTENSIONS)}"})
+        if not body:
+            return self._json(400, {"error": "Empty upload"})
+
+        job = self.submit(filename, body)
+        if job is None:
+            return self._json(503, {"error": "Queue full, retry shortly"}, {"Retry-After": "1"})
+        return self._json(202, job.summary(), {"Location": f"/jobs/{job.id}"})
+
+    async def _result(self, job, query):
+        """
+        The job's records once it is finished; with ?wait=SECONDS, hold the
+        request open until then (long polling) instead of answering 202
+        """
+        try:
+            wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT)
+        except ValueError:
+            return self._json(400, {"error": "wait must be a number of seconds"})
+        if wait > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+        if not job.done.is_set():
+            return self._json(202, job.summary())
+        status = 200 if job.status == DONE else 500
+        return self._json(status, {"job_id": job.id, "status": job.status, "error": job.error,
+                                   "records": job.records, "pdf": f"/jobs/{job.id}/pdf" if job.pdf else None})
+
+    def _pdf(self, job):
+        if not job.done.is_set():
+            return self._json(409, {"error": f"Job {job.id} is {job.status}"})
+        if job.pdf is None or not os.path.exists(job.pdf):
+            return self._json(404, {"error": "No packing slip pages"})
+        return 200, "application/pdf", job.pdf, {
+            "Content-Disposition": f'attachment; filename="{os.path.basename(job.pdf)}"'
+        }
+
+    @staticmethod
+    def _json(status, value, headers=None):
+        return status, "application/json", json.dumps(value, indent=2).encode("utf-8"), headers or {}
+
+    async def handle(self, reader, writer):
+        """
+        Serve one HTTP/1.1 request per connection
+        """
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", "0") or 0)
+            if length > self.max_upload_bytes:
+                response = self._json(413, {"error": f"Uploads are limited to {self.max_upload_bytes} bytes"})
+            else:
+                body = await reader.readexactly(length) if length else b""
+                url = urllib.parse.urlsplit(target)
+                response = await self.route(method.upper(), url.path, urllib.parse.parse_qs(url.query),
+                                            headers, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            response = self._json(400, {"error": "Malformed request"})
+        except Exception as e:
+            log.error(f"❌ Error handling request: {e}")
+            response = self._json(500, {"error": str(e)})
+
+        try:
+            await self._respond(writer, *response)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, body, headers):
+        size = os.path.getsize(body) if isinstance(body, str) else len(body)
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {size}",
+                "Connection: close"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+        if isinstance(body, str):
+            # Stream the file rather than reading it into memory
+            with open(body, "rb") as f:
+                for chunk in iter(lambda: f.read(64 * 1024), b""):
+                    writer.write(chunk)
+                    await writer.drain()
+        else:
+            writer.write(body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_service_worker,
+                                        initargs=(self.sheet_renderer, self.converter_options,
+                                                  run_report.worker_config()))
+        loop = asyncio.get_running_loop()
+        consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        try:
+            # Start every worker now so the first uploads don't wait for it
+            await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+
+            server = await asyncio.start_server(self.handle, host, port)
+            log.info(f"🚀 Extraction service on http://{host}:{port} "
+                     f"({self.workers} worker(s), queue of {self.queue_size})")
+            # Stop on SIGTERM as on Ctrl+C, so the work folder is cleaned up
+            stopping = asyncio.Event()
+            loop.add_signal_handler(signal.SIGTERM, stopping.set)
+            async with server:
+                await stopping.wait()
+            log.info("\n👋 Extraction service stopped")
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP service extracting packing lists from uploads")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Jobs run at a time, each in its own worker process")
+    parser.add_argument("--queue-size", type=int,
+                        help="Jobs waiting before uploads are turned away (default: 4 per worker)")
+    parser.add_argument("--max-upload", metavar="MB", type=int, default=DEFAULT_MAX_UPLOAD_MB,
+                        help="Largest upload accepted")
+    parser.add_argument("--keep-jobs", type=int, default=DEFAULT_KEEP_JOBS,
+                        help="Finished jobs kept for polling")
+    parser.add_argument("--work-dir", metavar="DIR",
+                        help="Where uploads and filtered PDFs are kept (default: a temporary folder)")
+    parser.add_argument("--sheet-only", action="store_true",
+                        help="Render only the PACKING SLIP sheets instead of whole workbooks")
+    parser.add_argument("--header-only", action="store_true",
+                        help="Classify pages from the text in their header band only")
+    parser.add_argument("--renderer", choices=RENDERERS, default="soffice",
+                        help="Render packing slip sheets with LibreOffice or natively in-process "
+                             "(native implies --sheet-only)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Reprocess every upload instead of reusing cached results")
+    parser.add_argument("--cache", metavar="PATH", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file holding cached PDFs and extracted records")
+    parser.add_argument("--cache-size", metavar="MB", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Evict least recently used cache entries beyond this size")
+    add_conversion_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    cache_config = None if args.no_cache else (args.cache, args.cache_size * 1024 * 1024)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="packing-list-service-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    service = ExtractionService(work_dir, args.workers, args.queue_size, args.max_upload * 1024 * 1024,
+                                args.keep_jobs, args.sheet_only, args.header_only, cache_config,
+                                args.renderer, converter_options_from_args(args))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        log.info("\n👋 Extraction service stopped")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import logging
+
+import run_report
+from result_cache import file_digest
+
+log = logging.getLogger(__name__)
+
+EXCEL_EXTENSIONS = (".xls", ".xlsx", ".xlsm")
+
+# Scanned or photographed packing slips, read by ocr_packing_lists
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+
+# Workbook kinds
+INVOICE = "invoice"
+PACKING_LIST = "packing_list"
+OTHER = "other"
+
+
+def classify_workbook(filename):
+    """
+    INV workbooks are invoices; B255 and CCI forms are neither invoices nor
+    packing lists; everything else is treated as a packing list
+    """
+    upper = filename.upper()
+    if "INV" in upper:
+        return INVOICE
+    if "B255" in upper or "CCI" in upper:
+        return OTHER
+    return PACKING_LIST
+
+
+class JobPlan:
+    """
+    Every workbook in a folder, scanned and classified once and shared by
+    all stages of the pipeline.
+
+    `converted` maps a workbook path to the whole-workbook PDF produced for
+    it by the batched conversion pass, if any, so the invoice and packing
+    slip stages can pick it up instead of launching soffice themselves.
+    """
+
+    def __init__(self, excel_path, workbooks):
+        self.excel_path = excel_path
+        self.workbooks = sorted(workbooks)
+        self.kinds = {filename: classify_workbook(filename) for filename in self.workbooks}
+        self.converted = {}
+        self._digests = {}
+
+    def path(self, filename):
+        return os.path.join(self.excel_path, filename)
+
+    def of_kind(self, kind):
+        return [filename for filename in self.workbooks if self.kinds[filename] == kind]
+
+    @property
+    def invoices(self):
+        return self.of_kind(INVOICE)
+
+    @property
+    def packing_lists(self):
+        return self.of_kind(PACKING_LIST)
+
+    def digest(self, filename):
+        """
+        Content hash of a workbook, computed at most once per plan
+        """
+        if filename not in self._digests:
+            self._digests[filename] = file_digest(self.path(filename))
+        return self._digests[filename]
+
+
+def is_workbook(filename):
+    """
+    Excel workbooks only; Office/LibreOffice lock files such as
+    '~$FFL-COM-INV-....xlsm' and '.~lock.x.xls#' are ignored
+    """
+    if filename.startswith(("~$", ".~lock.")):
+        return False
+    return filename.lower().endswith(EXCEL_EXTENSIONS)
+
+
+def plan_jobs(excel_path):
+    """
+    Scan excel_path once and classify its workbooks
+    """
+    with run_report.step("directory_scan"):
+        workbooks = [filename for filename in os.listdir(excel_path) if is_workbook(filename)]
+    plan = JobPlan(excel_path, workbooks)
+    run_report.count("workbooks_scanned", len(plan.workbooks))
+
+    log.info(f"🗂️ Found {len(plan.workbooks)} workbooks: {len(plan.invoices)} invoices, "
+             f"{len(plan.packing_lists)} packing lists, {len(plan.of_kind(OTHER))} other")
+    return plan
+
+
+def batches_with_unique_names(paths, batch_count=1):
+    """
+    Split paths into at most batch_count batches (more if needed) such that
+    no batch holds two files with the same base name, since soffice names
+    each PDF after its input
+    """
+    batch_count = max(1, min(batch_count, len(paths)))
+    batches = [[] for _ in range(batch_count)]
+    stems = [set() for _ in range(batch_count)]
+
+    for index, path in enumerate(paths):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        slot = index % batch_count
+        while stem in stems[slot]:
+            slot += 1
+            if slot == len(batches):
+                batches.append([])
+                stems.append(set())
+        batches[slot].append(path)
+        stems[slot].add(stem)
+
+    return [batch for batch in batches if batch]
@@ -0,0 +1,75 @@
+import sys
+import json
+import logging
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Writes to whatever sys.stdout is at the time of the call, so output
+    redirected by a pool worker (see map_files) is captured with its file
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    One JSON object per log line
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage().strip(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(quiet=False, verbose=False, json_lines=False):
+    """
+    INFO by default (the usual status lines), WARNING with quiet, DEBUG
+    with verbose (adds the per-row dump and every value found)
+    """
+    if verbose:
+        level = logging.DEBUG
+    elif quiet:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+
+    handler = _StdoutHandler()
+    handler.setFormatter(JsonLineFormatter() if json_lines else logging.Formatter("%(message)s"))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    # pdfminer logs every content stream operator at DEBUG
+    logging.getLogger("pdfminer").setLevel(max(level, logging.WARNING))
+
+
+def add_logging_arguments(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("-q", "--quiet", action="store_true",
+                       help="Only log warnings and errors")
+    group.add_argument("-v", "--verbose", action="store_true",
+                       help="Also log every scanned row and extracted value")
+    parser.add_argument("--log-json", action="store_true",
+                        help="Write log lines as JSON objects")
+
+
+def configure_logging_from_args(args):
+    configure_logging(args.quiet, args.verbose, args.log_json)
@@ -1,18 +1,78 @@
+import io
 import os
+import argparse
+import functools
+import hashlib
+import logging
+import sqlite3
 import subprocess
 import tempfile
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-import pdfplumber
 import re
 
-def convert_excel_sheets_to_pdf(excel_path):
+import run_report
+from combined_pdf import CombinedPdf
+from logging_setup import add_logging_arguments, configure_logging_from_args
+from result_cache import file_digest
+from sheet_renderer import RENDERERS, NativeSheetRenderer, RenderError
+from soffice_converter import SofficeConverter, add_conversion_arguments, converter_options_from_args
+
+log = logging.getLogger(__name__)
+
+def find_packing_slip_sheets(file_path):
+    """
+    Return the names of the sheets that have 'PACKING SLIP' in their first
+    5 rows, read straight from the workbook structure (xlrd for .xls,
+    openpyxl for .xlsx/.xlsm).
+    Returns None when the file cannot be read.
+    """
+    import itertools
+    from workbook_reader import open_workbook
+
+    try:
+        workbook = open_workbook(file_path)
+    except Exception:
+        return None
+
+    sheet_names = []
+    try:
+        for sheet_idx, sheet_name in enumerate(workbook.sheet_names):
+            for row_values in itertools.islice(workbook.iter_rows(sheet_idx), 5):  # Check first 5 rows
+                if 'PACKING SLIP' in [str(value).strip() for value in row_values]:
+                    sheet_names.append(sheet_name)
+                    break
+            workbook.release_sheet(sheet_idx)
+    finally:
+        workbook.close()
+
+    return sheet_names
+
+def convert_excel_sheets_to_pdf(excel_path, sheet_only=False, header_only=False, page_cache=None,
+                                renderer="soffice", converter_options=None):
     """
     Convert specific sheets from Excel files to PDF and merge them
     Sheets must have "PACKING SLIP" as first non-empty words
+
+    With sheet_only=True the packing slip sheets are located in the workbook first
+    and only those sheets are rendered, which skips the page filter pass.
+    header_only and page_cache (a path) are passed on to filter_individual_pdf.
+    renderer="native" draws the packing slip sheets in-process (see
+    sheet_renderer) instead of launching LibreOffice, and implies sheet_only.
+    converter_options are passed on to SofficeConverter (timeout, retries,
+    quarantine).
+
+    Workbooks already in combined_packing_slips.pdf (same content hash in
+    its manifest) keep their pages and are not converted again.
     """
+    native = renderer == "native"
+    sheet_only = sheet_only or native
+    decision_cache = PageDecisionCache(page_cache) if page_cache else None
+    output_pdf = os.path.join(excel_path, "combined_packing_slips.pdf")
+    mode = "native" if native else "sheets" if sheet_only else "header" if header_only else "full"
+    combined = CombinedPdf(output_pdf, mode)
     
-    with tempfile.TemporaryDirectory() as temp_dir:
-        pdf_files = []
+    converter = NativeSheetRenderer() if native else SofficeConverter(**(converter_options or {}))
+    with tempfile.TemporaryDirectory() as temp_dir, converter:
+        filenames = []
         
         for filename in os.listdir(excel_path):
             if (filename.lower().endswith((".xls", ".xlsx", ".xlsm")) and 
@@ -20,88 +80,158 @@ def convert_excel_sheets_to_pdf(excel_path):
                 "BCR" not in filename.upper()):
                 
                 full_input_path = os.path.join(excel_path, filename)
-                print(f"🔍 Processing: {filename}")
+                digest = file_digest(full_input_path)
+                filenames.append(filename)
+                if combined.is_current(filename, digest):
+                    log.info(f"✅ Unchanged, kept its pages in the combined PDF: {filename}")
+                    continue
+                
+                log.info(f"🔍 Processing: {filename}")
+                
+                sheets = find_packing_slip_sheets(full_input_path) if sheet_only else None
+                if sheets == []:
+                    log.warning(f"⚠️ No packing slip sheet found in: {filename}")
+                    combined.replace(filename, digest, None)
+                    continue
                 
                 try:
-                    # Convert entire Excel file to PDF
-                    subprocess.run([
-                        "soffice", 
-                        "--headless", 
-                        "--convert-to", "pdf", 
-                        "--outdir", temp_dir, 
-                        full_input_path
-                    ], check=True, capture_output=True)
-                    
-                    converted_pdf = os.path.join(temp_dir, f"{os.path.splitext(filename)[0]}.pdf")
+                    if sheets:
+                        # Render only the packing slip sheets
+                        converted_pdf, sheets_only = converter.convert_sheets(
+                            full_input_path, temp_dir, sheets, capture_output=True
+                        )
+                    else:
+                        # Convert entire Excel file to PDF
+                        converted_pdf = converter.convert(full_input_path, temp_dir, capture_output=True)
+                        sheets_only = False
                     
-                    if os.path.exists(converted_pdf):
+                    if sheets_only and os.path.exists(converted_pdf):
+                        # Every page already belongs to a packing slip sheet
+                        combined.replace(filename, digest, converted_pdf)
+                        log.info(f"✅ Rendered packing slip sheet(s) {sheets} from: {filename}")
+                    elif os.path.exists(converted_pdf):
                         # Filter this individual PDF first to keep only packing slip pages
-                        filtered_pdf = filter_individual_pdf(converted_pdf, temp_dir)
+                        filtered_pdf = filter_individual_pdf(converted_pdf, temp_dir, header_only, decision_cache)
                         
+                        combined.replace(filename, digest, filtered_pdf)
                         if filtered_pdf:
-                            pdf_files.append(filtered_pdf)
-                            print(f"✅ Found and filtered packing slip in: {filename}")
+                            log.info(f"✅ Found and filtered packing slip in: {filename}")
                         else:
-                            print(f"⚠️ No packing slip pages found in: {filename}")
+                            log.warning(f"⚠️ No packing slip pages found in: {filename}")
                             os.remove(converted_pdf)
                     
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ Failed to convert {filename}: {e}")
+                except (subprocess.CalledProcessError, RenderError) as e:
+                    log.error(f"❌ Failed to convert {filename}: {e}")
+                    # Leave it out of the manifest so the next run retries it
+                    combined.remove(filename)
         
-        # Merge all filtered PDFs
-        if pdf_files:
-            output_pdf = os.path.join(excel_path, "combined_packing_slips.pdf")
-            merger = PdfMerger()
-            
-            for pdf_file in pdf_files:
-                merger.append(pdf_file)
-            
-            merger.write(output_pdf)
-            merger.close()
-            
-            print(f"📄 Combined {len(pdf_files)} filtered packing slips into: {output_pdf}")
+        converter.print_latency_report()
+
+        # Merge the new segments with the pages kept from the last run
+        combined.retain_only(filenames)
+        count, written = combined.save()
+        if not count:
+            log.error("❌ No packing slips found to combine")
+        elif written:
+            log.info(f"📄 Combined {count} filtered packing slips into: {output_pdf}")
         else:
-            print("❌ No packing slips found to combine")
+            log.info(f"✅ Combined PDF is up to date ({count} packing slips): {output_pdf}")
+
+    if decision_cache is not None:
+        decision_cache.close()
+
+def packing_slip_pages(pdf_file, header_only=False, decision_cache=None, filename=None):
+    """
+    0-based numbers of the packing slip pages of a PDF (a path or a binary
+    file object), in order.
+
+    header_only switches to classify_packing_slip_page, and decision_cache
+    (a PageDecisionCache) skips pages whose content was classified before.
+    A page that cannot be read is logged and left out.
+    """
+    import pdfplumber
+
+    filename = filename or (os.path.basename(pdf_file) if isinstance(pdf_file, str) else "PDF")
+    kept = []
+    pages_dropped = 0
+
+    with pdfplumber.open(pdf_file) as pdf:
+        for page_num, page in enumerate(pdf.pages):
+            try:
+                cache_key = None
+                keep = None
+                if decision_cache is not None:
+                    mode = "header" if header_only else "full"
+                    cache_key = f"{mode}:{_page_content_hash(page)}"
+                    keep = decision_cache.get(cache_key)
+
+                if keep is None:
+                    with run_report.step("pdf_text"):
+                        if header_only:
+                            keep = classify_packing_slip_page(page)
+                        else:
+                            # Extract text with better configuration
+                            text = page.extract_text(
+                                x_tolerance=1,
+                                y_tolerance=1,
+                                keep_blank_chars=False
+                            )
+                            keep = is_packing_slip_page(text)
+
+                    if cache_key is not None:
+                        decision_cache.set(cache_key, keep)
+
+                if keep:
+                    kept.append(page_num)
+                else:
+                    pages_dropped += 1
+
+            except Exception as e:
+                log.error(f"❌ Error processing page {page_num + 1} in {filename}: {e}")
+                continue
+            finally:
+                # Drop pdfplumber's parsed layout for this page
+                page.close()
+
+    run_report.count("pages_kept", len(kept))
+    run_report.count("pages_dropped", pages_dropped)
+    return kept
 
-def filter_individual_pdf(input_pdf_path, temp_dir):
+def filter_individual_pdf(input_pdf_path, temp_dir, header_only=False, decision_cache=None):
     """
     Filter individual PDF to keep only pages with PACKING SLIP
+
+    The file is read once; pdfplumber decides which pages to keep (see
+    packing_slip_pages) and a single PdfReader over the same bytes supplies
+    those pages to the writer.
     """
+    from PyPDF2 import PdfReader, PdfWriter
+
     try:
-        with pdfplumber.open(input_pdf_path) as pdf:
-            pdf_writer = PdfWriter()
-            pages_kept = 0
-            
-            for page_num, page in enumerate(pdf.pages):
-                try:
-                    # Extract text with better configuration
-                    text = page.extract_text(
-                        x_tolerance=1,
-                        y_tolerance=1,
-                        keep_blank_chars=False
-                    )
-                    
-                    if is_packing_slip_page(text):
-                        # Add this page to the output PDF
-                        pdf_reader = PdfReader(input_pdf_path)
-                        pdf_writer.add_page(pdf_reader.pages[page_num])
-                        pages_kept += 1
-                        
-                except Exception as e:
-                    print(f"❌ Error processing page {page_num + 1} in {os.path.basename(input_pdf_path)}: {e}")
-                    continue
-            
-            # Save filtered PDF if we kept any pages
-            if pages_kept > 0:
-                filtered_pdf_path = os.path.join(temp_dir, f"filtered_{os.path.basename(input_pdf_path)}")
-                with open(filtered_pdf_path, 'wb') as output_file:
-                    pdf_writer.write(output_file)
-                return filtered_pdf_path
+        with open(input_pdf_path, 'rb') as input_file:
+            pdf_bytes = input_file.read()
+
+        with run_report.step("pdf_read"):
+            pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+        pdf_writer = PdfWriter()
+
+        kept = packing_slip_pages(io.BytesIO(pdf_bytes), header_only, decision_cache,
+                                  os.path.basename(input_pdf_path))
+        for page_num in kept:
+            # Add this page to the output PDF
+            pdf_writer.add_page(pdf_reader.pages[page_num])
+
+        # Save filtered PDF if we kept any pages
+        if kept:
+            filtered_pdf_path = os.path.join(temp_dir, f"filtered_{os.path.basename(input_pdf_path)}")
+            with run_report.step("pdf_write"), open(filtered_pdf_path, 'wb') as output_file:
+                pdf_writer.write(output_file)
+            return filtered_pdf_path
         
         return None
         
     except Exception as e:
-        print(f"❌ Error filtering PDF {os.path.basename(input_pdf_path)}: {e}")
+        log.error(f"❌ Error filtering PDF {os.path.basename(input_pdf_path)}: {e}")
         return None
 
 def is_packing_slip_page(text):
@@ -125,10 +255,148 @@ def is_packing_slip_page(text):
     
     return False
 
+# Height (in points) of the strip at the top of the page that the
+# header-only classifier reads
+HEADER_BAND_HEIGHT = 120
+
+class _StopInterpreting(Exception):
+    pass
+
+@functools.lru_cache(maxsize=None)
+def _header_band_device_class():
+    """
+    The header band device class, defined on first use so pdfminer is only
+    imported by runs that classify pages
+    """
+    from pdfminer.converter import PDFLayoutAnalyzer
+    from pdfminer.layout import LTChar
+    from pdfminer.utils import mult_matrix
+
+    class _HeaderBandDevice(PDFLayoutAnalyzer):
+        """
+        pdfminer device that only lays out text drawn inside the header band and
+        stops the interpreter as soon as 'PACKING SLIP' shows up there
+        """
+
+        def __init__(self, rsrcmgr, band_bottom):
+            super().__init__(rsrcmgr, laparams=None)
+            self.band_bottom = band_bottom
+            self.band_chars = []
+            self.band_text = ""
+
+        def render_string(self, textstate, seq, ncs, graphicstate):
+            # Text outside the band is skipped before any glyphs are built
+            matrix = mult_matrix(textstate.matrix, self.ctm)
+            if matrix[5] + textstate.rise < self.band_bottom:
+                return
+
+            start = len(self.cur_item._objs)
+            super().render_string(textstate, seq, ncs, graphicstate)
+            new_chars = [obj for obj in self.cur_item._objs[start:] if isinstance(obj, LTChar)]
+            self.band_chars.extend(new_chars)
+            self.band_text += "".join(char.get_text() for char in new_chars).upper()
+
+            if "PACKINGSLIP" in re.sub(r'\s+', '', self.band_text):
+                raise _StopInterpreting()
+
+        def receive_layout(self, ltpage):
+            pass
+
+    return _HeaderBandDevice
+
+def _page_content_hash(page):
+    """
+    Hash of a pdfplumber page's content streams
+    """
+    digest = hashlib.sha1()
+    for stream in page.page_obj.contents:
+        digest.update(stream.get_data())
+    return digest.hexdigest()
+
+def classify_packing_slip_page(page):
+    """
+    Decide whether a pdfplumber page is a packing slip from its header band only.
+
+    Only text drawn in the top HEADER_BAND_HEIGHT points is turned into
+    characters, and interpretation stops as soon as 'PACKING SLIP' appears
+    there. The band text then goes through the same first-20-words rule as
+    is_packing_slip_page.
+    """
+    from pdfminer.pdfinterp import PDFPageInterpreter
+    from pdfplumber.utils import extract_text
+
+    x0, y0, x1, y1 = page.page_obj.mediabox
+    device = _header_band_device_class()(page.pdf.rsrcmgr, y1 - HEADER_BAND_HEIGHT)
+    try:
+        PDFPageInterpreter(page.pdf.rsrcmgr, device).process_page(page.page_obj)
+    except _StopInterpreting:
+        pass
+
+    # Same shape as pdfplumber's own char dicts, top-left origin
+    chars = [{
+        "text": char.get_text(),
+        "x0": char.x0 - x0,
+        "x1": char.x1 - x0,
+        "top": y1 - char.y1,
+        "bottom": y1 - char.y0,
+        "doctop": y1 - char.y1,
+        "upright": char.upright,
+        "size": char.size,
+        "fontname": char.fontname,
+        "matrix": char.matrix,
+    } for char in device.band_chars]
+
+    return is_packing_slip_page(extract_text(chars, x_tolerance=1, y_tolerance=1))
+
+class PageDecisionCache:
+    """
+    On-disk cache of page classifications keyed by page content hash.
+    Backed by SQLite so parallel workers can share one file.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS page_decisions (key TEXT PRIMARY KEY, keep INTEGER NOT NULL)"
+        )
+
+    def get(self, key):
+        row = self.connection.execute(
+            "SELECT keep FROM page_decisions WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def set(self, key, keep):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO page_decisions (key, keep) VALUES (?, ?)", (key, int(keep))
+            )
+
+    def close(self):
+        self.connection.close()
+
 def main():
-    excel_path = "/home/pritom/Desktop/Packing List Extraction/Demo"
+    parser = argparse.ArgumentParser(description="Merge the packing slip pages of every workbook into one PDF")
+    parser.add_argument("excel_path", nargs="?",
+                        default="/home/pritom/Desktop/Packing List Extraction/Demo",
+                        help="Folder containing the Excel workbooks")
+    parser.add_argument("--sheet-only", action="store_true",
+                        help="Render only the PACKING SLIP sheets instead of whole workbooks")
+    parser.add_argument("--header-only", action="store_true",
+                        help="Classify pages from the text in their header band only")
+    parser.add_argument("--page-cache", metavar="PATH",
+                        help="SQLite file caching page decisions by content hash")
+    parser.add_argument("--renderer", choices=RENDERERS, default="soffice",
+                        help="Render packing slip sheets with LibreOffice or natively in-process "
+                             "(native implies --sheet-only)")
+    add_conversion_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
     
-    convert_excel_sheets_to_pdf(excel_path)
+    convert_excel_sheets_to_pdf(args.excel_path, sheet_only=args.sheet_only,
+                                header_only=args.header_only, page_cache=args.page_cache,
+                                renderer=args.renderer, converter_options=converter_options_from_args(args))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
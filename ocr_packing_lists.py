@@ -0,0 +1,459 @@
+import io
+import os
+import re
+import shutil
+import logging
+import argparse
+import subprocess
+
+from logging_setup import add_logging_arguments, configure_logging_from_args
+import run_report
+from extract_packing_lists import (PO_HEADER_CELLS, TOTALS_HEADER_CELLS, log_packing_slip_block,
+                                   scan_packing_slip_blocks)
+from extract_pdf_packing_lists import THOUSANDS_PATTERN, _join_stacked_headers
+from job_planner import IMAGE_EXTENSIONS
+from output_writers import OUTPUT_FORMATS, open_output_writer
+from packing_records import PackingListRecord, RecordAccumulator
+from result_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES, ResultCache, file_digest
+
+log = logging.getLogger(__name__)
+
+# Longer side images are scaled down to: an A4 page at 300 dpi. Phone
+# photos are larger without carrying more legible detail.
+DEFAULT_MAX_SIDE = 3508
+
+# Tiles are cut on table rules to about this many pixels high, so no text
+# line is split between two tiles
+DEFAULT_TILE_HEIGHT = 600
+
+# Skew angles tried by deskew, in degrees
+MAX_SKEW = 5.0
+SKEW_STEP = 0.25
+
+# A line of pixels is a table rule when this much of it is ink, as a
+# fraction of the image width (horizontal rules) or of the row height
+# (column separators); coverage rather than one unbroken run, so rules
+# with gaps in them still count
+RULE_MIN_COVERAGE = 0.5
+SEPARATOR_MIN_COVERAGE = 0.9
+
+# Brightest minus darkest channel above which a pixel is a coloured pen
+# mark rather than print
+MARK_SATURATION = 96
+
+# Words tesseract reads from leftover rule fragments
+RULE_CHARACTERS = set("|_-—–=[]!")
+
+# Cells the row scanner matches exactly, by their letters and digits only
+CANONICAL_CELLS = {re.sub(r"[^A-Z0-9]", "", cell.upper()): cell
+                   for cell in PO_HEADER_CELLS | TOTALS_HEADER_CELLS | {'SUB TOTAL', 'PACKING SLIP'}}
+
+
+def tesseract_available():
+    return shutil.which("tesseract") is not None
+
+
+def _dark_mask(gray):
+    """
+    Boolean array of the ink pixels of a grayscale image, split from the
+    paper at Otsu's threshold
+    """
+    import numpy as np
+
+    pixels = np.asarray(gray, dtype=np.uint8)
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(float)
+    levels = np.arange(256)
+    weight = np.cumsum(histogram)
+    mean = np.cumsum(histogram * levels)
+    total_weight, total_mean = weight[-1], mean[-1]
+    background = total_weight - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weight - mean * total_weight) ** 2 / (weight * background)
+    threshold = int(np.nanargmax(between[:-1]))
+    return pixels <= threshold
+
+
+def skew_angle(gray):
+    """
+    Angle in degrees to rotate gray by so its text lines run level: the one
+    whose rows of ink are sharpest (projection profile method), found on a
+    thumbnail
+    """
+    import numpy as np
+    from PIL import Image
+
+    thumbnail = gray.copy()
+    thumbnail.thumbnail((800, 800))
+    ink = Image.fromarray((_dark_mask(thumbnail) * 255).astype(np.uint8))
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(MAX_SKEW / SKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * SKEW_STEP
+        profile = np.asarray(ink.rotate(angle, resample=Image.BILINEAR), dtype=float).sum(axis=1)
+        score = float(np.sum(np.diff(profile) ** 2))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def prepare_image(path, max_side=DEFAULT_MAX_SIDE):
+    """
+    Decode an image into upright, level grayscale: EXIF rotation applied,
+    scaled down to max_side and deskewed. Returns (gray, marks).
+
+    Each pixel of gray takes its brightest channel, so coloured pen marks
+    drawn over the print (like the red boxes on the sample photos) fade out
+    of the text. Where they cover a table rule they would cut it, so marks
+    keeps them as a mask (255 where strongly coloured) for table_grid.
+    """
+    from PIL import Image, ImageChops, ImageOps
+
+    with Image.open(path) as image:
+        red, green, blue = ImageOps.exif_transpose(image).convert("RGB").split()
+    brightest = ImageChops.lighter(ImageChops.lighter(red, green), blue)
+    darkest = ImageChops.darker(ImageChops.darker(red, green), blue)
+    gray = ImageOps.autocontrast(brightest)
+    marks = ImageChops.subtract(brightest, darkest).point(lambda value: 255 if value > MARK_SATURATION else 0)
+
+    if max(gray.size) > max_side:
+        scale = max_side / max(gray.size)
+        size = (round(gray.width * scale), round(gray.height * scale))
+        gray = gray.resize(size, Image.LANCZOS)
+        marks = marks.resize(size, Image.NEAREST)
+
+    angle = skew_angle(gray)
+    if angle:
+        log.debug("Deskewing %s by %.2f°", os.path.basename(path), angle)
+        gray = gray.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+        marks = marks.rotate(angle, resample=Image.NEAREST, fillcolor=0)
+    return gray, marks
+
+
+def _runs(flags, min_gap=1):
+    """
+    [(start, stop)] of the runs of True in a 1-D boolean array, runs less
+    than min_gap apart merged
+    """
+    runs = []
+    for index in flags.nonzero()[0]:
+        index = int(index)
+        if runs and index - runs[-1][1] <= min_gap:
+            runs[-1][1] = index + 1
+        else:
+            runs.append([index, index + 1])
+    return [tuple(run) for run in runs]
+
+
+def table_grid(gray, marks=None):
+    """
+    The ruled tables of an image, each a list of rows
+    (top, bottom, [(left, right), ...]); rules are found as lines of
+    pixels mostly covered in ink, so only axis-aligned (deskewed) tables
+    are seen.
+
+    Rows lie between horizontal rules covering RULE_MIN_COVERAGE of the
+    image width, and a row's cells between the vertical rules crossing it
+    from top to bottom. A table ends at a row without such cells (a filled
+    bar, or text outside any table).
+
+    Pen marks (see prepare_image) count as ink for rules. A vertical mark
+    only counts as a column rule where the ink alone makes one in some
+    other row, so the sides of a box drawn inside a cell do not split it.
+    """
+    import numpy as np
+
+    ink = _dark_mask(gray)
+    inked = ink if marks is None else ink | (np.asarray(marks) > 0)
+
+    rules = _runs(inked.mean(axis=1) >= RULE_MIN_COVERAGE, min_gap=2)
+    bands = [(top, bottom) for (_, top), (bottom, _) in zip(rules, rules[1:]) if bottom - top > 4]
+
+    ink_columns = np.zeros(ink.shape[1], dtype=bool)
+    for top, bottom in bands:
+        ink_columns |= ink[top:bottom].mean(axis=0) >= SEPARATOR_MIN_COVERAGE
+    ink_columns |= np.roll(ink_columns, 1) | np.roll(ink_columns, -1)
+
+    tables = [[]]
+    for top, bottom in bands:
+        band = inked[top:bottom]
+        separators = _runs((band.mean(axis=0) >= SEPARATOR_MIN_COVERAGE) & ink_columns, min_gap=2)
+        cells = [(left, right) for (_, left), (right, _) in zip(separators, separators[1:])
+                 if right - left > 2]
+        if cells and band.mean() < 0.5:
+            tables[-1].append((top, bottom, cells))
+        elif tables[-1]:
+            tables.append([])
+    return [table for table in tables if table]
+
+
+def table_columns(table, tolerance=6):
+    """
+    Left edges of the columns of a table: the cell edges of all its rows,
+    those within tolerance pixels taken as one. A cell spanning several
+    columns belongs to the column it starts in, like a merged worksheet
+    cell whose value sits in its top left cell.
+    """
+    columns = []
+    for left in sorted(left for _, _, cells in table for left, _ in cells):
+        if not columns or left - columns[-1] > tolerance:
+            columns.append(left)
+    return columns
+
+
+def _tiles(table, tile_height=DEFAULT_TILE_HEIGHT):
+    """
+    Split a table's rows into runs about tile_height pixels high
+    """
+    tiles = [[]]
+    for row in table:
+        if tiles[-1] and row[1] - tiles[-1][0][0] > tile_height:
+            tiles.append([])
+        tiles[-1].append(row)
+    return tiles
+
+
+def _tile_image(gray, rows):
+    """
+    The cells of rows on a white tile with every rule left out, plus the
+    tile's top left corner in the image
+    """
+    from PIL import Image
+
+    top = rows[0][0]
+    left = min(cells[0][0] for _, _, cells in rows)
+    right = max(cells[-1][1] for _, _, cells in rows)
+    tile = Image.new("L", (right - left, rows[-1][1] - top), 255)
+    for row_top, row_bottom, cells in rows:
+        for cell_left, cell_right in cells:
+            box = (cell_left + 2, row_top + 2, cell_right - 2, row_bottom - 2)
+            if box[2] > box[0] and box[3] > box[1]:
+                tile.paste(gray.crop(box), (box[0] - left, box[1] - top))
+    return tile, (left, top)
+
+
+def ocr_words(tile, origin=(0, 0), language="eng"):
+    """
+    [(x centre, y centre, height, text)] of the words tesseract reads on a
+    tile, in image coordinates.
+
+    Sparse text mode (--psm 11) suits table cells better than reading the
+    tile as paragraphs. Each call is one tesseract process held to one
+    thread, so tiles OCR'd side by side each get a core.
+    """
+    buffer = io.BytesIO()
+    tile.save(buffer, format="PNG")
+    env = dict(os.environ, OMP_THREAD_LIMIT="1")
+    result = subprocess.run(["tesseract", "stdin", "stdout", "-l", language, "--psm", "11", "tsv"],
+                            input=buffer.getvalue(), capture_output=True, check=True, env=env)
+
+    x0, y0 = origin
+    words = []
+    for line in result.stdout.decode("utf-8", "replace").splitlines()[1:]:
+        fields = line.split("\t")
+        if len(fields) < 12 or fields[0] != "5":
+            continue
+        text = fields[11].strip()
+        if not text or set(text) <= RULE_CHARACTERS or float(fields[10]) < 0:
+            continue
+        left, top, width, height = (int(value) for value in fields[6:10])
+        words.append((x0 + left + width / 2, y0 + top + height / 2, height, text))
+    return words
+
+
+def _canonical_cell(text):
+    """
+    Known header and marker cells spelt the way the row scanner expects,
+    whatever spacing and punctuation OCR gave them ('#CARTONS',
+    'TOTAL G.W (kg)'); thousands separators dropped from numbers
+    """
+    key = re.sub(r"[^A-Z0-9]", "", text.upper())
+    if key in CANONICAL_CELLS:
+        return CANONICAL_CELLS[key]
+    if THOUSANDS_PATTERN.fullmatch(text):
+        return text.replace(",", "")
+    return text
+
+
+def _cell_text(words, left, right, top, bottom):
+    """
+    The words centred in a cell, line by line
+    """
+    inside = sorted((y, x, height, text) for x, y, height, text in words
+                    if left <= x < right and top <= y < bottom)
+    lines = []
+    for y, x, height, text in inside:
+        if lines and y - lines[-1][0] < height / 2:
+            lines[-1][1].append((x, text))
+        else:
+            lines.append((y, [(x, text)]))
+    return " ".join(text for _, line in lines for _, text in sorted(line))
+
+
+def table_rows(table, words):
+    """
+    Worksheet-like rows of cell strings for a table, one column per entry
+    of table_columns
+    """
+    columns = table_columns(table)
+    rows = []
+    for top, bottom, cells in table:
+        row = [''] * len(columns)
+        for left, right in cells:
+            index = min(range(len(columns)), key=lambda column: abs(columns[column] - left))
+            row[index] = _canonical_cell(_cell_text(words, left, right, top, bottom))
+        rows.append(row)
+    return _join_stacked_headers(rows)
+
+
+def image_table_rows(path, workers=1, max_side=DEFAULT_MAX_SIDE, tile_height=DEFAULT_TILE_HEIGHT,
+                     language="eng"):
+    """
+    The rows of every ruled table of an image, tables one after another.
+    Tiles are OCR'd by `workers` threads, each driving its own tesseract
+    process.
+    """
+    if not tesseract_available():
+        raise RuntimeError("OCR needs tesseract (apt install tesseract-ocr)")
+
+    with run_report.step("image_decode"):
+        gray, marks = prepare_image(path, max_side)
+    with run_report.step("table_grid"):
+        tables = table_grid(gray, marks)
+
+    tiles = [_tile_image(gray, rows) for table in tables for rows in _tiles(table, tile_height)]
+    run_report.count("ocr_tiles", len(tiles))
+
+    with run_report.step("ocr"):
+        if workers > 1 and len(tiles) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                tile_words = list(pool.map(lambda tile: ocr_words(*tile, language=language), tiles))
+        else:
+            tile_words = [ocr_words(tile, origin, language) for tile, origin in tiles]
+    words = [word for batch in tile_words for word in batch]
+
+    return [row for table in tables for row in table_rows(table, words)]
+
+
+def cached_image_table_rows(path, cache_config=None, workers=1, max_side=DEFAULT_MAX_SIDE,
+                            tile_height=DEFAULT_TILE_HEIGHT, language="eng"):
+    """
+    image_table_rows, served from the result cache by image hash when the
+    same image was OCR'd before with the same settings
+    """
+    if cache_config is None:
+        return image_table_rows(path, workers, max_side, tile_height, language)
+
+    kind = f"ocr_rows:{language}:{max_side}:{tile_height}"
+    digest = file_digest(path)
+    with ResultCache(*cache_config) as cache:
+        rows = cache.get_json(digest, kind)
+        if rows is not None:
+            log.info(f"♻️ Unchanged, reused the OCR of {os.path.basename(path)}")
+            run_report.count("ocr_cache_hits")
+            return rows
+        rows = image_table_rows(path, workers, max_side, tile_height, language)
+        cache.put_json(digest, kind, rows)
+    return rows
+
+
+def image_packing_slip_records(path, workers=1, cache_config=None, format_po=False, **ocr_options):
+    """
+    A PackingListRecord for every PO block in the tables of a scanned or
+    photographed packing slip, in the xls extractor's schema; the sheet is
+    'Image'.
+    """
+    filename = os.path.basename(path)
+    rows = cached_image_table_rows(path, cache_config, workers, **ocr_options)
+
+    with run_report.step("row_scan"):
+        blocks = scan_packing_slip_blocks(rows, format_po)
+    if not blocks:
+        log.info(f"\n*** NO PACKING SLIP TABLE FOUND IN {filename} ***")
+
+    records = []
+    for block in blocks:
+        log_packing_slip_block(block)
+        if block['po_number']:
+            record = PackingListRecord(block['po_number'], block['colors'], block['cartons'],
+                                       block['pieces'], block['total_gross_weight'], filename, "Image")
+            log.info(f"\n*** CREATED RECORD FOR {filename} - {record.po_number} ***")
+            log.debug("%s", record)
+            records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract packing lists from scanned or photographed packing slips")
+    parser.add_argument("paths", nargs="+", metavar="IMAGE",
+                        help="Images of packing slips, or folders of them")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="OCR this many tiles at a time (default: one per core)")
+    parser.add_argument("--max-side", metavar="PIXELS", type=int, default=DEFAULT_MAX_SIDE,
+                        help="Scale larger images down to this length along their longer side")
+    parser.add_argument("--tile-height", metavar="PIXELS", type=int, default=DEFAULT_TILE_HEIGHT,
+                        help="Height of the strips the tables are OCR'd in")
+    parser.add_argument("--language", default="eng",
+                        help="Tesseract language")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="OCR every image again instead of reusing cached results")
+    parser.add_argument("--cache", metavar="PATH", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file holding cached OCR results")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the packing lists to this file instead of stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format (default: from the --output extension)")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    if not tesseract_available():
+        parser.error("OCR needs tesseract (apt install tesseract-ocr)")
+
+    image_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            image_paths.extend(sorted(os.path.join(path, filename) for filename in os.listdir(path)
+                                      if filename.lower().endswith(IMAGE_EXTENSIONS)))
+        else:
+            image_paths.append(path)
+
+    cache_config = None if args.no_cache else (args.cache, DEFAULT_MAX_BYTES)
+    ocr_options = dict(max_side=args.max_side, tile_height=args.tile_height, language=args.language)
+
+    all_records = []
+    writer = open_output_writer(args.output, args.format) if args.output else None
+    try:
+        for image_path in image_paths:
+            log.info(f"\n==== Reading file: {os.path.basename(image_path)} ====")
+            try:
+                records = image_packing_slip_records(image_path, args.workers, cache_config,
+                                                     format_po=True, **ocr_options)
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                log.error(f"❌ Failed to read '{os.path.basename(image_path)}': {e}")
+                continue
+            all_records.extend(records)
+            if writer:
+                writer.write_records(records)
+    finally:
+        if writer:
+            writer.close()
+
+    if writer:
+        log.info(f"\n💾 Wrote {len(all_records)} packing list(s) to: {args.output}")
+    elif all_records:
+        import json
+
+        print(json.dumps([record.to_dict() for record in all_records], indent=2))
+
+    if all_records:
+        accumulator = RecordAccumulator()
+        accumulator.extend(all_records)
+        log.info(f"Total packing lists found: {len(all_records)}")
+        log.info(f"Master DataFrame shape: {accumulator.to_dataframe().shape}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import csv
+import json
+
+from packing_records import COLOR_COLUMNS, RecordAccumulator, _item
+
+OUTPUT_FORMATS = ("json", "ndjson", "csv", "parquet")
+
+EXTENSION_FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".parquet": "parquet",
+}
+
+
+def infer_format(path, output_format=None):
+    """
+    The explicit format if given, otherwise the one matching the file extension
+    """
+    if output_format:
+        return output_format
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSION_FORMATS:
+        raise ValueError(f"Cannot tell the output format of {path}; pass one of {', '.join(OUTPUT_FORMATS)}")
+    return EXTENSION_FORMATS[extension]
+
+
+def explode_colors(record):
+    """
+    Split one PackingListRecord (lists of colors, cartons, pieces and
+    weights) into one row per color with scalar, typed values. A record
+    without colors gives one row with only its PO, file and sheet, like
+    RecordAccumulator.
+    """
+    if not record.colors:
+        return [{"PO_Number": record.po_number, "Source_File": record.source_file, "Sheet": record.sheet}]
+
+    rows = []
+    for index, color in enumerate(record.colors):
+        rows.append({
+            "PO_Number": record.po_number,
+            "Color": color,
+            "Cartons": _item(record.cartons, index),
+            "Pieces": _item(record.pieces, index),
+            "Total_Gross_Weight": _item(record.gross_weights, index),
+            "Source_File": record.source_file,
+            "Sheet": record.sheet,
+        })
+    return rows
+
+
+class JsonWriter:
+    """
+    One JSON array of records, the same shape the pipeline prints
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+
+    def write_records(self, records):
+        self.records.extend(record.to_dict() for record in records)
+
+    def close(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, indent=2)
+
+
+class NdjsonWriter:
+    """
+    One JSON record per line, flushed as each workbook finishes so readers
+    can follow the file while a batch is still running
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write_records(self, records):
+        for record in records:
+            self.file.write(json.dumps(record.to_dict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    """
+    One row per color, flushed as each workbook finishes
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=COLOR_COLUMNS)
+        self.writer.writeheader()
+
+    def write_records(self, records):
+        for record in records:
+            self.writer.writerows(explode_colors(record))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """
+    Columnar Parquet file with one row per color, built from typed column
+    arrays in a single pass. Needs pyarrow.
+    """
+
+    def __init__(self, path):
+        try:
+            import pyarrow.parquet  # type: ignore
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.accumulator = RecordAccumulator()
+
+    def write_records(self, records):
+        self.accumulator.extend(records)
+
+    def close(self):
+        # Written in one go so the file gets a single, well-sized row group
+        self.pq.write_table(self.accumulator.to_arrow(), self.path)
+
+
+WRITERS = {
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def open_output_writer(path, output_format=None):
+    """
+    Writer for path in the given format (or the one its extension implies)
+    """
+    return WRITERS[infer_format(path, output_format)](path)
@@ -1,448 +1,853 @@
 import os
+import logging
 import sys
+import argparse
+import uuid
+import tempfile
+import itertools
 import subprocess
 import importlib.util
 
-def run_script_1(excel_path):
+from logging_setup import add_logging_arguments, configure_logging_from_args
+from job_planner import INVOICE, JobPlan, batches_with_unique_names, is_workbook, plan_jobs
+from output_writers import OUTPUT_FORMATS, infer_format
+import run_report
+from result_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from sheet_renderer import RENDERERS, NativeSheetRenderer, RenderError
+from soffice_converter import (SofficeConverter, add_conversion_arguments, converter_options_from_args,
+                               print_latency_report, soffice_available)
+
+log = logging.getLogger(__name__)
+
+# Converter owned by a pool worker process (see _init_worker)
+_worker_converter = None
+
+# How packing slip sheets are rendered: "soffice" or "native" (in-process,
+# see sheet_renderer). Set once by main and handed to pool workers.
+_sheet_renderer = "soffice"
+
+# Whether INV workbooks are converted to PDF. The native renderer only
+# draws packing slips, so without soffice the invoice stage is skipped.
+# Set once by main.
+_convert_invoices = True
+
+# SofficeConverter keyword arguments (timeout, retries, quarantine), set
+# once by main and handed to pool workers
+_converter_options = {}
+
+def _init_worker(sheet_renderer="soffice", converter_options=None, report_config=None):
+    """
+    Give each pool worker its own converter and LibreOffice user profile,
+    and the parent's run report and --profile settings
+    """
+    import multiprocessing.util
+
+    global _worker_converter, _sheet_renderer, _converter_options
+    if report_config is not None:
+        run_report.init_worker(report_config)
+    _sheet_renderer = sheet_renderer
+    _converter_options = converter_options or {}
+    _worker_converter = SofficeConverter(isolated_profile=True, **_converter_options)
+    multiprocessing.util.Finalize(None, _worker_converter.close, exitpriority=10)
+
+def _get_converter():
+    """
+    Converter for the current process; in serial mode one instance is shared
+    by every stage and shut down when the interpreter exits
+    """
+    import atexit
+
+    global _worker_converter
+    if _worker_converter is None:
+        _worker_converter = SofficeConverter(**_converter_options)
+        atexit.register(_worker_converter.close)
+    return _worker_converter
+
+def _start_run():
+    """
+    Give every converter working from now on (this process's, and those of
+    pools started later) a new run id, so a workbook that fails in several
+    stages or workers counts as one failed run on the quarantine list
+    """
+    run_id = uuid.uuid4().hex
+    _converter_options["run_id"] = run_id
+    if _worker_converter is not None:
+        _worker_converter.run_id = run_id
+
+def _run_file_step(func, args):
+    """
+    One per-file call, timed as a run report step and run under cProfile
+    if its workbook was picked with --profile
+    """
+    with run_report.step(func.__name__):
+        if args and isinstance(args[0], str) and run_report.is_profile_target(args[0]):
+            return run_report.run_profiled(func.__name__, args[0], func, *args)
+        return func(*args)
+
+def _run_captured(task):
+    """
+    Run one per-file job in a worker and hand its console output and run
+    report steps back to the parent, so logs come out in filename order
+    instead of interleaved
+    """
+    import io
+    import contextlib
+
+    func, args = task
+    run_report.reset_worker_report()
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        result = _run_file_step(func, args)
+    return result, buffer.getvalue(), run_report.take_worker_report()
+
+def map_files(func, args_list, workers=1):
+    """
+    Apply func to every argument tuple, yielding the results in order as
+    they become available.
+    With workers > 1 the calls fan out to a process pool of that size.
+    """
+    if workers <= 1 or len(args_list) <= 1:
+        for args in args_list:
+            yield _run_file_step(func, args)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(_sheet_renderer, _converter_options, run_report.worker_config())) as pool:
+        for result, output, worker_report in pool.map(_run_captured, [(func, args) for args in args_list]):
+            sys.stdout.write(output)
+            run_report.merge_worker_report(worker_report)
+            yield result
+
+def _open_result_cache(cache_config):
+    """
+    Open the result cache described by cache_config, a (path, max_bytes)
+    tuple, or return None when caching is switched off
+    """
+    if cache_config is None:
+        return None
+
+    from result_cache import ResultCache
+
+    path, max_bytes = cache_config
+    return ResultCache(path, max_bytes)
+
+def convert_invoice_file(full_input_path, output_dir, cache_config=None, converted_pdf=None):
+    """
+    Convert one INV workbook to PDF next to the source file.
+    converted_pdf is the PDF from the batch pass, if it already converted it.
+    """
+    import shutil
+    from result_cache import file_digest
+
+    converter = _get_converter()
+    filename = os.path.basename(full_input_path)
+    output_pdf = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.pdf")
+    if converted_pdf and not os.path.exists(converted_pdf):
+        converted_pdf = None
+
+    cache = _open_result_cache(cache_config)
+    try:
+        digest = file_digest(full_input_path) if cache else None
+        cached_pdf = cache.get(digest, "invoice_pdf") if cache else None
+        if cached_pdf is not None:
+            with open(output_pdf, 'wb') as output_file:
+                output_file.write(cached_pdf)
+            log.info(f"♻️ Unchanged, reused cached PDF: {filename}")
+            return []
+
+        try:
+            if converted_pdf:
+                shutil.move(converted_pdf, output_pdf)
+            else:
+                # Convert through the persistent LibreOffice instance
+                converter.convert(full_input_path, output_dir)
+
+            log.info(f"✅ Converted: {filename}")
+            if cache and os.path.exists(output_pdf):
+                with open(output_pdf, 'rb') as pdf_file:
+                    cache.put(digest, "invoice_pdf", pdf_file.read())
+        except subprocess.CalledProcessError as e:
+            log.error(f"❌ Failed to convert {filename}: {e}")
+    finally:
+        if cache:
+            cache.close()
+
+    # Batch conversions are timed by the batch
+    return [] if converted_pdf else converter.latencies[-1:]
+
+def convert_batch_files(input_paths, outdir):
+    """
+    Convert a batch of workbooks with one soffice launch.
+    Returns {input_path: pdf_path} and the conversion latency; a failed
+    batch returns no PDFs, so its files are converted one by one later.
+    """
+    converter = _get_converter()
+    first_latency = len(converter.latencies)
+    os.makedirs(outdir, exist_ok=True)
+
+    try:
+        converted = converter.convert_batch(input_paths, outdir, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        log.error(f"❌ Batch conversion failed, converting its files one by one: {e}")
+        converted = {}
+
+    return converted, converter.latencies[first_latency:]
+
+def run_batch_conversion(plan, outdir, workers=1, sheet_only=False, header_only=False,
+                         cache_config=None):
+    """
+    Convert every workbook that needs a whole-workbook PDF, for either the
+    invoice or the packing slip stage, in as few soffice launches as
+    possible (one batch per worker). Results land in plan.converted.
+    """
+    log.info("=" * 60)
+    log.info("RUNNING BATCH CONVERSION: one soffice pass for all stages")
+    log.info("=" * 60)
+
+    from combined_pdf import CombinedPdf
+
+    combined = CombinedPdf(os.path.join(plan.excel_path, "combined_packing_slips.pdf"),
+                           _filter_mode(sheet_only, header_only))
+    filtered_kind = f"filtered_pdf:{_filter_mode(sheet_only, header_only)}"
+
+    # Skip whatever a later stage can serve without converting
+    input_paths = []
+    cache = _open_result_cache(cache_config)
+    try:
+        for filename in plan.invoices if _convert_invoices else ():
+            if cache and cache.contains(plan.digest(filename), "invoice_pdf"):
+                continue
+            input_paths.append(plan.path(filename))
+
+        for filename in plan.packing_lists:
+            if sheet_only:
+                # Rendered sheet by sheet in script 2
+                continue
+            digest = plan.digest(filename)
+            if combined.is_current(filename, digest):
+                continue
+            if cache and cache.contains(digest, filtered_kind):
+                continue
+            input_paths.append(plan.path(filename))
+    finally:
+        if cache:
+            cache.close()
+
+    if not input_paths:
+        log.info("✅ Nothing to convert")
+        return
+
+    batches = batches_with_unique_names(input_paths, workers)
+    jobs = [(batch, os.path.join(outdir, f"batch_{index}")) for index, batch in enumerate(batches)]
+
+    latencies = []
+    for converted, batch_latencies in map_files(convert_batch_files, jobs, workers):
+        plan.converted.update(converted)
+        latencies.extend(batch_latencies)
+
+    log.info(f"📦 Converted {len(plan.converted)} of {len(input_paths)} workbooks "
+             f"in {len(batches)} batch(es)")
+    print_latency_report(latencies)
+
+def run_script_1(excel_path, workers=1, cache_config=None, plan=None):
     """
     Run the first script (Excel to PDF conversion for INV files)
     """
-    print("=" * 60)
-    print("RUNNING SCRIPT 1: Excel to PDF conversion for INV files")
-    print("=" * 60)
+    log.info("=" * 60)
+    log.info("RUNNING SCRIPT 1: Excel to PDF conversion for INV files")
+    log.info("=" * 60)
     
     # Path to the source Excel file
     output_dir = excel_path  # Output PDF will be saved in the same directory
 
+    if not _convert_invoices:
+        log.warning("⚠️ soffice not found, skipping invoice conversion (the native renderer only "
+                    "draws packing slips)")
+        return
+
+    plan = plan or plan_jobs(excel_path)
+
     # Loop through all Excel files in the directory
-    for filename in os.listdir(excel_path):
-        if filename.lower().endswith((".xls", ".xlsx", ".xlsm")):
-            if "INV" in filename.upper():
-                full_input_path = os.path.join(excel_path, filename)
+    jobs = []
+    for filename in plan.workbooks:
+        if plan.kinds[filename] == INVOICE:
+            full_input_path = plan.path(filename)
+            jobs.append((full_input_path, output_dir, cache_config, plan.converted.get(full_input_path)))
+        else:
+            log.info(f"⚠️ Skipped (not an invoice): {filename}")
 
-                try:
-                    # Run LibreOffice in headless mode to convert to PDF
-                    subprocess.run([
-                        "soffice", 
-                        "--headless", 
-                        "--convert-to", "pdf", 
-                        "--outdir", output_dir, 
-                        full_input_path
-                    ], check=True)
-
-                    print(f"✅ Converted: {filename}")
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ Failed to convert {filename}: {e}")
+    latencies = []
+    for file_latencies in map_files(convert_invoice_file, jobs, workers):
+        latencies.extend(file_latencies)
+
+    print_latency_report(latencies)
+
+def _filter_mode(sheet_only, header_only):
+    if _sheet_renderer == "native":
+        return "native"
+    return "sheets" if sheet_only else "header" if header_only else "full"
+
+def convert_and_filter_file(full_input_path, temp_dir, sheet_only=False, header_only=False,
+                            page_cache=None, cache_config=None, converted_pdf=None):
+    """
+    Convert one workbook to PDF and keep only its packing slip pages.
+    Returns the filtered PDF path (None if there is no packing slip, False if
+    the conversion failed) and the conversion latency.
+    Unchanged workbooks are served from the result cache, and converted_pdf
+    (from the batch pass) is filtered instead of converting again.
+    """
+    from result_cache import file_digest
+
+    if _sheet_renderer == "native":
+        # Packing slip sheets are drawn in-process; nothing to batch or filter
+        converter = NativeSheetRenderer()
+        sheet_only, converted_pdf = True, None
+    else:
+        converter = _get_converter()
+    filename = os.path.basename(full_input_path)
+    log.info(f"🔍 Processing: {filename}")
+    if converted_pdf and not os.path.exists(converted_pdf):
+        converted_pdf = None
+
+    # The mode is part of the cache entry since sheet-only output can differ
+    kind = f"filtered_pdf:{_filter_mode(sheet_only, header_only)}"
+
+    cache = _open_result_cache(cache_config)
+    try:
+        digest = file_digest(full_input_path) if cache else None
+        cached_pdf = cache.get(digest, kind) if cache else None
+        if cached_pdf is not None:
+            if not cached_pdf:
+                log.info(f"♻️ Unchanged, no packing slip pages (cached): {filename}")
+                return None, []
+
+            filtered_pdf = os.path.join(temp_dir, f"filtered_{os.path.splitext(filename)[0]}.pdf")
+            with open(filtered_pdf, 'wb') as output_file:
+                output_file.write(cached_pdf)
+            log.info(f"♻️ Unchanged, reused cached packing slip: {filename}")
+            return filtered_pdf, []
+
+        try:
+            filtered_pdf = _convert_and_filter(converter, full_input_path, temp_dir,
+                                               sheet_only, header_only, page_cache, converted_pdf)
+        except (subprocess.CalledProcessError, RenderError) as e:
+            log.error(f"❌ Failed to convert {filename}: {e}")
+            return False, converter.latencies[-1:]
+
+        if cache:
+            if filtered_pdf:
+                with open(filtered_pdf, 'rb') as pdf_file:
+                    cache.put(digest, kind, pdf_file.read())
             else:
-                print(f"⚠️ Skipped (not an invoice): {filename}")
+                cache.put(digest, kind, b"")
+    finally:
+        if cache:
+            cache.close()
 
-def run_script_2(excel_path):
+    # Batch conversions are timed by the batch
+    return filtered_pdf, [] if converted_pdf else converter.latencies[-1:]
+
+def _convert_and_filter(converter, full_input_path, temp_dir, sheet_only, header_only, page_cache,
+                        converted_pdf=None):
+    """
+    Conversion and page filtering for convert_and_filter_file.
+    Returns the filtered PDF path, or None if the workbook has no packing slip.
+    """
+    from merge_packing_lists import PageDecisionCache, filter_individual_pdf, find_packing_slip_sheets
+
+    filename = os.path.basename(full_input_path)
+
+    sheets = find_packing_slip_sheets(full_input_path) if sheet_only else None
+    if sheets == []:
+        log.warning(f"⚠️ No packing slip sheet found in: {filename}")
+        return None
+    
+    if sheets:
+        # Render only the packing slip sheets
+        converted_pdf, sheets_only = converter.convert_sheets(
+            full_input_path, temp_dir, sheets, capture_output=True
+        )
+    elif converted_pdf:
+        # Already converted by the batch pass
+        sheets_only = False
+    else:
+        # Convert entire Excel file to PDF
+        converted_pdf = converter.convert(full_input_path, temp_dir, capture_output=True)
+        sheets_only = False
+    
+    if sheets_only and os.path.exists(converted_pdf):
+        # Every page already belongs to a packing slip sheet
+        log.info(f"✅ Rendered packing slip sheet(s) {sheets} from: {filename}")
+        return converted_pdf
+    elif os.path.exists(converted_pdf):
+        # Filter this individual PDF first to keep only packing slip pages
+        decision_cache = PageDecisionCache(page_cache) if page_cache else None
+        try:
+            filtered_pdf = filter_individual_pdf(converted_pdf, temp_dir, header_only, decision_cache)
+        finally:
+            if decision_cache is not None:
+                decision_cache.close()
+        
+        if filtered_pdf:
+            log.info(f"✅ Found and filtered packing slip in: {filename}")
+            return filtered_pdf
+        else:
+            log.warning(f"⚠️ No packing slip pages found in: {filename}")
+            os.remove(converted_pdf)
+
+    return None
+
+def update_combined_pdf(plan, combined, temp_dir, workers=1, sheet_only=False, header_only=False,
+                        page_cache=None, cache_config=None):
+    """
+    Convert and filter the plan's packing lists that the combined PDF does
+    not already hold, and stage their pages in combined (saved by the caller).
+    Returns the conversion latencies.
+    """
+    jobs = []
+    job_digests = []
+    for filename in plan.packing_lists:
+        digest = plan.digest(filename)
+        if combined.is_current(filename, digest):
+            log.info(f"✅ Unchanged, kept its pages in the combined PDF: {filename}")
+            continue
+
+        full_input_path = plan.path(filename)
+        jobs.append((full_input_path, temp_dir, sheet_only, header_only, page_cache, cache_config,
+                     plan.converted.get(full_input_path)))
+        job_digests.append((filename, digest))
+
+    latencies = []
+    results = list(map_files(convert_and_filter_file, jobs, workers))
+    for (filename, digest), (filtered_pdf, file_latencies) in zip(job_digests, results):
+        if filtered_pdf is False:
+            # Leave it out of the manifest so the next run retries it
+            combined.remove(filename)
+        else:
+            combined.replace(filename, digest, filtered_pdf)
+        latencies.extend(file_latencies)
+
+    return latencies
+
+def run_script_2(excel_path, workers=1, sheet_only=False, header_only=False, page_cache=None,
+                 cache_config=None, plan=None):
     """
     Run the second script (Packing slip extraction and PDF merging)
     """
-    print("\n" + "=" * 60)
-    print("RUNNING SCRIPT 2: Packing slip extraction and PDF merging")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info("RUNNING SCRIPT 2: Packing slip extraction and PDF merging")
+    log.info("=" * 60)
     
     # Import required modules
     import tempfile
-    from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-    import pdfplumber
-    import re
+    from combined_pdf import CombinedPdf
+
+    plan = plan or plan_jobs(excel_path)
 
     def convert_excel_sheets_to_pdf(excel_path):
         """
         Convert specific sheets from Excel files to PDF and merge them
         Sheets must have "PACKING SLIP" as first non-empty words
+
+        Workbooks already in combined_packing_slips.pdf (same content hash
+        in its manifest) keep their pages and are not converted again.
         """
+        output_pdf = os.path.join(excel_path, "combined_packing_slips.pdf")
+        combined = CombinedPdf(output_pdf, _filter_mode(sheet_only, header_only))
+        combined.retain_only(plan.packing_lists)
         
         with tempfile.TemporaryDirectory() as temp_dir:
-            pdf_files = []
-            
-            for filename in os.listdir(excel_path):
-                if (filename.lower().endswith((".xls", ".xlsx", ".xlsm")) and 
-                    "INV" not in filename.upper() and 
-                    "B255" not in filename.upper() and 
-                    "CCI" not in filename.upper()):
-                    
-                    full_input_path = os.path.join(excel_path, filename)
-                    print(f"🔍 Processing: {filename}")
-                    
-                    try:
-                        # Convert entire Excel file to PDF
-                        subprocess.run([
-                            "soffice", 
-                            "--headless", 
-                            "--convert-to", "pdf", 
-                            "--outdir", temp_dir, 
-                            full_input_path
-                        ], check=True, capture_output=True)
-                        
-                        converted_pdf = os.path.join(temp_dir, f"{os.path.splitext(filename)[0]}.pdf")
-                        
-                        if os.path.exists(converted_pdf):
-                            # Filter this individual PDF first to keep only packing slip pages
-                            filtered_pdf = filter_individual_pdf(converted_pdf, temp_dir)
-                            
-                            if filtered_pdf:
-                                pdf_files.append(filtered_pdf)
-                                print(f"✅ Found and filtered packing slip in: {filename}")
-                            else:
-                                print(f"⚠️ No packing slip pages found in: {filename}")
-                                os.remove(converted_pdf)
-                        
-                    except subprocess.CalledProcessError as e:
-                        print(f"❌ Failed to convert {filename}: {e}")
-            
-            # Merge all filtered PDFs
-            if pdf_files:
-                output_pdf = os.path.join(excel_path, "combined_packing_slips.pdf")
-                merger = PdfMerger()
-                
-                for pdf_file in pdf_files:
-                    merger.append(pdf_file)
-                
-                merger.write(output_pdf)
-                merger.close()
-                
-                print(f"📄 Combined {len(pdf_files)} filtered packing slips into: {output_pdf}")
+            latencies = update_combined_pdf(plan, combined, temp_dir, workers, sheet_only, header_only,
+                                            page_cache, cache_config)
+            print_latency_report(latencies)
+
+            # Merge the new segments with the pages kept from the last run
+            count, written = combined.save()
+            if not count:
+                log.error("❌ No packing slips found to combine")
+            elif written:
+                log.info(f"📄 Combined {count} filtered packing slips into: {output_pdf}")
             else:
-                print("❌ No packing slips found to combine")
+                log.info(f"✅ Combined PDF is up to date ({count} packing slips): {output_pdf}")
+
+    convert_excel_sheets_to_pdf(excel_path)
+
+def extract_packing_slip_file(file_path, cache_config=None, workers=1):
+    """
+    Extract the packing slip data from one workbook, from the tables of a
+    PDF packing list (its pages laid out by `workers` processes) or from
+    a scanned or photographed one (OCR'd `workers` tiles at a time).
+    Returns one PackingListRecord per packing slip sheet found.
+    Unchanged files are served from the result cache.
+    """
+    from packing_records import PackingListRecord
+    from result_cache import file_digest
+
+    filename = os.path.basename(file_path)
+    log.info(f"\n==== Reading file: {filename} ====")
+
+    cache = _open_result_cache(cache_config)
+    try:
+        digest = file_digest(file_path) if cache else None
+        cached_records = cache.get_json(digest, "records") if cache else None
+        if cached_records is not None:
+            log.info(f"♻️ Unchanged, reused {len(cached_records)} cached packing list(s)")
+            return [PackingListRecord.from_dict(record) for record in cached_records]
 
-    def filter_individual_pdf(input_pdf_path, temp_dir):
-        """
-        Filter individual PDF to keep only pages with PACKING SLIP
-        """
         try:
-            with pdfplumber.open(input_pdf_path) as pdf:
-                pdf_writer = PdfWriter()
-                pages_kept = 0
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        # Extract text with better configuration
-                        text = page.extract_text(
-                            x_tolerance=1,
-                            y_tolerance=1,
-                            keep_blank_chars=False
-                        )
-                        
-                        if is_packing_slip_page(text):
-                            # Add this page to the output PDF
-                            pdf_reader = PdfReader(input_pdf_path)
-                            pdf_writer.add_page(pdf_reader.pages[page_num])
-                            pages_kept += 1
-                            
-                    except Exception as e:
-                        print(f"❌ Error processing page {page_num + 1} in {os.path.basename(input_pdf_path)}: {e}")
-                        continue
-                
-                # Save filtered PDF if we kept any pages
-                if pages_kept > 0:
-                    filtered_pdf_path = os.path.join(temp_dir, f"filtered_{os.path.basename(input_pdf_path)}")
-                    with open(filtered_pdf_path, 'wb') as output_file:
-                        pdf_writer.write(output_file)
-                    return filtered_pdf_path
-            
-            return None
-            
+            file_records = _extract_packing_slip_records(file_path, workers)
         except Exception as e:
-            print(f"❌ Error filtering PDF {os.path.basename(input_pdf_path)}: {e}")
-            return None
+            log.error(f"Error reading '{filename}': {e}")
+            return []
 
-    def is_packing_slip_page(text):
-        """
-        Check if the text represents a packing slip page
-        by looking for 'PACKING SLIP' in the first meaningful content
-        """
-        if not text:
-            return False
-        
-        # Clean and normalize text
-        text = re.sub(r'\s+', ' ', text.upper().strip())
-        
-        # Split into words and look for "PACKING SLIP" in the first 20 words
-        words = text.split()[:20]
-        text_start = ' '.join(words)
-        
-        # Check if "PACKING SLIP" appears in the beginning of the content
-        if "PACKING SLIP" in text_start:
-            return True
-        
-        return False
+        if cache:
+            cache.put_json(digest, "records", [record.to_dict(full=True) for record in file_records])
+    finally:
+        if cache:
+            cache.close()
 
-    convert_excel_sheets_to_pdf(excel_path)
+    return file_records
+
+def _extract_packing_slip_records(file_path, workers=1):
+    """
+    Extraction for extract_packing_slip_file; errors propagate.
+    .xls is read with xlrd, .xlsx/.xlsm streamed with openpyxl, PDFs go
+    through extract_pdf_packing_lists and images through ocr_packing_lists
+    (see packing_list_extractor.extract_packing_slip).
+    Gives one record per PO block across all packing slip sheets.
+    """
+    from packing_list_extractor import extract_packing_slip
+
+    return extract_packing_slip(file_path, workers, format_po=True)
 
-def run_script_3(excel_path):
+def run_script_3(excel_path, workers=1, cache_config=None, plan=None, output_path=None,
+                 output_format=None, document_paths=()):
     """
     Run the third script (Excel data extraction and JSON output)
+    With output_path the records are also written there as json, ndjson,
+    csv or parquet (see output_writers); otherwise the JSON goes to stdout.
+    PDF and image packing lists in document_paths are extracted after the
+    workbooks, each split into page ranges or OCR tiles over the workers.
+    Returns the extracted records.
     """
-    print("\n" + "=" * 60)
-    print("RUNNING SCRIPT 3: Excel data extraction and JSON output")
-    print("=" * 60)
+    log.info("\n" + "=" * 60)
+    log.info("RUNNING SCRIPT 3: Excel data extraction and JSON output")
+    log.info("=" * 60)
     
     # Import required modules
-    import xlrd
-    import pandas as pd
+    import json
+    from output_writers import open_output_writer
+    from packing_records import RecordAccumulator
+
+    plan = plan or plan_jobs(excel_path)
 
     def extract_and_print_xls_data(directory):
         # List all .xls files in the directory
-        xls_files = [f for f in os.listdir(directory) if f.lower().endswith((".xls", ".xlsx", ".xlsm")) ]
-
-        if not xls_files:
-            print("No .xls files found in the directory.")
-            return
-
-        # Create a list to store all DataFrames
-        all_dfs = []
-
-        for filename in xls_files:
-            file_path = os.path.join(directory, filename)
-            print(f"\n==== Reading file: {filename} ====")
-
-            try:
-                workbook = xlrd.open_workbook(file_path)
-
-                # Flag to track if we've found a packing slip in this file
-                packing_slip_found = False
-                
-                for sheet in workbook.sheets():
-                    print(f"\n-- Sheet: {sheet.name} --")
-                    
-                    # Skip if we already found a packing slip in this file
-                    if packing_slip_found:
-                        print("Skipping sheet - already found a packing slip in this file")
-                        continue
-                    
-                    # Check if this sheet has 'PACKING SLIP' as the first non-empty cell
-                    has_packing_slip = False
-                    for row_idx in range(min(5, sheet.nrows)):  # Check first 5 rows
-                        row_values = [str(cell.value).strip() for cell in sheet.row(row_idx)]
-                        if 'PACKING SLIP' in row_values:
-                            has_packing_slip = True
-                            break
-                    
-                    if not has_packing_slip:
-                        print("Skipping sheet - 'PACKING SLIP' not found in header")
-                        continue
-                    
-                    # Mark that we found a packing slip in this file
-                    packing_slip_found = True
-                    
-                    # Extract PO number using the specific pattern from your example
-                    po_number = None
-                    all_rows = []
-                    colors_list = []  # List to store colors list from SUB TOTAL rows
-                    cartons_list = []  # List to store cartons from SUB TOTAL rows
-                    pieces_list = []  # List to store pieces from SUB TOTAL rows
-                    total_gross_weight_list = []  # List to store total gross weight from SUB TOTAL rows
-                    
-                    # Find column indices for cartons, pieces, and total gross weight
-                    cartons_col_index = None
-                    pieces_col_index = None
-                    total_gross_weight_col_index = None
-                    
-                    for row_idx in range(sheet.nrows):
-                        row_values = [cell.value for cell in sheet.row(row_idx)]
-                        all_rows.append(row_values)
-                        
-                        # Look for the specific header row pattern
-                        if (len(row_values) > 2 and 
-                            'PO' in str(row_values) and 
-                            'STYLE' in str(row_values) and 
-                            'COLOR' in str(row_values)):
-                            
-                            # Check next row for the actual data
-                            if row_idx + 1 < sheet.nrows:
-                                next_row = [cell.value for cell in sheet.row(row_idx + 1)]
-                                
-                                # Find PO column index
-                                po_col_index = None
-                                for i, cell_value in enumerate(row_values):
-                                    if str(cell_value).strip() == 'PO':
-                                        po_col_index = i
-                                        break
-                                
-                                # Extract PO number from next row
-                                if po_col_index is not None and po_col_index < len(next_row):
-                                    po_candidate = next_row[po_col_index]
-                                    if po_candidate and str(po_candidate).strip():
-                                        po_number = str(po_candidate).strip()
-                                        print(f"*** FOUND PO NUMBER: {po_number} ***")
-                                    # Format PO number: if starts with "IT" or "OT" and doesn't have "-" right after
-                                    if (po_number.startswith(('IT', 'OT')) and 
-                                        not (len(po_number) > 2 and po_number[2] == '-')):
-                                        
-                                        # Remove everything after existing "-" if present
-                                        if '-' in po_number:
-                                            po_number = po_number.split('-')[0]
-                                        
-                                        # Insert "-" after 2 characters
-                                        if len(po_number) > 2:
-                                            po_number = po_number[:2] + "-" + po_number[2:]
-                                        
-                                    print(f"*** FORMATTED PO NUMBER: {po_number} ***")
-
-                        
-                        # Find column indices for cartons, pieces, and total gross weight
-                        if ('# CARTONS' in str(row_values) and 
-                            'TOTAL PIECES' in str(row_values) and 
-                            'TOTAL G.W(kg)' in str(row_values)):
-                            
-                            for i, cell_value in enumerate(row_values):
-                                cell_str = str(cell_value).strip()
-                                if cell_str == '# CARTONS':
-                                    cartons_col_index = i
-                                elif cell_str == 'TOTAL PIECES':
-                                    pieces_col_index = i
-                                elif cell_str == 'TOTAL G.W(kg)':
-                                    total_gross_weight_col_index = i
-                            
-                            print(f"*** FOUND COLUMN INDICES - Cartons: {cartons_col_index}, Pieces: {pieces_col_index}, Total GW: {total_gross_weight_col_index} ***")
-                        
-                        # Extract data from rows starting with 'SUB TOTAL'
-                        if (len(row_values) > 2 and 
-                            str(row_values[0]).strip() == 'SUB TOTAL' and 
-                            row_values[2] and str(row_values[2]).strip()):
-                            
-                            color = str(row_values[2]).strip()
-                            colors_list.append(color)
-                            print(f"*** FOUND COLOR: {color} ***")
-                            
-                            # Extract cartons
-                            if cartons_col_index is not None and cartons_col_index < len(row_values):
-                                cartons_value = row_values[cartons_col_index]
-                                if cartons_value and str(cartons_value).strip():
-                                    # Convert to integer
-                                    cartons_int = int(float(cartons_value))
-                                    cartons_list.append(cartons_int)
-                                    print(f"*** FOUND CARTONS: {cartons_int} ***")
-                            
-                            # Extract pieces
-                            if pieces_col_index is not None and pieces_col_index < len(row_values):
-                                pieces_value = row_values[pieces_col_index]
-                                if pieces_value and str(pieces_value).strip():
-                                    # Convert to integer
-                                    pieces_int = int(float(pieces_value))
-                                    pieces_list.append(pieces_int)
-                                    print(f"*** FOUND PIECES: {pieces_int} ***")
-                            
-                            # Extract total gross weight
-                            if total_gross_weight_col_index is not None and total_gross_weight_col_index < len(row_values):
-                                total_gross_weight_value = row_values[total_gross_weight_col_index]
-                                if total_gross_weight_value and str(total_gross_weight_value).strip():
-                                    # Format to 3 decimal places
-                                    formatted_weight = f"{float(total_gross_weight_value):.3f}"
-                                    total_gross_weight_list.append(formatted_weight)
-                                    print(f"*** FOUND TOTAL GROSS WEIGHT: {formatted_weight} ***")
-                    
-                    # Print all rows
-                    for row in all_rows:
-                        print(row)
-                    
-                    if po_number:
-                        print(f"\n*** EXTRACTED PO NUMBER: {po_number} ***")
-                    else:
-                        print("\n*** PO NUMBER NOT FOUND ***")
-                    
-                    # Print extracted colors_list
-                    if colors_list:
-                        colors_str = ', '.join(colors_list)
-                        print(f"*** EXTRACTED COLORS: [{colors_str}] ***")
-                    else:
-                        print("*** NO COLORS FOUND ***")
-                    
-                    # Print extracted cartons
-                    if cartons_list:
-                        cartons_str = ', '.join([str(c) for c in cartons_list])
-                        print(f"*** EXTRACTED CARTONS: [{cartons_str}] ***")
-                    else:
-                        print("*** NO CARTONS FOUND ***")
-                    
-                    # Print extracted pieces
-                    if pieces_list:
-                        pieces_str = ', '.join([str(p) for p in pieces_list])
-                        print(f"*** EXTRACTED PIECES: [{pieces_str}] ***")
-                    else:
-                        print("*** NO PIECES FOUND ***")
-                    
-                    # Print extracted total gross weight
-                    if total_gross_weight_list:
-                        total_gross_weight_str = ', '.join(total_gross_weight_list)
-                        print(f"*** EXTRACTED TOTAL GROSS WEIGHT: [{total_gross_weight_str}] ***")
-                    else:
-                        print("*** NO TOTAL GROSS WEIGHT FOUND ***")
-
-                    # Create DataFrame for this packing list sheet (ONE ROW PER FILE)
-                    if po_number:  # Only create DataFrame if we found a PO number
-                        df_data = {
-                            'PO_Number': [po_number],
-                            'Colors': [colors_list],
-                            'Cartons': [cartons_list],
-                            'Pieces': [pieces_list],
-                            'Total_Gross_Weight': [total_gross_weight_list]
-                        }
-                        
-                        df = pd.DataFrame(df_data)
-                        all_dfs.append(df)
-                        print(f"\n*** CREATED DATAFRAME FOR {filename} - {sheet.name} ***")
-                        print(df)
-
-            except Exception as e:
-                print(f"Error reading '{filename}': {e}")
-
-        # Combine all DataFrames into one master DataFrame
-        if all_dfs:
-            master_df = pd.concat(all_dfs, ignore_index=True)
-            print(f"\n{'='*50}")
-            print("MASTER DATAFRAME SUMMARY:")
-            print(f"{'='*50}")
-            print(f"Total files processed: {len(xls_files)}")
-            print(f"Total packing lists found: {len(all_dfs)}")
-            print(f"Master DataFrame shape: {master_df.shape}")
-            print(f"\nMaster DataFrame:")
-            print(master_df)
-
-            # Export to JSON and print
-            json_output = master_df.to_json(orient='records', indent=2)
-            print(json_output)
-            
-            # # Save to CSV
-            # output_csv = os.path.join(directory, "packing_lists_summary.csv")
-            # master_df.to_csv(output_csv, index=False)
-            # print(f"\n*** Master DataFrame saved to: {output_csv} ***")
+        xls_files = plan.workbooks
+
+        if not xls_files and not document_paths:
+            log.info("No .xls files found in the directory.")
+            return []
+
+        # Create a list to store all packing list records, plus their
+        # columns for the master DataFrame
+        all_records = []
+        accumulator = RecordAccumulator()
+
+        writer = open_output_writer(output_path, output_format) if output_path else None
+        try:
+            jobs = [(os.path.join(directory, filename), cache_config) for filename in xls_files]
+            # One PDF or image at a time, its pages or tiles spread over the workers
+            document_records = (extract_packing_slip_file(document_path, cache_config, workers)
+                                for document_path in document_paths)
+            for file_records in itertools.chain(map_files(extract_packing_slip_file, jobs, workers),
+                                                document_records):
+                all_records.extend(file_records)
+                accumulator.extend(file_records)
+                if writer:
+                    # Stream each workbook's records as soon as it is done
+                    writer.write_records(file_records)
+        finally:
+            if writer:
+                writer.close()
+
+        run_report.count("records_extracted", len(all_records))
+        if writer:
+            log.info(f"\n💾 Wrote {len(all_records)} packing list(s) to: {output_path}")
+
+        # Build the master DataFrame (one row per color) in a single pass
+        if all_records:
+            master_df = accumulator.to_dataframe()
+            log.info(f"\n{'='*50}")
+            log.info("MASTER DATAFRAME SUMMARY:")
+            log.info(f"{'='*50}")
+            log.info(f"Total files processed: {len(xls_files) + len(document_paths)}")
+            log.info(f"Total packing lists found: {len(all_records)}")
+            log.info(f"Master DataFrame shape: {master_df.shape}")
+            log.debug("\nMaster DataFrame:")
+            log.debug("%s", master_df)
+
+            # Export to JSON and print, unless it went to a file
+            if not output_path:
+                json_output = json.dumps([record.to_dict() for record in all_records], indent=2)
+                print(json_output)
         else:
-            print("\n*** No packing list data found to create DataFrame ***")
+            log.info("\n*** No packing list data found to create DataFrame ***")
+        return all_records
+
+    return extract_and_print_xls_data(excel_path)
+
+def run_reconciliation(plan, records, report_path=None):
+    """
+    Compare the line items of the folder's invoice workbooks with the
+    packing lists extracted by script 3 (see reconcile)
+    """
+    log.info("\n" + "=" * 60)
+    log.info("RUNNING RECONCILIATION: invoice against packing lists")
+    log.info("=" * 60)
+
+    from reconcile import log_reconciliation, read_invoice, reconcile, write_report
+
+    invoices = []
+    for filename in plan.invoices:
+        if filename.startswith("~$"):
+            # Office lock file of an open workbook
+            continue
+        try:
+            invoices.append(read_invoice(plan.path(filename)))
+        except Exception as e:
+            log.error(f"❌ Failed to read invoice {filename}: {e}")
+    if not invoices:
+        log.warning("⚠️ No invoice to reconcile against")
+        return
+
+    report = reconcile(invoices, records)
+    log_reconciliation(report)
+    if report_path:
+        write_report(report, report_path)
+
+def run_watch_mode(excel_path, workers=1, sheet_only=False, header_only=False, page_cache=None,
+                   cache_config=None, settle=3.0):
+    """
+    Watch excel_path and keep combined_packing_slips.pdf and
+    packing_lists_summary.json up to date as workbooks are added, changed
+    or deleted. Only the affected workbooks are reprocessed; the pages and
+    records of every other workbook are kept from earlier passes.
+    """
+    import json
+    import tempfile
+    from combined_pdf import CombinedPdf
+    from watch_folder import watch_folder
+
+    output_pdf = os.path.join(excel_path, "combined_packing_slips.pdf")
+    combined = CombinedPdf(output_pdf, _filter_mode(sheet_only, header_only))
+    file_records = {}   # filename -> list of PackingListRecord
+
+    def save_combined_pdf():
+        count, written = combined.save()
+        if written and count:
+            log.info(f"📄 Combined {count} filtered packing slips into: {output_pdf}")
+        elif written:
+            log.info("🗑️ No packing slips left, removed combined PDF")
+
+    def write_summary_json():
+        output_json = os.path.join(excel_path, "packing_lists_summary.json")
+        all_records = [record.to_dict() for name in sorted(file_records) for record in file_records[name]]
+        if all_records:
+            with open(output_json, "w", encoding="utf-8") as f:
+                json.dump(all_records, f, indent=2)
+            log.info(f"📝 Wrote {len(all_records)} packing list(s) to: {output_json}")
+        elif os.path.exists(output_json):
+            os.remove(output_json)
+            log.info("🗑️ No packing lists left, removed JSON summary")
 
-    extract_and_print_xls_data(excel_path)
+    def process_changes(changed, removed):
+        log.info("\n" + "=" * 60)
+        log.info(f"🔄 {len(changed)} changed, {len(removed)} removed")
+        log.info("=" * 60)
+
+        _start_run()
+        for filename in removed:
+            log.info(f"➖ Removed: {filename}")
+            combined.remove(filename)
+            file_records.pop(filename, None)
+
+        plan = JobPlan(excel_path, changed)
+        latencies = []
+        try:
+            with tempfile.TemporaryDirectory(dir=work_dir) as pass_dir:
+                try:
+                    run_batch_conversion(plan, pass_dir, workers, sheet_only, header_only, cache_config)
+
+                    invoice_jobs = [(plan.path(filename), excel_path, cache_config,
+                                     plan.converted.get(plan.path(filename)))
+                                    for filename in plan.invoices if _convert_invoices]
+                    for file_latencies in map_files(convert_invoice_file, invoice_jobs, workers):
+                        latencies.extend(file_latencies)
+
+                    latencies.extend(update_combined_pdf(plan, combined, pass_dir, workers, sheet_only,
+                                                         header_only, page_cache, cache_config))
+                finally:
+                    # The staged pages live in pass_dir, so write them out before it goes away
+                    save_combined_pdf()
+
+            extract_jobs = [(plan.path(filename), cache_config) for filename in changed]
+            results = list(map_files(extract_packing_slip_file, extract_jobs, workers))
+            for filename, records in zip(changed, results):
+                file_records[filename] = records
+        except Exception as e:
+            # Keep watching; the next change to the folder retries
+            log.error(f"\n❌ ERROR: {e}")
+
+        print_latency_report(latencies)
+        write_summary_json()
+
+    # Workbooks deleted while nobody was watching
+    combined.retain_only([filename for filename in os.listdir(excel_path) if is_workbook(filename)])
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        watch_folder(excel_path, process_changes, settle=settle)
 
 def main():
     """
     Main function to run all three scripts sequentially
     """
+    parser = argparse.ArgumentParser(description="Convert, filter and extract packing lists")
     # Set your input directory here
-    excel_path = "/home/pritom/Desktop/Packing List Extraction/Demo"
+    parser.add_argument("excel_path", nargs="?",
+                        default="/home/pritom/Desktop/Packing List Extraction/Demo",
+                        help="Folder containing the Excel workbooks")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Process workbooks in parallel with N worker processes")
+    parser.add_argument("--sheet-only", action="store_true",
+                        help="Render only the PACKING SLIP sheets instead of whole workbooks")
+    parser.add_argument("--header-only", action="store_true",
+                        help="Classify pages from the text in their header band only")
+    parser.add_argument("--renderer", choices=RENDERERS, default="soffice",
+                        help="Render packing slip sheets with LibreOffice or natively in-process "
+                             "(native implies --sheet-only; invoices still need soffice and are "
+                             "skipped without it)")
+    parser.add_argument("--page-cache", metavar="PATH",
+                        help="SQLite file caching page decisions by content hash")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Reprocess every workbook instead of reusing cached results")
+    parser.add_argument("--cache", metavar="PATH", default=DEFAULT_CACHE_PATH,
+                        help="SQLite file holding cached PDFs and extracted records")
+    parser.add_argument("--cache-size", metavar="MB", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Evict least recently used cache entries beyond this size")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the extracted packing lists to this file instead of stdout")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS,
+                        help="Output format (default: from the --output extension)")
+    parser.add_argument("--pdf-packing-list", metavar="PDF", action="append", default=[],
+                        help="Also extract this PDF packing list in script 3 (repeatable)")
+    parser.add_argument("--image-packing-list", metavar="IMAGE", action="append", default=[],
+                        help="Also OCR this scanned or photographed packing slip in script 3 "
+                             "(repeatable; needs tesseract)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and reprocess workbooks as they change")
+    parser.add_argument("--settle", metavar="SECONDS", type=float, default=3.0,
+                        help="In watch mode, wait until a file is unchanged this long")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Check the invoice line items against the extracted packing lists")
+    parser.add_argument("--reconcile-report", metavar="PATH",
+                        help="Write the reconciliation result to this JSON file (implies --reconcile)")
+    parser.add_argument("--report", metavar="PATH",
+                        help="Write a JSON run report (per-stage and per-step timings, I/O, memory, page counts)")
+    parser.add_argument("--profile", metavar="WORKBOOK",
+                        help="Run each per-file step of this workbook under cProfile")
+    parser.add_argument("--profile-dir", metavar="DIR", default=".",
+                        help="Where --profile writes its .prof files")
+    add_conversion_arguments(parser)
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+    excel_path = args.excel_path
+
+    # Catch a bad output setting before any conversion work is done
+    if args.output:
+        try:
+            output_format = infer_format(args.output, args.format)
+        except ValueError as e:
+            parser.error(str(e))
+        if output_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+    elif args.format:
+        parser.error("--format needs --output")
+    if args.report and args.watch:
+        parser.error("--report covers a single run and cannot be used with --watch")
+    if (args.pdf_packing_list or args.image_packing_list) and args.watch:
+        parser.error("--pdf-packing-list and --image-packing-list cannot be used with --watch")
+    if args.image_packing_list:
+        from ocr_packing_lists import tesseract_available
+
+        if not tesseract_available():
+            parser.error("--image-packing-list needs tesseract (apt install tesseract-ocr)")
+    if args.profile:
+        run_report.set_profile_target(args.profile, args.profile_dir)
+    global _converter_options
+    _converter_options = converter_options_from_args(args)
+    _start_run()
+    if args.renderer == "native":
+        global _sheet_renderer, _convert_invoices
+        _sheet_renderer = "native"
+        args.sheet_only = True
+        _convert_invoices = soffice_available()
+        if not _convert_invoices and args.watch:
+            log.warning("⚠️ soffice not found, invoices will not be converted")
+    cache_config = None if args.no_cache else (args.cache, args.cache_size * 1024 * 1024)
     
-    print("🚀 STARTING ALL SCRIPTS")
-    print(f"📁 Input Directory: {excel_path}")
+    if args.watch:
+        run_watch_mode(excel_path, args.workers, args.sheet_only, args.header_only, args.page_cache,
+                       cache_config, args.settle)
+        return
+
+    report = run_report.start_report() if args.report else None
+
+    log.info("🚀 STARTING ALL SCRIPTS")
+    log.info(f"📁 Input Directory: {excel_path}")
     
     try:
-        # Run Script 1
-        run_script_1(excel_path)
-        
-        # Run Script 2  
-        run_script_2(excel_path)
+        # Scan and classify the folder once for every stage
+        with run_report.stage("scan"):
+            plan = plan_jobs(excel_path)
+
+        with tempfile.TemporaryDirectory() as batch_dir:
+            # Convert the workbooks of scripts 1 and 2 together
+            with run_report.stage("batch_conversion"):
+                run_batch_conversion(plan, batch_dir, args.workers, args.sheet_only, args.header_only,
+                                     cache_config)
+
+            # Run Script 1
+            with run_report.stage("script_1"):
+                run_script_1(excel_path, args.workers, cache_config, plan)
+            
+            # Run Script 2  
+            with run_report.stage("script_2"):
+                run_script_2(excel_path, args.workers, args.sheet_only, args.header_only, args.page_cache,
+                             cache_config, plan)
         
         # Run Script 3
-        run_script_3(excel_path)
+        with run_report.stage("script_3"):
+            records = run_script_3(excel_path, args.workers, cache_config, plan, args.output, args.format,
+                                   args.pdf_packing_list + args.image_packing_list)
+
+        if args.reconcile or args.reconcile_report:
+            with run_report.stage("reconcile"):
+                run_reconciliation(plan, records, args.reconcile_report)
         
-        print("\n" + "=" * 60)
-        print("✅ ALL SCRIPTS COMPLETED SUCCESSFULLY!")
-        print("=" * 60)
+        log.info("\n" + "=" * 60)
+        log.info("✅ ALL SCRIPTS COMPLETED SUCCESSFULLY!")
+        log.info("=" * 60)
         
     except Exception as e:
-        print(f"\n❌ ERROR: {e}")
+        log.error(f"\n❌ ERROR: {e}")
         sys.exit(1)
+    finally:
+        if report:
+            report.write(args.report)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Importable API over the extraction scripts.
+
+    from packing_list_extractor import extract_packing_slip
+    records = extract_packing_slip("IT50811-CA.xls")
+
+Importing the package is cheap: xlrd, openpyxl, pdfplumber, PyPDF2, pandas
+and PIL are only imported by the functions that need them. The modules
+behind it are the top-level scripts of this repository; `pip install .`
+installs them next to the package (and the `packing-list-extractor`
+command), otherwise run from the repository root.
+"""
+
+__all__ = ["extract_packing_slip", "filter_packing_slip_pages", "convert_to_pdf"]
+
+
+def extract_packing_slip(path, workers=1, format_po=True):
+    """
+    PackingListRecords (one per PO block) of one workbook, PDF packing
+    list or scanned/photographed packing slip; errors propagate.
+    workers lays out PDF page ranges or OCRs image tiles in parallel.
+    """
+    import os
+
+    from job_planner import IMAGE_EXTENSIONS
+
+    lower = path.lower()
+    if lower.endswith(".pdf"):
+        from extract_pdf_packing_lists import pdf_packing_slip_records
+
+        return pdf_packing_slip_records(path, workers, format_po=format_po)
+    if lower.endswith(IMAGE_EXTENSIONS):
+        from ocr_packing_lists import image_packing_slip_records
+
+        return image_packing_slip_records(path, workers, format_po=format_po)
+
+    from extract_packing_lists import workbook_packing_slip_records
+    from workbook_reader import open_workbook
+
+    # Load sheets lazily so only the ones we look at are parsed
+    workbook = open_workbook(path)
+    try:
+        return list(workbook_packing_slip_records(workbook, os.path.basename(path), format_po=format_po))
+    finally:
+        workbook.close()
+
+
+def filter_packing_slip_pages(pdf, header_only=False):
+    """
+    0-based numbers of the packing slip pages of a PDF (a path or a binary
+    file object); header_only reads just the top band of each page
+    """
+    from merge_packing_lists import packing_slip_pages
+
+    return packing_slip_pages(pdf, header_only)
+
+
+def convert_to_pdf(path, output_dir, sheets=None, renderer="soffice", **converter_options):
+    """
+    Convert a workbook to PDF in output_dir and return the PDF's path.
+    With sheets, only those sheets are rendered (LibreOffice renders the
+    whole workbook when its UNO bridge is unavailable). renderer "native"
+    draws the sheets in-process instead (see sheet_renderer);
+    converter_options go to SofficeConverter (timeout, retries,
+    quarantine_path, ...).
+    """
+    if renderer == "native":
+        from sheet_renderer import NativeSheetRenderer
+
+        converter = NativeSheetRenderer()
+    else:
+        from soffice_converter import SofficeConverter
+
+        converter = SofficeConverter(**converter_options)
+
+    with converter:
+        output_pdf, _ = converter.convert_sheets(path, output_dir, sheets)
+    return output_pdf
@@ -0,0 +1,3 @@
+from packing_list_extractor.cli import main
+
+main()
@@ -0,0 +1,40 @@
+import sys
+import argparse
+import importlib
+
+# Subcommand: (script module whose main() runs it, summary). Modules are
+# imported only once their subcommand is picked, so `--help` and every
+# single-stage run skip the heavy imports of the others.
+COMMANDS = {
+    "run": ("packing_list_all_processes", "Convert, filter and extract a folder of workbooks (all stages)"),
+    "invoices": ("convert_invoice", "Convert the invoice workbooks of a folder to PDF"),
+    "merge": ("merge_packing_lists", "Merge the packing slip pages of a folder into one PDF"),
+    "extract": ("extract_packing_lists", "Extract the packing lists of a folder of workbooks"),
+    "extract-pdf": ("extract_pdf_packing_lists", "Extract packing lists from the tables of PDFs"),
+    "ocr": ("ocr_packing_lists", "Extract packing lists from scanned or photographed packing slips"),
+    "reconcile": ("reconcile", "Check invoice line items against the packing lists"),
+    "serve": ("extraction_service", "Run the local HTTP extraction service"),
+    "quarantine": ("quarantine", "List or release workbooks that keep failing to convert"),
+}
+
+
+def main(argv=None):
+    epilog = "commands:\n" + "\n".join(f"  {name:<12} {summary}" for name, (_, summary) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="packing_list_extractor",
+        description="Packing list extraction. Run `COMMAND --help` for the options of a command.",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="COMMAND",
+                        help="One of the commands below")
+    parser.add_argument("args", nargs=argparse.REMAINDER,
+                        help="Arguments of the command")
+    args = parser.parse_args(argv)
+
+    module_name, _ = COMMANDS[args.command]
+    module = importlib.import_module(module_name)
+
+    # The command parses its own arguments, under its subcommand name
+    sys.argv = [f"{parser.prog} {args.command}"] + args.args
+    return module.main()
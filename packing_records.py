@@ -0,0 +1,148 @@
+from array import array
+
+import run_report
+
+# Per-color columns built by RecordAccumulator.to_dataframe
+COLOR_COLUMNS = ["PO_Number", "Color", "Cartons", "Pieces", "Total_Gross_Weight", "Source_File", "Sheet"]
+
+
+class PackingListRecord:
+    """
+    One PO block of a packing slip (a sheet can hold several): its PO and
+    the per-color SUB TOTAL values
+    """
+
+    __slots__ = ("po_number", "colors", "cartons", "pieces", "gross_weights", "source_file", "sheet")
+
+    def __init__(self, po_number, colors, cartons, pieces, gross_weights, source_file=None, sheet=None):
+        self.po_number = po_number
+        self.colors = colors
+        self.cartons = cartons
+        self.pieces = pieces
+        self.gross_weights = gross_weights
+        self.source_file = source_file
+        self.sheet = sheet
+
+    def __repr__(self):
+        return (f"PackingListRecord(po_number={self.po_number!r}, colors={self.colors!r}, "
+                f"cartons={self.cartons!r}, pieces={self.pieces!r}, "
+                f"gross_weights={self.gross_weights!r}, source_file={self.source_file!r}, "
+                f"sheet={self.sheet!r})")
+
+    def to_dict(self, full=False):
+        """
+        The JSON shape of one packing list, as the scripts have always printed
+        it: gross weights as "%.3f" strings and no source keys. With full=True
+        the weights stay floats and Source_File/Sheet are added (the result
+        cache keeps that form).
+        """
+        if not full:
+            return {
+                "PO_Number": self.po_number,
+                "Colors": self.colors,
+                "Cartons": self.cartons,
+                "Pieces": self.pieces,
+                "Total_Gross_Weight": [f"{weight:.3f}" for weight in self.gross_weights],
+            }
+        return {
+            "PO_Number": self.po_number,
+            "Colors": self.colors,
+            "Cartons": self.cartons,
+            "Pieces": self.pieces,
+            "Total_Gross_Weight": self.gross_weights,
+            "Source_File": self.source_file,
+            "Sheet": self.sheet,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Read either shape of to_dict back
+        """
+        return cls(data["PO_Number"], data["Colors"], data["Cartons"], data["Pieces"],
+                   [float(weight) for weight in data["Total_Gross_Weight"]],
+                   data.get("Source_File"), data.get("Sheet"))
+
+
+def _item(values, index):
+    return values[index] if index < len(values) else None
+
+
+class RecordAccumulator:
+    """
+    Collects packing list records into typed column arrays, one entry per
+    color, and turns them into a DataFrame (or Arrow table) in one build.
+
+    Cartons and pieces are int64 with a missing-value mask, gross weight is
+    float64 (NaN when missing); PO, color, file and sheet stay strings.
+    """
+
+    def __init__(self):
+        self.po_numbers = []
+        self.colors = []
+        self.cartons = array("q")
+        self.pieces = array("q")
+        self.cartons_missing = bytearray()
+        self.pieces_missing = bytearray()
+        self.gross_weights = array("d")
+        self.source_files = []
+        self.sheets = []
+        self.record_count = 0
+
+    def __len__(self):
+        return self.record_count
+
+    def _append_row(self, record, color, cartons, pieces, weight):
+        self.po_numbers.append(record.po_number)
+        self.colors.append(color)
+        self.cartons.append(0 if cartons is None else cartons)
+        self.cartons_missing.append(cartons is None)
+        self.pieces.append(0 if pieces is None else pieces)
+        self.pieces_missing.append(pieces is None)
+        self.gross_weights.append(float("nan") if weight is None else weight)
+        self.source_files.append(record.source_file)
+        self.sheets.append(record.sheet)
+
+    def add(self, record):
+        self.record_count += 1
+        for index, color in enumerate(record.colors):
+            self._append_row(record, color, _item(record.cartons, index), _item(record.pieces, index),
+                             _item(record.gross_weights, index))
+
+        if not record.colors:
+            # Keep PO-only records; they show up as a row without a color
+            self._append_row(record, None, None, None, None)
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def to_dataframe(self):
+        """
+        One row per color with Int64/float64 numeric columns
+        """
+        import numpy as np
+        import pandas as pd
+
+        def ints(values, missing):
+            return pd.arrays.IntegerArray(np.frombuffer(values, dtype=np.int64).copy(),
+                                          np.frombuffer(missing, dtype=np.bool_).copy())
+
+        with run_report.step("dataframe_build"):
+            return pd.DataFrame({
+                "PO_Number": self.po_numbers,
+                "Color": self.colors,
+                "Cartons": ints(self.cartons, self.cartons_missing),
+                "Pieces": ints(self.pieces, self.pieces_missing),
+                "Total_Gross_Weight": np.frombuffer(self.gross_weights, dtype=np.float64).copy(),
+                "Source_File": self.source_files,
+                "Sheet": self.sheets,
+            }, columns=COLOR_COLUMNS)
+
+    def to_arrow(self):
+        """
+        The same table as to_dataframe as a pyarrow Table. Needs pyarrow.
+        """
+        import pyarrow  # type: ignore
+
+        return pyarrow.Table.from_pandas(self.to_dataframe(), preserve_index=False)
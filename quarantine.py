@@ -0,0 +1,147 @@
+import os
+import time
+import logging
+import sqlite3
+import argparse
+
+from logging_setup import add_logging_arguments, configure_logging_from_args
+
+log = logging.getLogger(__name__)
+
+DEFAULT_QUARANTINE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "packing-list-extractor", "quarantine.sqlite"
+)
+
+# Runs in a row in which a workbook failed to convert before it is skipped
+DEFAULT_MAX_FAILURES = 2
+
+
+class Quarantine:
+    """
+    SQLite list of workbooks that keep failing to convert, keyed by content
+    hash so an edited file gets a fresh chance.
+
+    Every failed run (after its retries) adds one failure, however many
+    stages or workers of that run saw the workbook fail (see run_id in
+    record_failure). A successful conversion clears the entry, and a workbook with max_failures or more is
+    skipped instead of tying up soffice until its timeout again.
+    """
+
+    def __init__(self, path=DEFAULT_QUARANTINE_PATH, max_failures=DEFAULT_MAX_FAILURES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_failures = max_failures
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS failures (
+                digest TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                failures INTEGER NOT NULL,
+                last_error TEXT NOT NULL,
+                last_failure REAL NOT NULL,
+                last_run TEXT
+            )
+        """)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(failures)")]
+        if "last_run" not in columns:
+            # Lists written before failures were counted per run
+            self.connection.execute("ALTER TABLE failures ADD COLUMN last_run TEXT")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def failures(self, digest):
+        row = self.connection.execute(
+            "SELECT failures FROM failures WHERE digest = ?", (digest,)
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def is_quarantined(self, digest):
+        return self.failures(digest) >= self.max_failures
+
+    def record_failure(self, digest, filename, error, run_id=None):
+        """
+        Count one more failed run for a workbook; returns its failure count.
+        A failure with the same run_id as the last one recorded is not
+        counted again.
+        """
+        with self.connection:
+            self.connection.execute("""
+                INSERT INTO failures (digest, file, failures, last_error, last_failure, last_run)
+                VALUES (?, ?, 1, ?, ?, ?)
+                ON CONFLICT (digest) DO UPDATE SET
+                    file = excluded.file,
+                    failures = failures + (excluded.last_run IS NULL OR last_run IS NOT excluded.last_run),
+                    last_error = excluded.last_error,
+                    last_failure = excluded.last_failure,
+                    last_run = excluded.last_run
+            """, (digest, filename, str(error), time.time(), run_id))
+        return self.failures(digest)
+
+    def clear(self, digest):
+        with self.connection:
+            self.connection.execute("DELETE FROM failures WHERE digest = ?", (digest,))
+
+    def release(self, filename=None):
+        """
+        Forget the failures of every entry for filename, or of all entries;
+        returns how many were released
+        """
+        with self.connection:
+            if filename is None:
+                cursor = self.connection.execute("DELETE FROM failures")
+            else:
+                cursor = self.connection.execute("DELETE FROM failures WHERE file = ?", (filename,))
+        return cursor.rowcount
+
+    def entries(self):
+        """
+        (file, failures, last_error, last_failure) of every entry, most
+        recent failure first
+        """
+        return self.connection.execute(
+            "SELECT file, failures, last_error, last_failure FROM failures ORDER BY last_failure DESC"
+        ).fetchall()
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or release workbooks that keep failing to convert")
+    parser.add_argument("--quarantine", metavar="PATH", default=DEFAULT_QUARANTINE_PATH,
+                        help="SQLite file holding the quarantine list")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--release", metavar="FILENAME",
+                       help="Give this workbook another chance on the next run")
+    group.add_argument("--release-all", action="store_true",
+                       help="Empty the quarantine list")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    with Quarantine(args.quarantine) as quarantine:
+        if args.release or args.release_all:
+            released = quarantine.release(args.release)
+            log.info(f"✅ Released {released} entr{'y' if released == 1 else 'ies'}")
+            return
+
+        entries = quarantine.entries()
+        if not entries:
+            log.info("✅ Quarantine list is empty")
+            return
+
+        for filename, failures, last_error, last_failure in entries:
+            state = "🚫 quarantined" if failures >= quarantine.max_failures else "⚠️ failing"
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_failure))
+            log.info(f"{state}: {filename} ({failures} failed run(s), last {when}): {last_error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+import os
+import re
+import sys
+import json
+import logging
+import argparse
+
+from logging_setup import add_logging_arguments, configure_logging_from_args
+import run_report
+from extract_packing_lists import format_po_number
+from job_planner import INVOICE, PACKING_LIST, classify_workbook, is_workbook
+from output_writers import infer_format
+from packing_records import PackingListRecord, RecordAccumulator
+from workbook_reader import open_workbook
+
+log = logging.getLogger(__name__)
+
+# An order number such as IT-51093 or OT51093 in an invoice line
+PO_PATTERN = re.compile(r"[A-Z]{2}-?\d{4,}")
+
+# Words allowed between the numbers of an invoice line
+UNIT_TOKENS = {"PCS", "/PCS", "PC", "SETS", "PRS", "CTN", "CTNS", "US$", "USD", "$", "KGS", "KG", "CBM"}
+
+# A number with the currency or unit a PDF prints glued to it: 4,505PCS, $3.30, 966.77KGS
+NUMBER_PATTERN = re.compile(r"(US\$|USD|\$)?(\d[\d,]*(?:\.\d+)?)(/?PCS|PC|SETS|PRS|CTNS?|KGS?|CBM)?",
+                            re.IGNORECASE)
+CURRENCY_TOKENS = {"US$", "USD", "$"}
+
+# The shipment total a unit labels
+UNIT_FIELDS = {"PCS": "pieces", "PC": "pieces", "SETS": "pieces", "PRS": "pieces",
+               "CTN": "cartons", "CTNS": "cartons", "US$": "amount", "USD": "amount", "$": "amount"}
+
+# Shipment totals printed below the line items, and on the EXP form. Values
+# labelled with a unit go to the field it names; the rest fill the
+# remaining fields in order.
+TOTAL_PATTERNS = [
+    (re.compile(r"\bTOTAL\s*:\s*(.*)", re.IGNORECASE), ("pieces", "cartons", "amount")),
+    (re.compile(r"\bTTL\.?\s*CTNS?\s*:\s*(.*)", re.IGNORECASE), ("cartons",)),
+    (re.compile(r"\bGRS\.?\s*WT\s*:\s*(.*)", re.IGNORECASE), ("gross_weight",)),
+    (re.compile(r"\bNET\.?\s*WT\s*:\s*(.*)", re.IGNORECASE), ("net_weight",)),
+    (re.compile(r"\bQuantity\s+Volume\s+Weight/number\s+(.*)", re.IGNORECASE), ("pieces",)),
+]
+
+# Invoice fields compared per PO, and the packing list column holding each
+COMPARED_FIELDS = {"pieces": "Pieces", "cartons": "Cartons"}
+
+# Gross weights are rounded per carton, so shipment totals may differ slightly
+DEFAULT_WEIGHT_TOLERANCE = 0.5
+
+
+def normalize_po(po_number):
+    """
+    Join key for a PO: upper case, no blanks, IT51093 -> IT-51093, and
+    numbers read as floats (51093.0) back to their digits
+    """
+    if po_number is None:
+        return None
+    if isinstance(po_number, float) and po_number.is_integer():
+        po_number = int(po_number)
+    return format_po_number(re.sub(r"\s+", "", str(po_number)).upper()) or None
+
+
+def _split_number(token):
+    """
+    (value, unit) of a number token ("1,420", "3.30", "4,505PCS", "$3.30"),
+    the unit upper case or None; (None, None) for anything else
+    """
+    match = NUMBER_PATTERN.fullmatch(token)
+    if match is None:
+        return None, None
+    currency, digits, unit = match.groups()
+    unit = currency or unit
+    return float(digits.replace(",", "")), unit.upper() if unit else None
+
+
+def _number(token):
+    return _split_number(token)[0]
+
+
+def _labelled_numbers(text):
+    """
+    [value, unit] for each number in text. The unit is the one glued to the
+    number, else the unit word right after it ("134 CTN") or the currency
+    right before it ("US$ 15,251.08").
+    """
+    numbers = []
+    previous = None
+    currency = None
+    for token in text.split():
+        value, unit = _split_number(token)
+        upper = token.upper()
+        if value is not None:
+            previous = [value, unit or currency]
+            numbers.append(previous)
+            currency = None
+            continue
+        if upper in CURRENCY_TOKENS:
+            currency = upper
+        elif upper in UNIT_TOKENS and previous is not None and previous[1] is None:
+            previous[1] = upper
+        previous = None
+    return numbers
+
+
+def _bind_totals(fields, numbers):
+    """
+    {field: value} for the fields of a total line: a number goes to the
+    field its unit labels, and unlabelled numbers fill the fields left,
+    in order. "4,505PCS 134 CTN US$ 15,251.08" and the workbook's
+    "4505 PCS 134 US$ 15251.08 1 966.77" both give 4505 pieces, 134
+    cartons and 15251.08 dollars.
+    """
+    values = {}
+    unlabelled = []
+    for value, unit in numbers:
+        field = UNIT_FIELDS.get(unit)
+        if field in fields:
+            values.setdefault(field, value)
+        else:
+            unlabelled.append(value)
+    values.update(zip([field for field in fields if field not in values], unlabelled))
+    return values
+
+
+class InvoiceLine:
+    """
+    One line item of a commercial invoice: PO, style and the quantities
+    invoiced for it. The invoices carry no color column, so lines are
+    matched to packing lists by PO alone.
+    """
+
+    __slots__ = ("po_number", "style", "pieces", "cartons", "unit_price", "amount", "source_file")
+
+    def __init__(self, po_number, style, pieces, cartons, unit_price=None, amount=None, source_file=None):
+        self.po_number = po_number
+        self.style = style
+        self.pieces = pieces
+        self.cartons = cartons
+        self.unit_price = unit_price
+        self.amount = amount
+        self.source_file = source_file
+
+    def __repr__(self):
+        return (f"InvoiceLine(po_number={self.po_number!r}, style={self.style!r}, pieces={self.pieces!r}, "
+                f"cartons={self.cartons!r}, unit_price={self.unit_price!r}, amount={self.amount!r}, "
+                f"source_file={self.source_file!r})")
+
+
+class Invoice:
+    """
+    Line items and shipment totals (pieces, cartons, amount, gross and net
+    weight, where printed) read from one invoice workbook or PDF
+    """
+
+    def __init__(self, source_file):
+        self.source_file = source_file
+        self.lines = []
+        self.totals = {}
+
+    def parse_line(self, text):
+        """
+        Pick up a line item or a total from one line of text (a PDF text
+        line, or the non-empty cells of a worksheet row joined by blanks)
+        """
+        for pattern, fields in TOTAL_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                for field, value in _bind_totals(fields, _labelled_numbers(match.group(1))).items():
+                    self.totals.setdefault(field, value)
+                return
+
+        line = _invoice_line(text.split())
+        if line is not None:
+            line.source_file = self.source_file
+            self.lines.append(line)
+
+
+def _invoice_line(tokens):
+    """
+    An invoice line from the tokens of one row: a PO, the style after it,
+    then pieces, cartons, unit price and amount, with unit words such as
+    Pcs or US$ in between. None unless at least pieces and cartons are there.
+    """
+    for index, token in enumerate(tokens):
+        if PO_PATTERN.fullmatch(token.upper()):
+            break
+    else:
+        return None
+
+    rest = tokens[index + 1:]
+    style = None
+    if rest and _number(rest[0]) is None:
+        style, rest = rest[0], rest[1:]
+
+    numbers = []
+    for token in rest:
+        value = _number(token)
+        if value is not None:
+            numbers.append(value)
+        elif token.upper() not in UNIT_TOKENS:
+            break
+    if len(numbers) < 2:
+        return None
+
+    pieces, cartons = int(numbers[0]), int(numbers[1])
+    unit_price = numbers[2] if len(numbers) > 2 else None
+    amount = numbers[3] if len(numbers) > 3 else None
+    return InvoiceLine(tokens[index], style, pieces, cartons, unit_price, amount)
+
+
+def _row_text(row):
+    cells = []
+    for value in row:
+        if value == '' or value is None:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        cells.append(str(value))
+    return " ".join(cells)
+
+
+def read_invoice_workbook(path):
+    invoice = Invoice(os.path.basename(path))
+    workbook = open_workbook(path)
+    try:
+        for sheet_idx in range(workbook.nsheets):
+            for row in workbook.iter_rows(sheet_idx):
+                invoice.parse_line(_row_text(row))
+            workbook.release_sheet(sheet_idx)
+    finally:
+        workbook.close()
+    return invoice
+
+
+def read_invoice_pdf(path):
+    """
+    Line items and totals from the text of an invoice PDF, such as the one
+    script 1 converts from the invoice workbook, where units are printed
+    glued to the numbers (1420Pcs, $3.30). An EXP form only carries the
+    shipment's total pieces.
+    """
+    import pdfplumber
+
+    invoice = Invoice(os.path.basename(path))
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            # Default tolerances keep a label and its value on one line
+            text = page.extract_text() or ""
+            for line in text.splitlines():
+                invoice.parse_line(line)
+            page.close()
+    return invoice
+
+
+def read_invoice(path):
+    """
+    Read an invoice workbook (.xls, .xlsx, .xlsm) or PDF
+    """
+    if path.lower().endswith(".pdf"):
+        return read_invoice_pdf(path)
+    return read_invoice_workbook(path)
+
+
+def load_records(path):
+    """
+    Packing list records from a file written by script 3 (json or ndjson)
+    """
+    output_format = infer_format(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if output_format == "json":
+            data = json.load(f)
+        elif output_format == "ndjson":
+            data = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Cannot read packing list records from {output_format} files: {path}")
+    return [PackingListRecord.from_dict(record) for record in data]
+
+
+def _joined(values):
+    return ", ".join(sorted({value for value in values if value}))
+
+
+def _plain(value):
+    """
+    A JSON-friendly Python value for a pandas/numpy scalar
+    """
+    if value is None:
+        return None
+    try:
+        import pandas as pd
+
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 4)
+    return value
+
+
+def reconcile(invoices, records, weight_tolerance=DEFAULT_WEIGHT_TOLERANCE):
+    """
+    Compare invoice line items with extracted packing list records.
+
+    Both sides are grouped by normalised PO into hash-indexed tables and
+    joined in one outer merge, so the cost grows linearly with the number
+    of POs. Returns a
+    JSON-friendly report of mismatched quantities, POs missing from the
+    packing lists, extra POs without an invoice line and shipment totals.
+    """
+    import pandas as pd
+
+    lines = [line for invoice in invoices for line in invoice.lines]
+
+    with run_report.step("reconcile_index"):
+        invoice_frame = pd.DataFrame({
+            "PO": [normalize_po(line.po_number) for line in lines],
+            "Pieces": pd.array([line.pieces for line in lines], dtype="Int64"),
+            "Cartons": pd.array([line.cartons for line in lines], dtype="Int64"),
+            "Amount": pd.array([line.amount for line in lines], dtype="Float64"),
+            "Invoice": [line.source_file for line in lines],
+        })
+        invoiced = invoice_frame.groupby("PO", sort=False, dropna=False).agg(
+            Invoice_Pieces=("Pieces", "sum"),
+            Invoice_Cartons=("Cartons", "sum"),
+            Invoice_Amount=("Amount", "sum"),
+            Invoices=("Invoice", _joined),
+        )
+
+        accumulator = RecordAccumulator()
+        accumulator.extend(records)
+        packing_frame = accumulator.to_dataframe()
+        packing_frame["PO"] = packing_frame["PO_Number"].map(normalize_po)
+        packed = packing_frame.groupby("PO", sort=False, dropna=False).agg(
+            Packed_Pieces=("Pieces", "sum"),
+            Packed_Cartons=("Cartons", "sum"),
+            Packed_Gross_Weight=("Total_Gross_Weight", "sum"),
+            Packing_Lists=("Source_File", _joined),
+        )
+
+    with run_report.step("reconcile_join"):
+        joined = invoiced.join(packed, how="outer")
+        on_invoice = joined["Invoices"].notna()
+        on_packing_list = joined["Packing_Lists"].notna()
+        matched = joined[on_invoice & on_packing_list]
+
+        mismatches = []
+        for field, column in COMPARED_FIELDS.items():
+            invoice_values = matched[f"Invoice_{column}"]
+            packed_values = matched[f"Packed_{column}"]
+            differs = (invoice_values != packed_values).fillna(True)
+            for key, row in matched[differs].iterrows():
+                mismatches.append({
+                    "po": key,
+                    "field": field,
+                    "invoice": _plain(row[f"Invoice_{column}"]),
+                    "packing_list": _plain(row[f"Packed_{column}"]),
+                    "difference": _plain(row[f"Packed_{column}"] - row[f"Invoice_{column}"]),
+                    "invoices": row["Invoices"],
+                    "packing_lists": row["Packing_Lists"],
+                })
+
+        missing = [{
+            "po": key,
+            "pieces": _plain(row["Invoice_Pieces"]),
+            "cartons": _plain(row["Invoice_Cartons"]),
+            "invoices": row["Invoices"],
+        } for key, row in joined[on_invoice & ~on_packing_list].iterrows()]
+
+        # Without line items (an EXP form) only the shipment totals compare
+        extra = [{
+            "po": key,
+            "pieces": _plain(row["Packed_Pieces"]),
+            "cartons": _plain(row["Packed_Cartons"]),
+            "packing_lists": row["Packing_Lists"],
+        } for key, row in joined[~on_invoice & on_packing_list].iterrows()] if lines else []
+
+    packed_totals = {
+        "pieces": _plain(packing_frame["Pieces"].sum()),
+        "cartons": _plain(packing_frame["Cartons"].sum()),
+        "gross_weight": _plain(packing_frame["Total_Gross_Weight"].sum()),
+    }
+    totals = []
+    for field, packed_total in packed_totals.items():
+        invoice_values = [invoice.totals[field] for invoice in invoices if field in invoice.totals]
+        if not invoice_values:
+            continue
+        invoice_total = _plain(sum(invoice_values))
+        difference = _plain((packed_total or 0) - invoice_total)
+        tolerance = weight_tolerance if field == "gross_weight" else 0
+        totals.append({
+            "field": field,
+            "invoice": invoice_total,
+            "packing_list": packed_total,
+            "difference": difference,
+            "ok": abs(difference) <= tolerance,
+        })
+
+    return {
+        "invoices": [invoice.source_file for invoice in invoices],
+        "invoice_lines": len(lines),
+        "packing_lists": len(records),
+        "matched_pos": len(matched),
+        "mismatches": mismatches,
+        "missing_pos": missing,
+        "extra_pos": extra,
+        "totals": totals,
+    }
+
+
+def discrepancy_count(report):
+    return (len(report["mismatches"]) + len(report["missing_pos"]) + len(report["extra_pos"])
+            + sum(not total["ok"] for total in report["totals"]))
+
+
+def log_reconciliation(report):
+    log.info(f"🧾 Reconciled {report['invoice_lines']} invoice line(s) from {len(report['invoices'])} invoice(s) "
+             f"against {report['packing_lists']} packing list(s): {report['matched_pos']} PO(s) on both")
+
+    for entry in report["mismatches"]:
+        log.warning(f"❌ {entry['po']}: {entry['field']} invoiced {entry['invoice']}, "
+                    f"packed {entry['packing_list']} ({entry['packing_lists']})")
+    for entry in report["missing_pos"]:
+        log.warning(f"❌ {entry['po']}: on {entry['invoices']} ({entry['pieces']} pcs, "
+                    f"{entry['cartons']} ctns) but on no packing list")
+    for entry in report["extra_pos"]:
+        log.warning(f"❌ {entry['po']}: packed in {entry['packing_lists']} ({entry['pieces']} pcs, "
+                    f"{entry['cartons']} ctns) but not invoiced")
+    for total in report["totals"]:
+        line = (f"Total {total['field'].replace('_', ' ')}: invoiced {total['invoice']}, "
+                f"packed {total['packing_list']}")
+        if total["ok"]:
+            log.info(f"✅ {line}")
+        else:
+            log.warning(f"❌ {line} (difference {total['difference']})")
+
+    count = discrepancy_count(report)
+    if count:
+        log.warning(f"⚠️ {count} discrepanc{'y' if count == 1 else 'ies'} found")
+    else:
+        log.info("✅ Invoice and packing lists agree")
+
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    log.info(f"💾 Reconciliation report written to: {path}")
+
+
+def folder_invoices(excel_path):
+    return sorted(os.path.join(excel_path, filename) for filename in os.listdir(excel_path)
+                  if is_workbook(filename) and classify_workbook(filename) == INVOICE)
+
+
+def folder_records(excel_path):
+    """
+    Extract the packing list records of every packing list workbook in excel_path
+    """
+    from extract_packing_lists import workbook_packing_slip_records
+
+    records = []
+    for filename in sorted(os.listdir(excel_path)):
+        if not is_workbook(filename) or classify_workbook(filename) != PACKING_LIST:
+            continue
+        workbook = open_workbook(os.path.join(excel_path, filename))
+        try:
+            records.extend(workbook_packing_slip_records(workbook, filename, format_po=True))
+        finally:
+            workbook.close()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile invoice line items against extracted packing lists")
+    parser.add_argument("excel_path", nargs="?",
+                        default="/home/pritom/Desktop/Packing List Extraction/Demo",
+                        help="Folder containing the Excel workbooks")
+    parser.add_argument("--invoice", metavar="PATH", action="append",
+                        help="Invoice workbook or PDF (repeatable; default: the INV workbooks in the folder)")
+    parser.add_argument("--records", metavar="PATH",
+                        help="Packing list records written by script 3 (json or ndjson) instead of "
+                             "extracting them from the folder")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write the reconciliation report to this JSON file")
+    parser.add_argument("--weight-tolerance", metavar="KG", type=float, default=DEFAULT_WEIGHT_TOLERANCE,
+                        help="Allowed difference between invoiced and packed gross weight")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    invoice_paths = args.invoice or folder_invoices(args.excel_path)
+    if not invoice_paths:
+        log.error(f"❌ No invoice found in: {args.excel_path}")
+        sys.exit(1)
+
+    invoices = [read_invoice(path) for path in invoice_paths]
+    records = load_records(args.records) if args.records else folder_records(args.excel_path)
+
+    report = reconcile(invoices, records, args.weight_tolerance)
+    log_reconciliation(report)
+    if args.output:
+        write_report(report, args.output)
+    if discrepancy_count(report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import time
+import json
+import hashlib
+import sqlite3
+
+# Bump whenever conversion, filtering or extraction output changes so stale
+# entries from older runs are never served
+EXTRACTOR_VERSION = "3"
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "packing-list-extractor", "results.sqlite"
+)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file's content, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite cache of per-workbook results keyed by content hash plus
+    EXTRACTOR_VERSION.
+
+    Each entry is a blob of one kind ("invoice_pdf", "filtered_pdf",
+    "records", ...). Once the total size exceeds max_bytes, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, kind)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_lru ON results (last_used)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _key(digest):
+        return f"{EXTRACTOR_VERSION}:{digest}"
+
+    def get(self, digest, kind):
+        """
+        Return the cached blob, or None on a miss
+        """
+        key = self._key(digest)
+        row = self.connection.execute(
+            "SELECT data FROM results WHERE key = ? AND kind = ?", (key, kind)
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self.connection:
+            self.connection.execute(
+                "UPDATE results SET last_used = ? WHERE key = ? AND kind = ?",
+                (time.time(), key, kind),
+            )
+        return bytes(row[0])
+
+    def contains(self, digest, kind):
+        """
+        True if an entry exists, without loading it or touching last_used
+        """
+        return self.connection.execute(
+            "SELECT 1 FROM results WHERE key = ? AND kind = ?", (self._key(digest), kind)
+        ).fetchone() is not None
+
+    def put(self, digest, kind, data):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results (key, kind, data, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self._key(digest), kind, sqlite3.Binary(data), len(data), time.time()),
+            )
+        self.evict()
+
+    def get_json(self, digest, kind):
+        data = self.get(digest, kind)
+        return None if data is None else json.loads(data.decode("utf-8"))
+
+    def put_json(self, digest, kind, value):
+        self.put(digest, kind, json.dumps(value).encode("utf-8"))
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes
+        """
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        with self.connection:
+            rows = self.connection.execute(
+                "SELECT key, kind, size FROM results ORDER BY last_used"
+            ).fetchall()
+            for key, kind, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.connection.execute("DELETE FROM results WHERE key = ? AND kind = ?", (key, kind))
+                total -= size
+
+    def close(self):
+        self.connection.close()
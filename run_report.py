@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import logging
+import datetime
+import resource
+
+log = logging.getLogger(__name__)
+
+# The report being collected, if any. Pool workers are given one by
+# init_worker and hand their steps back through take_worker_report.
+_active = None
+
+# Workbook whose per-file steps are run under cProfile, and where the
+# profiles go (see set_profile_target)
+_profile_target = None
+_profile_dir = None
+
+
+def _io_counters():
+    """
+    (bytes read, bytes written) by this process so far, from /proc/self/io;
+    (None, None) where that is not available
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _difference(after, before):
+    return None if after is None or before is None else after - before
+
+
+class _Sample:
+    """
+    Wall, CPU, child CPU and I/O counters at one point in time
+    """
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.children_cpu = _children_cpu()
+        self.bytes_read, self.bytes_written = _io_counters()
+
+    def since(self, start):
+        return {
+            "wall_seconds": round(self.wall - start.wall, 6),
+            "cpu_seconds": round(self.cpu - start.cpu, 6),
+            "subprocess_cpu_seconds": round(self.children_cpu - start.children_cpu, 6),
+            "bytes_read": _difference(self.bytes_read, start.bytes_read),
+            "bytes_written": _difference(self.bytes_written, start.bytes_written),
+        }
+
+
+class RunReport:
+    """
+    Timings and counters for one pipeline run.
+
+    Stages (a whole script) record wall and CPU time, the CPU time of their
+    subprocesses (soffice, pool workers) and bytes read and written. Steps
+    (one soffice call, one page's text, one row scan) are far more frequent,
+    so they only add up wall and CPU time per step name.
+    """
+
+    def __init__(self):
+        self.started = datetime.datetime.now().isoformat(timespec="seconds")
+        self.start = _Sample()
+        self.stages = []
+        self.steps = {}
+        self.counters = {}
+
+    def add_step(self, name, wall, cpu, count=1):
+        entry = self.steps.get(name)
+        if entry is None:
+            entry = self.steps[name] = {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+        entry["count"] += count
+        entry["wall_seconds"] += wall
+        entry["cpu_seconds"] += cpu
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, steps, counters):
+        """
+        Fold in the steps and counters a pool worker collected
+        """
+        for name, entry in steps.items():
+            self.add_step(name, entry["wall_seconds"], entry["cpu_seconds"], entry["count"])
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    def to_dict(self):
+        totals = _Sample().since(self.start)
+        totals["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        return {
+            "started": self.started,
+            "totals": totals,
+            "stages": self.stages,
+            "steps": {name: {"count": entry["count"],
+                             "wall_seconds": round(entry["wall_seconds"], 6),
+                             "cpu_seconds": round(entry["cpu_seconds"], 6)}
+                      for name, entry in sorted(self.steps.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        log.info(f"📊 Run report written to: {path}")
+
+
+class _NullStep:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STEP = _NullStep()
+
+
+class _Step:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.report.add_step(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+        return False
+
+
+class _Stage:
+    def __init__(self, report, name):
+        self.report = report
+        self.name = name
+
+    def __enter__(self):
+        self.start = _Sample()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        entry = {"name": self.name}
+        entry.update(_Sample().since(self.start))
+        entry["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+        self.report.stages.append(entry)
+        return False
+
+
+def start_report():
+    """
+    Start collecting a run report; returns it
+    """
+    global _active
+    _active = RunReport()
+    return _active
+
+
+def active_report():
+    return _active
+
+
+def step(name):
+    """
+    Context manager adding its wall and CPU time to step `name` of the
+    active report; does nothing when no report is being collected
+    """
+    if _active is None:
+        return _NULL_STEP
+    return _Step(_active, name)
+
+
+def stage(name):
+    """
+    Like step, for a whole pipeline stage: also records subprocess CPU
+    time, bytes read and written and peak memory
+    """
+    if _active is None:
+        return _NULL_STEP
+    return _Stage(_active, name)
+
+
+def count(name, amount=1):
+    if _active is not None:
+        _active.count(name, amount)
+
+
+def worker_config():
+    """
+    What a pool worker needs to report like this process: whether a report
+    is being collected and the --profile target. Pass it to init_worker
+    through the pool's initializer; under the spawn and forkserver start
+    methods workers inherit none of this module's state.
+    """
+    return _active is not None, _profile_target, _profile_dir
+
+
+def init_worker(config):
+    """
+    Pool worker start-up: collect steps if the parent does, and profile the
+    same workbook
+    """
+    global _active, _profile_target, _profile_dir
+    collecting, _profile_target, _profile_dir = config
+    _active = RunReport() if collecting else None
+
+
+def reset_worker_report():
+    """
+    In a pool worker: start over so only this task's steps are handed back
+    """
+    global _active
+    if _active is not None:
+        _active = RunReport()
+
+
+def take_worker_report():
+    """
+    In a pool worker: (steps, counters) collected since reset_worker_report
+    """
+    if _active is None:
+        return None
+    return _active.steps, _active.counters
+
+
+def merge_worker_report(worker_report):
+    if _active is not None and worker_report is not None:
+        _active.merge(*worker_report)
+
+
+def set_profile_target(filename, directory="."):
+    """
+    Run every per-file step of workbook `filename` under cProfile and save
+    one pstats file per step in directory
+    """
+    global _profile_target, _profile_dir
+    _profile_target = filename
+    _profile_dir = directory
+
+
+def is_profile_target(file_path):
+    return _profile_target is not None and os.path.basename(file_path) == _profile_target
+
+
+def run_profiled(step_name, file_path, func, *args):
+    """
+    func(*args) under cProfile, saved as <workbook>.<step>.prof. The file is
+    a standard pstats dump, readable by pstats, snakeviz, or flameprof and
+    gprof2dot for flame graphs.
+    """
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args)
+    finally:
+        os.makedirs(_profile_dir, exist_ok=True)
+        profile_path = os.path.join(_profile_dir, f"{os.path.basename(file_path)}.{step_name}.prof")
+        profile.dump_stats(profile_path)
+        log.info(f"🔬 Profile of {step_name} written to: {profile_path}")
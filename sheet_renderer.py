@@ -0,0 +1,650 @@
+import os
+import re
+import time
+import zlib
+import logging
+import datetime
+
+import run_report
+
+log = logging.getLogger(__name__)
+
+# Backends for rendering packing slip sheets
+RENDERERS = ("soffice", "native")
+
+# A4, in points
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+PAGE_MARGIN = 28.0
+
+# Space between a cell's edge and its text, in points before scaling
+CELL_PADDING = 2.0
+
+# Excel column widths are in 1/256 of the default font's "0" (7 px at 96 dpi)
+POINTS_PER_CHARACTER = 5.25
+DEFAULT_COLUMN_CHARACTERS = 8.43
+DEFAULT_ROW_HEIGHT = 12.75
+
+# Standard 14 Type 1 fonts need no embedding; (bold, italic) -> resource name
+FONTS = {
+    (False, False): ("F1", "Helvetica"),
+    (True, False): ("F2", "Helvetica-Bold"),
+    (False, True): ("F3", "Helvetica-Oblique"),
+    (True, True): ("F4", "Helvetica-BoldOblique"),
+}
+
+# Glyph widths (1/1000 em) of Helvetica and Helvetica-Bold for ' ' to '~';
+# the oblique faces share them. Used to align and wrap cell text.
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]
+
+# xlrd alignment codes
+_XLS_HORIZONTAL = {1: "left", 2: "center", 3: "right", 6: "center"}
+_XLS_VERTICAL = {0: "top", 1: "center"}
+
+
+def text_width(text, size, bold=False):
+    widths = _HELVETICA_BOLD_WIDTHS if bold else _HELVETICA_WIDTHS
+    total = 0
+    for char in text:
+        code = ord(char) - 32
+        total += widths[code] if 0 <= code < len(widths) else 556
+    return total * size / 1000
+
+
+def _general(value):
+    """
+    A number the way Excel's General format shows it
+    """
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if isinstance(value, float):
+        return f"{value:.10g}"
+    return str(value)
+
+
+def format_number(value, format_string):
+    """
+    Good-enough rendering of an Excel number format: decimals, thousands
+    separators, percent and quoted literals; anything fancier falls back
+    to General
+    """
+    section = (format_string or "General").split(";")[0]
+    if section in ("General", "@", ""):
+        return _general(value)
+
+    prefix, suffix, pattern = [], [], []
+    for token in re.findall(r'"[^"]*"|\\.|\[[^\]]*\]|_.|\*.|.', section):
+        if token.startswith("[") or token.startswith("*"):
+            continue
+        if token.startswith("_"):
+            literal = " "
+        elif token.startswith('"'):
+            literal = token[1:-1]
+        elif token.startswith("\\"):
+            literal = token[1]
+        elif token in "0#?,.%":
+            pattern.append(token)
+            continue
+        else:
+            literal = token
+        (suffix if pattern else prefix).append(literal)
+
+    pattern = "".join(pattern)
+    if not re.search(r"[0#?]", pattern):
+        return _general(value)
+
+    if "%" in pattern:
+        value *= 100
+    integer_part, _, fraction_part = pattern.partition(".")
+    decimals = len(re.findall(r"[0#?]", fraction_part))
+    grouping = "," in integer_part
+    text = f"{value:,.{decimals}f}" if grouping else f"{value:.{decimals}f}"
+    if "%" in pattern:
+        text += "%"
+    return "".join(prefix) + text + "".join(suffix)
+
+
+def format_date(value, format_string):
+    lowered = (format_string or "").lower()
+    has_time = "h" in lowered or "s" in lowered
+    if isinstance(value, datetime.time) or (has_time and "d" not in lowered and "y" not in lowered):
+        return value.strftime("%H:%M")
+    date_text = value.strftime("%d-%b-%y" if "mmm" in lowered else "%m/%d/%Y")
+    return f"{date_text} {value.strftime('%H:%M')}" if has_time else date_text
+
+
+class CellStyle:
+    """
+    What the renderer uses of a cell's formatting
+    """
+
+    __slots__ = ("bold", "italic", "size", "align", "valign", "wrap", "borders", "fill")
+
+    def __init__(self, bold=False, italic=False, size=10.0, align=None, valign="bottom", wrap=False,
+                 borders=(False, False, False, False), fill=None):
+        self.bold = bold
+        self.italic = italic
+        self.size = size
+        self.align = align      # "left", "center", "right" or None for General
+        self.valign = valign
+        self.wrap = wrap
+        self.borders = borders  # (top, right, bottom, left)
+        self.fill = fill        # (r, g, b) in 0..1, or None
+
+
+DEFAULT_STYLE = CellStyle()
+
+
+class SheetLayout:
+    """
+    One sheet reduced to a grid: column widths and row heights in points,
+    {(row, col): (text, style, is_number)} for cells with text, fill or
+    borders, merged ranges as (row_lo, row_hi, col_lo, col_hi) half-open
+    tuples, and the rows that start a new printed page.
+    """
+
+    def __init__(self, name, col_widths, row_heights, cells, merged, page_breaks=()):
+        self.name = name
+        self.col_widths = col_widths
+        self.row_heights = row_heights
+        self.cells = cells
+        self.merged = merged
+        self.page_breaks = set(page_breaks)
+
+
+def _xls_style(book, xf_index, cache):
+    style = cache.get(xf_index)
+    if style is not None:
+        return style
+
+    xf = book.xf_list[xf_index]
+    font = book.font_list[xf.font_index]
+    border = xf.border
+    fill = None
+    if xf.background.fill_pattern:
+        rgb = book.colour_map.get(xf.background.pattern_colour_index)
+        if rgb and rgb != (255, 255, 255):
+            fill = tuple(channel / 255 for channel in rgb)
+
+    style = cache[xf_index] = CellStyle(
+        bold=bool(font.bold),
+        italic=bool(font.italic),
+        size=font.height / 20 or 10.0,
+        align=_XLS_HORIZONTAL.get(xf.alignment.hor_align),
+        valign=_XLS_VERTICAL.get(xf.alignment.vert_align, "bottom"),
+        wrap=bool(xf.alignment.text_wrapped),
+        borders=(bool(border.top_line_style), bool(border.right_line_style),
+                 bool(border.bottom_line_style), bool(border.left_line_style)),
+        fill=fill,
+    )
+    return style
+
+
+def _xls_sheet_layout(book, sheet, style_cache):
+    import xlrd
+
+    default_width = (sheet.defcolwidth * 256 if sheet.defcolwidth else
+                     sheet.standardwidth or DEFAULT_COLUMN_CHARACTERS * 256)
+    col_widths = []
+    for col in range(sheet.ncols):
+        info = sheet.colinfo_map.get(col)
+        if info is not None and info.hidden:
+            col_widths.append(0.0)
+        else:
+            col_widths.append((info.width if info is not None else default_width) / 256 * POINTS_PER_CHARACTER)
+
+    default_height = (sheet.default_row_height or 255) / 20
+    row_heights = []
+    for row in range(sheet.nrows):
+        info = sheet.rowinfo_map.get(row)
+        if info is not None and info.hidden:
+            row_heights.append(0.0)
+        else:
+            row_heights.append(info.height / 20 if info is not None else default_height)
+
+    cells = {}
+    for row in range(sheet.nrows):
+        for col in range(sheet.ncols):
+            cell_type = sheet.cell_type(row, col)
+            if cell_type == xlrd.XL_CELL_EMPTY:
+                continue
+            xf_index = sheet.cell_xf_index(row, col)
+            style = _xls_style(book, xf_index, style_cache)
+            value = sheet.cell_value(row, col)
+            format_string = book.format_map[book.xf_list[xf_index].format_key].format_str
+
+            is_number = False
+            if cell_type == xlrd.XL_CELL_TEXT:
+                text = value
+            elif cell_type == xlrd.XL_CELL_NUMBER:
+                text = format_number(value, format_string)
+                is_number = True
+            elif cell_type == xlrd.XL_CELL_DATE:
+                try:
+                    text = format_date(xlrd.xldate_as_datetime(value, book.datemode), format_string)
+                except (ValueError, OverflowError):
+                    text = _general(value)
+                is_number = True
+            elif cell_type == xlrd.XL_CELL_BOOLEAN:
+                text = "TRUE" if value else "FALSE"
+            elif cell_type == xlrd.XL_CELL_ERROR:
+                text = xlrd.error_text_from_code.get(value, "#ERR")
+            else:
+                text = ""
+
+            if text or style.fill or any(style.borders):
+                cells[(row, col)] = (text, style, is_number)
+
+    page_breaks = [row for row, _, _ in sheet.horizontal_page_breaks]
+    return SheetLayout(sheet.name, col_widths, row_heights, cells, list(sheet.merged_cells), page_breaks)
+
+
+def _xls_layouts(path, sheets):
+    import xlrd
+
+    book = xlrd.open_workbook(path, formatting_info=True, on_demand=True)
+    style_cache = {}
+    try:
+        for sheet_idx, sheet_name in enumerate(book.sheet_names()):
+            if sheets is not None and sheet_name not in sheets:
+                continue
+            yield _xls_sheet_layout(book, book.sheet_by_index(sheet_idx), style_cache)
+            book.unload_sheet(sheet_idx)
+    finally:
+        book.release_resources()
+
+
+def _ooxml_rgb(color):
+    rgb = getattr(color, "rgb", None)
+    if not isinstance(rgb, str) or len(rgb) < 6 or rgb[-6:].upper() == "FFFFFF":
+        return None
+    return tuple(int(rgb[-6:][i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def _ooxml_style(cell):
+    font = cell.font
+    alignment = cell.alignment
+    border = cell.border
+    fill = cell.fill
+    horizontal = alignment.horizontal
+    if horizontal in ("centerContinuous", "center"):
+        horizontal = "center"
+    elif horizontal not in ("left", "right"):
+        horizontal = None
+
+    return CellStyle(
+        bold=bool(font.b),
+        italic=bool(font.i),
+        size=float(font.sz or 10.0),
+        align=horizontal,
+        valign=alignment.vertical if alignment.vertical in ("top", "center") else "bottom",
+        wrap=bool(alignment.wrap_text),
+        borders=(bool(border.top.style), bool(border.right.style),
+                 bool(border.bottom.style), bool(border.left.style)),
+        fill=_ooxml_rgb(fill.fgColor) if fill.fill_type == "solid" else None,
+    )
+
+
+def _ooxml_sheet_layout(worksheet):
+    sheet_format = worksheet.sheet_format
+    default_width = (sheet_format.defaultColWidth or DEFAULT_COLUMN_CHARACTERS) * POINTS_PER_CHARACTER
+    col_widths = [default_width] * worksheet.max_column
+    for dimension in worksheet.column_dimensions.values():
+        width = 0.0 if dimension.hidden else (dimension.width or 0) * POINTS_PER_CHARACTER or default_width
+        for col in range(dimension.min - 1, min(dimension.max, worksheet.max_column)):
+            col_widths[col] = width
+
+    default_height = sheet_format.defaultRowHeight or DEFAULT_ROW_HEIGHT
+    row_heights = [default_height] * worksheet.max_row
+    for row, dimension in worksheet.row_dimensions.items():
+        if row <= worksheet.max_row:
+            row_heights[row - 1] = 0.0 if dimension.hidden else dimension.height or default_height
+
+    styles = {}
+    cells = {}
+    for row in worksheet.iter_rows():
+        for cell in row:
+            if not hasattr(cell, "column"):
+                continue
+            value = cell.value
+            style_key = cell.style_id if cell.has_style else None
+            style = styles.get(style_key)
+            if style is None:
+                style = styles[style_key] = _ooxml_style(cell) if cell.has_style else DEFAULT_STYLE
+
+            is_number = False
+            if value is None:
+                text = ""
+            elif isinstance(value, bool):
+                text = "TRUE" if value else "FALSE"
+            elif isinstance(value, (int, float)):
+                text = format_number(float(value), cell.number_format)
+                is_number = True
+            elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+                text = format_date(value, cell.number_format)
+                is_number = True
+            else:
+                text = str(value)
+
+            if text or style.fill or any(style.borders):
+                cells[(cell.row - 1, cell.column - 1)] = (text, style, is_number)
+
+    merged = [(r.min_row - 1, r.max_row, r.min_col - 1, r.max_col) for r in worksheet.merged_cells.ranges]
+    page_breaks = [page_break.id for page_break in worksheet.row_breaks.brk]
+    return SheetLayout(worksheet.title, col_widths, row_heights, cells, merged, page_breaks)
+
+
+def _ooxml_layouts(path, sheets):
+    import openpyxl
+
+    # Not read-only: merged ranges, dimensions and styles are needed
+    book = openpyxl.load_workbook(path, data_only=True, keep_links=False)
+    try:
+        for worksheet in book.worksheets:
+            if sheets is not None and worksheet.title not in sheets:
+                continue
+            yield _ooxml_sheet_layout(worksheet)
+    finally:
+        book.close()
+
+
+def read_sheet_layouts(path, sheets=None):
+    """
+    SheetLayout of every sheet of a workbook, or only of the named sheets
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".xls":
+        return _xls_layouts(path, sheets)
+    if extension in (".xlsx", ".xlsm"):
+        return _ooxml_layouts(path, sheets)
+    raise ValueError(f"Unsupported workbook format: {extension or path}")
+
+
+def _pdf_text(text):
+    # WinAnsiEncoding is cp1252; the stream is written as latin-1 bytes
+    encoded = text.encode("cp1252", "replace").decode("latin-1")
+    return encoded.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text, width, size, bold):
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(candidate, size, bold) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _page_row_ranges(layout, usable_height, scale):
+    """
+    [row_lo, row_hi) of each page: rows are added until the page is full or
+    the sheet asks for a page break
+    """
+    ranges = []
+    start = 0
+    used = 0.0
+    for row, height in enumerate(layout.row_heights):
+        height *= scale
+        if row > start and (row in layout.page_breaks or used + height > usable_height):
+            ranges.append((start, row))
+            start, used = row, 0.0
+        used += height
+    if start < len(layout.row_heights):
+        ranges.append((start, len(layout.row_heights)))
+    return ranges
+
+
+def _render_page(layout, row_lo, row_hi, scale, page_height, col_x, row_y, merged_at, merged_cell_of):
+    """
+    Content stream of one page: fills, then text, then borders
+    """
+    fills, texts, lines = [], [], []
+    top = page_height - PAGE_MARGIN
+
+    def x_of(col):
+        return PAGE_MARGIN + col_x[col] * scale
+
+    def y_of(row):
+        # Row edges in PDF space; row_y is measured down from the sheet top
+        return top - (row_y[row] - row_y[row_lo]) * scale
+
+    cells = layout.cells
+    ncols = len(layout.col_widths)
+    for (row, col), (text, style, is_number) in cells.items():
+        if not row_lo <= row < row_hi or layout.col_widths[col] == 0 and (row, col) not in merged_at:
+            continue
+        anchor = merged_cell_of.get((row, col))
+        if anchor is not None and anchor != (row, col):
+            # Covered by a merged range; only its borders are drawn
+            text, style = "", CellStyle(borders=style.borders)
+        box = merged_at.get((row, col), (row, row + 1, col, col + 1))
+        left, right = x_of(box[2]), x_of(box[3])
+        box_top, bottom = y_of(box[0]), y_of(min(box[1], row_hi))
+
+        if style.fill:
+            fills.append(f"{style.fill[0]:.3f} {style.fill[1]:.3f} {style.fill[2]:.3f} rg "
+                         f"{left:.2f} {bottom:.2f} {right - left:.2f} {box_top - bottom:.2f} re f")
+
+        # Borders belong to the cell itself, even when it anchors a merge
+        cell_left, cell_right = x_of(col), x_of(col + 1)
+        cell_top, cell_bottom = y_of(row), y_of(row + 1)
+        top_edge, right_edge, bottom_edge, left_edge = style.borders
+        for present, neighbour, segment in (
+            (top_edge, (row - 1, col), (cell_left, cell_top, cell_right, cell_top)),
+            (bottom_edge, (row + 1, col), (cell_left, cell_bottom, cell_right, cell_bottom)),
+            (left_edge, (row, col - 1), (cell_left, cell_bottom, cell_left, cell_top)),
+            (right_edge, (row, col + 1), (cell_right, cell_bottom, cell_right, cell_top)),
+        ):
+            # Edges inside a merged range are not drawn
+            if present and (anchor is None or merged_cell_of.get(neighbour) != anchor):
+                lines.append("%.2f %.2f m %.2f %.2f l S" % segment)
+
+        if not text or box_top - bottom <= 0:
+            continue
+
+        size = style.size * scale
+        padding = CELL_PADDING * scale
+        align = style.align or ("right" if is_number else "left")
+        clip_right = right
+        if not style.wrap and anchor is None and align == "left":
+            # Like Excel, text runs on over empty neighbours to its right
+            next_col = col + 1
+            while next_col < ncols and not cells.get((row, next_col), ("",))[0] \
+                    and (row, next_col) not in merged_cell_of:
+                next_col += 1
+            clip_right = x_of(next_col) if next_col < ncols else x_of(ncols)
+
+        if style.wrap:
+            text_lines = _wrap(text, (right - left) / scale - 2 * CELL_PADDING, style.size, style.bold)
+        else:
+            text_lines = text.split("\n")
+        leading = size * 1.15
+        block = leading * (len(text_lines) - 1)
+        if style.valign == "top":
+            baseline = box_top - padding - size * 0.8
+        elif style.valign == "center":
+            baseline = (box_top + bottom) / 2 + block / 2 - size * 0.3
+        else:
+            baseline = bottom + padding + size * 0.2 + block
+
+        font = FONTS[(style.bold, style.italic)][0]
+        texts.append(f"q {left:.2f} {bottom:.2f} {clip_right - left:.2f} {box_top - bottom:.2f} re W n BT /{font} {size:.2f} Tf")
+        for line in text_lines:
+            width = text_width(line, size, style.bold)
+            if align == "right":
+                x = right - padding - width
+            elif align == "center":
+                x = (left + right - width) / 2
+            else:
+                x = left + padding
+            texts.append(f"1 0 0 1 {x:.2f} {baseline:.2f} Tm ({_pdf_text(line)}) Tj")
+            baseline -= leading
+        texts.append("ET Q")
+
+    stream = fills + ["0 g"] + texts + [f"{0.5 * scale:.2f} w 0 G"] + lines
+    return "\n".join(stream).encode("latin-1")
+
+
+def _layout_pages(layout):
+    """
+    Content streams and page size of every page of one sheet. Columns are
+    scaled to fit the page width, landscape when the sheet is wide.
+    """
+    total_width = sum(layout.col_widths)
+    landscape = total_width > PAGE_WIDTH - 2 * PAGE_MARGIN
+    page_width, page_height = (PAGE_HEIGHT, PAGE_WIDTH) if landscape else (PAGE_WIDTH, PAGE_HEIGHT)
+    usable_width = page_width - 2 * PAGE_MARGIN
+    scale = min(1.0, usable_width / total_width) if total_width else 1.0
+
+    col_x = [0.0]
+    for width in layout.col_widths:
+        col_x.append(col_x[-1] + width)
+    row_y = [0.0]
+    for height in layout.row_heights:
+        row_y.append(row_y[-1] + height)
+
+    merged_at = {}
+    merged_cell_of = {}
+    for row_lo, row_hi, col_lo, col_hi in layout.merged:
+        merged_at[(row_lo, col_lo)] = (row_lo, row_hi, col_lo, col_hi)
+        for row in range(row_lo, row_hi):
+            for col in range(col_lo, col_hi):
+                merged_cell_of[(row, col)] = (row_lo, col_lo)
+
+    pages = []
+    for row_lo, row_hi in _page_row_ranges(layout, page_height - 2 * PAGE_MARGIN, scale):
+        content = _render_page(layout, row_lo, row_hi, scale, page_height, col_x, row_y,
+                               merged_at, merged_cell_of)
+        pages.append((page_width, page_height, content))
+    return pages
+
+
+def write_pdf(pages, output_pdf):
+    """
+    Write pages [(width, height, content stream bytes)] as a PDF using the
+    standard Helvetica fonts
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font_refs = " ".join(
+        f"/{resource} {add(f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'.encode())} 0 R"
+        for resource, name in FONTS.values()
+    )
+    resources = add(f"<< /Font << {font_refs} >> >>".encode())
+    pages_ref = add(b"")  # filled in once the kids are known
+
+    kids = []
+    for width, height, content in pages or [(PAGE_WIDTH, PAGE_HEIGHT, b"")]:
+        data = zlib.compress(content)
+        stream = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+        kids.append(add(f"<< /Type /Page /Parent {pages_ref} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+                        f"/Resources {resources} 0 R /Contents {stream} 0 R >>".encode()))
+    objects[pages_ref - 1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+    catalog = add(f"<< /Type /Catalog /Pages {pages_ref} 0 R >>".encode())
+
+    with open(output_pdf, "wb") as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+
+
+def render_workbook(input_path, output_pdf, sheets=None):
+    """
+    Render a workbook (or only the named sheets) straight to PDF.
+    Returns the number of pages written.
+    """
+    pages = []
+    with run_report.step("native_layout"):
+        for layout in read_sheet_layouts(input_path, sheets):
+            pages.extend(_layout_pages(layout))
+    with run_report.step("native_write"):
+        write_pdf(pages, output_pdf)
+    return len(pages)
+
+
+class RenderError(Exception):
+    """
+    A workbook could not be rendered natively
+    """
+
+
+class NativeSheetRenderer:
+    """
+    In-process stand-in for SofficeConverter's convert and convert_sheets:
+    sheets are laid out from the workbook's own cells, merged ranges,
+    column widths, fonts, fills and borders and written as PDF without
+    LibreOffice. The output is meant for the combined review PDF, not as a
+    pixel match of Excel's print.
+    """
+
+    def __init__(self):
+        self.latencies = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def convert(self, input_path, outdir, capture_output=False):
+        output_pdf, _ = self.convert_sheets(input_path, outdir, None, capture_output)
+        return output_pdf
+
+    def convert_sheets(self, input_path, outdir, sheets, capture_output=False):
+        """
+        Render the named sheets (all of them if sheets is None) to PDF in
+        outdir. Returns (pdf_path, True): only the requested sheets are drawn.
+        Raises RenderError if the workbook cannot be read or drawn.
+        """
+        start = time.perf_counter()
+        output_pdf = os.path.join(outdir, f"{os.path.splitext(os.path.basename(input_path))[0]}.pdf")
+        try:
+            render_workbook(input_path, output_pdf, sheets)
+        except Exception as e:
+            raise RenderError(f"Cannot render {os.path.basename(input_path)}: {e}") from e
+        self.latencies.append({
+            "file": os.path.basename(input_path),
+            "backend": "native",
+            "seconds": time.perf_counter() - start,
+        })
+        return output_pdf, True
+
+    def print_latency_report(self):
+        from soffice_converter import print_latency_report
+
+        print_latency_report(self.latencies)
+
+    def close(self):
+        pass
@@ -0,0 +1,848 @@
+import os
+import logging
+import time
+import queue
+import shutil
+import signal
+import socket
+import uuid
+import tempfile
+import threading
+import subprocess
+
+import run_report
+from quarantine import DEFAULT_MAX_FAILURES, DEFAULT_QUARANTINE_PATH, Quarantine
+from result_cache import file_digest
+
+log = logging.getLogger(__name__)
+
+# The UNO bridge is only importable from a Python that ships with LibreOffice
+# (python3-uno on Debian/Ubuntu). Without it we fall back to one soffice
+# process per file, exactly like the original scripts did.
+try:
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+except ImportError:
+    uno = None
+    PropertyValue = None
+
+
+def _free_port():
+    """
+    Ask the OS for a free local TCP port for a soffice listener
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _property(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def print_latency_report(latencies):
+    """
+    Print per-file conversion latency and a short summary
+    """
+    if not latencies:
+        return
+
+    log.info("\n⏱️ Conversion latency:")
+    for entry in latencies:
+        log.info(f"   {entry['file']}: {entry['seconds']:.2f}s ({entry['backend']})")
+
+    total = sum(entry["seconds"] for entry in latencies)
+    log.info(f"   {len(latencies)} files in {total:.2f}s, "
+             f"{total / len(latencies):.2f}s per file")
+
+
+def _pdf_path_for(input_path, outdir):
+    return os.path.join(outdir, f"{os.path.splitext(os.path.basename(input_path))[0]}.pdf")
+
+
+# Longest one workbook may take to convert; a batch gets this much per file
+DEFAULT_TIMEOUT = 120
+
+# Further attempts, each with a fresh LibreOffice profile, after a failure
+DEFAULT_RETRIES = 1
+
+# Process names of a running LibreOffice (the soffice script execs oosplash,
+# which starts soffice.bin)
+_SOFFICE_NAMES = ("soffice", "soffice.bin", "oosplash")
+
+# Orphaned instances are looked for once per process
+_orphans_checked = False
+
+# LibreOffice profiles this module creates, as tempfile.mkdtemp prefix.
+# The pid of the creating process follows it (see _new_profile).
+PROFILE_PREFIX = "soffice_profile_"
+
+# One file per soffice this module started and has not yet reaped, named
+# after its pid and holding the pid of the process that started it. The
+# per-file soffice calls without an isolated profile share the user's
+# default profile, so this is the only way to tell them from a LibreOffice
+# the user started.
+PID_DIR = os.path.join(tempfile.gettempdir(), "soffice_converter_pids")
+
+
+class ConversionError(subprocess.CalledProcessError):
+    """
+    A conversion that failed without soffice exiting with an error status.
+    A CalledProcessError, so every caller that handles failed conversions
+    handles these too.
+    """
+
+    def __init__(self, message, cmd, output=None, stderr=None):
+        super().__init__(1, cmd, output, stderr)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class ConversionTimeout(ConversionError):
+    def __init__(self, cmd, timeout, output=None, stderr=None):
+        super().__init__(f"soffice timed out after {timeout:g}s and was killed", cmd, output, stderr)
+        self.timeout = timeout
+
+
+class SofficeUnavailable(ConversionError):
+    """
+    soffice could not be started at all, e.g. LibreOffice is not installed.
+    Not the workbook's fault, so it is neither retried nor quarantined.
+    """
+
+    def __init__(self, cmd, error):
+        super().__init__(f"cannot run {cmd[0]}: {error.strerror or error} (is LibreOffice installed?)", cmd)
+
+
+class QuarantinedError(ConversionError):
+    def __init__(self, input_path, failures):
+        filename = os.path.basename(input_path)
+        super().__init__(f"skipped, failed to convert in {failures} runs in a row "
+                         f"(release with: python quarantine.py --release \"{filename}\")",
+                         ["soffice", input_path])
+        self.input_path = input_path
+        self.failures = failures
+
+
+def _kill_group(process):
+    """
+    SIGKILL a process started with start_new_session and everything it
+    started in turn
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _new_profile():
+    """
+    A new, empty LibreOffice profile directory, named after this process
+    so kill_orphaned_soffice can tell when its owner is gone
+    """
+    return tempfile.mkdtemp(prefix=f"{PROFILE_PREFIX}{os.getpid()}_")
+
+
+def _record_pid(pid):
+    try:
+        os.makedirs(PID_DIR, exist_ok=True)
+        with open(os.path.join(PID_DIR, str(pid)), "w") as f:
+            f.write(str(os.getpid()))
+    except OSError:
+        pass
+
+
+def _forget_pid(pid):
+    try:
+        os.remove(os.path.join(PID_DIR, str(pid)))
+    except OSError:
+        pass
+
+
+def _recorded_pids():
+    """
+    {soffice pid: pid of the process that started it, or None if unknown}
+    for every entry in PID_DIR
+    """
+    try:
+        names = [name for name in os.listdir(PID_DIR) if name.isdigit()]
+    except OSError:
+        return {}
+
+    recorded = {}
+    for name in names:
+        try:
+            with open(os.path.join(PID_DIR, name), "r") as f:
+                owner = f.read().strip()
+        except OSError:
+            continue
+        recorded[int(name)] = int(owner) if owner.isdigit() else None
+    return recorded
+
+
+def _profile_owner(argv):
+    """
+    For a soffice command line running against a profile directory this
+    module created (see _new_profile): the pid of the process that created
+    it, or None if that is not in the name. False for any other profile.
+    """
+    for arg in argv:
+        if arg.startswith("-env:UserInstallation=file://"):
+            profile = arg[len("-env:UserInstallation=file://"):].rstrip("/")
+            name = os.path.basename(profile)
+            if os.path.dirname(profile) == tempfile.gettempdir() and name.startswith(PROFILE_PREFIX):
+                owner = name[len(PROFILE_PREFIX):].split("_", 1)[0]
+                return int(owner) if owner.isdigit() else None
+    return False
+
+
+def _modified(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _run_soffice(command, timeout, capture_output, progress=None):
+    """
+    Run one soffice command in a process group of its own. The whole group
+    is killed once the command ends, when it goes timeout seconds without
+    progress and when the caller is interrupted, so no soffice.bin outlives
+    the call. progress, if given, returns how many files are done so far;
+    every change restarts the clock, so a batch gets timeout per file.
+    """
+    pipe = subprocess.PIPE if capture_output else None
+    try:
+        process = subprocess.Popen(command, stdout=pipe, stderr=pipe, start_new_session=True)
+    except OSError as e:
+        raise SofficeUnavailable(command, e) from e
+    _record_pid(process.pid)
+    try:
+        return _wait_soffice(process, command, timeout, progress)
+    finally:
+        _forget_pid(process.pid)
+
+
+def _wait_soffice(process, command, timeout, progress):
+    done = progress() if progress else None
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while True:
+            wait = None if deadline is None else max(0, min(deadline - time.monotonic(), 1.0))
+            try:
+                output, errors = process.communicate(timeout=wait)
+                break
+            except subprocess.TimeoutExpired:
+                if progress and progress() != done:
+                    done = progress()
+                    deadline = time.monotonic() + timeout
+                elif time.monotonic() >= deadline:
+                    raise
+    except subprocess.TimeoutExpired:
+        _kill_group(process)
+        output, errors = process.communicate()
+        raise ConversionTimeout(command, timeout, output, errors)
+    except BaseException:
+        _kill_group(process)
+        process.wait()
+        raise
+    _kill_group(process)
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, output, errors)
+
+
+def soffice_available():
+    return shutil.which("soffice") is not None
+
+
+def _process_table():
+    """
+    {pid: (parent pid, argv)} of every visible process, from /proc; empty
+    where /proc is not available
+    """
+    table = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return table
+
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "r") as f:
+                stat = f.read()
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().decode("utf-8", "replace").split("\0")
+        except OSError:
+            continue
+        # The command name in parentheses may contain spaces itself
+        table[pid] = (int(stat.rsplit(")", 1)[1].split()[1]), argv)
+    return table
+
+
+def _is_orphan(pid, parent, argv, table, recorded):
+    """
+    Whether a process is a headless soffice this module started for a
+    process that no longer exists, whoever it was re-parented to (init, or
+    a systemd or container subreaper). Entries that do not name their
+    owner count when they were re-parented to init.
+    """
+    if os.path.basename(argv[0]) not in _SOFFICE_NAMES or "--headless" not in argv:
+        return False
+
+    if pid in recorded:
+        owner = recorded[pid]
+    else:
+        owner = _profile_owner(argv)
+        if owner is False:
+            return False
+
+    if owner is None:
+        return parent == 1
+    return owner not in table
+
+
+def kill_orphaned_soffice():
+    """
+    Kill headless LibreOffice instances left behind by a run that crashed or
+    was killed. They keep their profile locked, so later soffice calls hand
+    their work to them or hang. Only instances using one of our profile
+    directories or recorded in PID_DIR, and whose owning process is gone,
+    are touched: never a LibreOffice someone else started, nor one still
+    working for a concurrent run. Returns how many were found.
+    """
+    table = _process_table()
+    recorded = _recorded_pids()
+    orphans = [pid for pid, (parent, argv) in table.items() if _is_orphan(pid, parent, argv, table, recorded)]
+
+    victims = set()
+    pending = list(orphans)
+    while pending:
+        pid = pending.pop()
+        if pid not in victims:
+            victims.add(pid)
+            pending.extend(child for child, (parent, _) in table.items() if parent == pid)
+
+    for pid in victims:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    # Entries of processes that are gone (or were killed above)
+    for pid in recorded:
+        if pid not in table or pid in victims:
+            _forget_pid(pid)
+
+    if orphans:
+        log.warning(f"⚠️ Killed {len(orphans)} orphaned soffice instance(s) left by an earlier run")
+        run_report.count("soffice_orphans_killed", len(orphans))
+    return len(orphans)
+
+
+def add_conversion_arguments(parser):
+    parser.add_argument("--convert-timeout", metavar="SECONDS", type=float, default=DEFAULT_TIMEOUT,
+                        help="Kill a soffice conversion running longer than this per workbook (0: no limit)")
+    parser.add_argument("--convert-retries", metavar="N", type=int, default=DEFAULT_RETRIES,
+                        help="Retry a failed conversion this many times with a fresh LibreOffice profile")
+    parser.add_argument("--quarantine", metavar="PATH", default=DEFAULT_QUARANTINE_PATH,
+                        help="SQLite file listing workbooks that keep failing to convert")
+    parser.add_argument("--no-quarantine", action="store_true",
+                        help="Convert every workbook, even ones that failed in earlier runs")
+    parser.add_argument("--max-failures", metavar="N", type=int, default=DEFAULT_MAX_FAILURES,
+                        help="Skip a workbook once this many runs in a row failed to convert it")
+
+
+def converter_options_from_args(args):
+    """
+    SofficeConverter keyword arguments for the options added by
+    add_conversion_arguments
+    """
+    return {
+        "timeout": args.convert_timeout or None,
+        "retries": max(0, args.convert_retries),
+        "quarantine_path": None if args.no_quarantine else args.quarantine,
+        "max_failures": args.max_failures,
+    }
+
+
+class SofficeDaemon:
+    """
+    One headless LibreOffice instance listening on a local UNO socket.
+    Every instance gets its own user profile so several can run side by side.
+    """
+
+    def __init__(self, startup_timeout=30):
+        self.port = _free_port()
+        self.profile_dir = _new_profile()
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        self.process = subprocess.Popen([
+            "soffice",
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            "--nodefault",
+            f"-env:UserInstallation=file://{self.profile_dir}",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+
+        # soffice needs a moment before the socket accepts connections
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(url)
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice daemon did not start")
+                time.sleep(0.25)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+
+    def convert(self, input_path, outdir, sheets=None):
+        """
+        Convert one workbook to PDF through the running instance.
+        If sheets is given, every other sheet is dropped before export.
+        """
+        output_pdf = _pdf_path_for(input_path, outdir)
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            "_blank", 0,
+            (_property("Hidden", True),),
+        )
+        if document is None:
+            raise RuntimeError(f"LibreOffice could not open {input_path}")
+
+        try:
+            if sheets:
+                # The document is never stored back, so editing it is safe
+                spreadsheet = document.getSheets()
+                keep = set(sheets)
+                if not keep.intersection(spreadsheet.getElementNames()):
+                    raise RuntimeError(f"None of the sheets {sheets} exist in {input_path}")
+                for name in spreadsheet.getElementNames():
+                    if name not in keep:
+                        spreadsheet.removeByName(name)
+
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_pdf)),
+                (_property("FilterName", "calc_pdf_Export"),),
+            )
+        finally:
+            document.close(True)
+
+        return output_pdf
+
+    def responsive(self, timeout=5):
+        """
+        Whether the instance is still running and answers on its UNO bridge.
+        A crashed or disconnected instance fails every later call, so the
+        converter replaces it.
+        """
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+
+        answered = threading.Event()
+
+        def ping():
+            try:
+                self.desktop.getComponents()
+                answered.set()
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=ping, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        return answered.is_set()
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+            self.kill()
+
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def kill(self):
+        """
+        Kill the instance and everything it started, e.g. when it hangs
+        """
+        self.desktop = None
+        if self.process is not None:
+            _kill_group(self.process)
+            self.process.wait()
+            self.process = None
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class SofficeConverter:
+    """
+    Excel to PDF conversion backend.
+
+    Starts a pool of persistent LibreOffice instances on first use and streams
+    every conversion through them. When the UNO bridge is missing or a daemon
+    cannot be started, it falls back to one `soffice --convert-to pdf` call per
+    file, or per batch with `convert_batch`. Per-file latency is recorded for
+    `print_latency_report`.
+
+    With isolated_profile=True the fallback soffice calls also run against a
+    private user profile, so several converters can work in parallel without
+    fighting over the default profile lock.
+
+    Every conversion is killed after `timeout` seconds (per file; None for no
+    limit) and a failed one is tried `retries` more times with a fresh
+    profile. With quarantine_path, workbooks that failed in max_failures
+    runs in a row are skipped with QuarantinedError (see quarantine).
+    Failures count once per run_id, so converters working for the same run
+    (pool workers, say) share one; by default every converter is a run.
+    """
+
+    def __init__(self, instances=1, use_daemon=True, isolated_profile=False, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, quarantine_path=None, max_failures=DEFAULT_MAX_FAILURES,
+                 run_id=None):
+        self.instances = max(1, instances)
+        self.use_daemon = use_daemon and uno is not None
+        self.profile_dir = _new_profile() if isolated_profile else None
+        self.timeout = timeout
+        self.retries = retries
+        self.quarantine_path = quarantine_path
+        self.max_failures = max_failures
+        self.run_id = run_id or uuid.uuid4().hex
+        self._quarantine = None
+        # Conversions that already failed, by (path, mtime), so a workbook
+        # needed by several stages only runs into its timeout once per run
+        self._failed = {}
+        self.latencies = []
+        self._daemons = []
+        self._idle = queue.Queue()
+        self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _start_daemons(self):
+        global _orphans_checked
+
+        self._started = True
+        if not _orphans_checked:
+            _orphans_checked = True
+            kill_orphaned_soffice()
+        if not self.use_daemon:
+            return
+
+        for _ in range(self.instances):
+            daemon = self._start_daemon()
+            if daemon is None:
+                break
+            self._idle.put(daemon)
+
+        if not self._daemons:
+            self.use_daemon = False
+
+    def _start_daemon(self):
+        daemon = SofficeDaemon()
+        try:
+            daemon.start()
+        except Exception as e:
+            log.warning(f"⚠️ LibreOffice daemon unavailable, using soffice per file: {e}")
+            return None
+        self._daemons.append(daemon)
+        return daemon
+
+    def _replace_daemon(self, daemon):
+        """
+        Kill a hung or broken daemon and start a fresh one (with a fresh
+        profile) in its place; None if that fails
+        """
+        daemon.kill()
+        self._daemons.remove(daemon)
+        replacement = self._start_daemon()
+        if not self._daemons:
+            self.use_daemon = False
+        return replacement
+
+    def _convert_on_daemon(self, daemon, input_path, outdir, sheets):
+        """
+        daemon.convert with the per-file timeout. A UNO call cannot be
+        interrupted, so it runs in a thread; raises ConversionTimeout if
+        it is still running when the time is up.
+        """
+        if not self.timeout:
+            return daemon.convert(input_path, outdir, sheets)
+
+        outcome = {}
+
+        def run():
+            try:
+                outcome["pdf"] = daemon.convert(input_path, outdir, sheets)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            raise ConversionTimeout(["soffice", "--accept", input_path], self.timeout)
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["pdf"]
+
+    def _fresh_profile(self):
+        """
+        Move to a new, empty LibreOffice profile so a retry inherits neither
+        a corrupt profile nor a stale lock. The converter keeps it, and
+        removes it on close, like an isolated profile.
+        """
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.profile_dir = _new_profile()
+
+    def _convert_with_subprocess(self, input_paths, outdir, capture_output, retries=0):
+        """
+        One `soffice --convert-to pdf` call for input_paths, killed after
+        the timeout (per file) and tried up to `retries` more times. A single
+        file that soffice reports as done but never wrote (it handed the job
+        to another instance holding the profile lock) counts as a failure.
+        """
+        output_pdfs = [_pdf_path_for(input_path, outdir) for input_path in input_paths]
+        # A PDF left in outdir by an earlier run is not progress
+        before = [_modified(output_pdf) for output_pdf in output_pdfs]
+
+        def progress():
+            return sum(_modified(output_pdf) not in (None, old) for output_pdf, old in zip(output_pdfs, before))
+
+        for attempt in range(retries + 1):
+            command = ["soffice", "--headless"]
+            if self.profile_dir:
+                command.append(f"-env:UserInstallation=file://{self.profile_dir}")
+            command += ["--convert-to", "pdf", "--outdir", outdir, *input_paths]
+
+            try:
+                with run_report.step("soffice"):
+                    _run_soffice(command, self.timeout, capture_output, progress)
+                if len(input_paths) == 1 and not progress():
+                    raise ConversionError("soffice exited without writing a PDF", command)
+                return
+            except subprocess.CalledProcessError as e:
+                if isinstance(e, ConversionTimeout):
+                    run_report.count("soffice_timeouts")
+                if attempt == retries or isinstance(e, SofficeUnavailable):
+                    raise
+                name = os.path.basename(input_paths[0]) if len(input_paths) == 1 else f"a batch of {len(input_paths)}"
+                log.warning(f"⚠️ Conversion of {name} failed, retrying with a fresh profile: {e}")
+                run_report.count("soffice_retries")
+                self._fresh_profile()
+
+    def _failure_key(self, input_path):
+        return input_path, os.path.getmtime(input_path)
+
+    def _mark_failed(self, input_path, error):
+        """
+        Remember a failed conversion for the rest of the run and count it
+        on the quarantine list
+        """
+        self._failed[self._failure_key(input_path)] = error
+        if self.quarantine_path is None or isinstance(error, SofficeUnavailable):
+            return
+
+        filename = os.path.basename(input_path)
+        failures = self._quarantine.record_failure(file_digest(input_path), filename, error, self.run_id)
+        if failures >= self.max_failures:
+            log.warning(f"🚫 Quarantined {filename} after {failures} failed runs; "
+                        f"it is skipped until it changes or is released")
+
+    def _check_quarantine(self, input_path):
+        """
+        Content hash of input_path for the quarantine list (None without
+        one); raises QuarantinedError if the workbook is on it
+        """
+        if self.quarantine_path is None:
+            return None
+        if self._quarantine is None:
+            self._quarantine = Quarantine(self.quarantine_path, self.max_failures)
+
+        digest = file_digest(input_path)
+        failures = self._quarantine.failures(digest)
+        if failures >= self.max_failures:
+            run_report.count("quarantined_skipped")
+            raise QuarantinedError(input_path, failures)
+        return digest
+
+
+    def convert(self, input_path, outdir, capture_output=False):
+        """
+        Convert one workbook to PDF in outdir and return the PDF path.
+        Raises subprocess.CalledProcessError if the fallback path fails.
+        """
+        output_pdf, _ = self.convert_sheets(input_path, outdir, None, capture_output)
+        return output_pdf
+
+    def convert_sheets(self, input_path, outdir, sheets, capture_output=False):
+        """
+        Convert only the named sheets of a workbook to PDF.
+
+        Returns (pdf_path, sheets_only). Sheet selection needs the daemon; the
+        soffice command line cannot pick sheets, so on the fallback path the
+        whole workbook is rendered and sheets_only is False.
+        """
+        if not self._started:
+            self._start_daemons()
+
+        failure_key = self._failure_key(input_path)
+        if failure_key in self._failed:
+            raise self._failed[failure_key]
+
+        digest = self._check_quarantine(input_path)
+        start = time.perf_counter()
+        backend = "subprocess"
+        sheets_only = False
+
+        try:
+            if self.use_daemon:
+                daemon = self._idle.get()
+                try:
+                    with run_report.step("soffice_daemon"):
+                        output_pdf = self._convert_on_daemon(daemon, input_path, outdir, sheets)
+                    backend = "daemon"
+                    sheets_only = bool(sheets)
+                except Exception as e:
+                    log.warning(f"⚠️ Daemon conversion failed for {os.path.basename(input_path)}, retrying with soffice: {e}")
+                    if isinstance(e, ConversionTimeout):
+                        run_report.count("soffice_timeouts")
+                        daemon = self._replace_daemon(daemon)
+                    elif not daemon.responsive():
+                        # The bridge or the instance itself is gone, not just this workbook
+                        run_report.count("soffice_daemon_restarts")
+                        daemon = self._replace_daemon(daemon)
+                    self._convert_with_subprocess([input_path], outdir, capture_output, self.retries)
+                    output_pdf = _pdf_path_for(input_path, outdir)
+                finally:
+                    if daemon is not None:
+                        self._idle.put(daemon)
+            else:
+                self._convert_with_subprocess([input_path], outdir, capture_output, self.retries)
+                output_pdf = _pdf_path_for(input_path, outdir)
+        except subprocess.CalledProcessError as e:
+            self._mark_failed(input_path, e)
+            raise
+
+        if digest is not None:
+            self._quarantine.clear(digest)
+
+        self.latencies.append({
+            "file": os.path.basename(input_path),
+            "backend": backend,
+            "seconds": time.perf_counter() - start,
+        })
+        return output_pdf, sheets_only
+
+    def convert_batch(self, input_paths, outdir, capture_output=False):
+        """
+        Convert several workbooks to PDF in outdir.
+        Returns {input_path: pdf_path} for every PDF that was produced.
+
+        Without the daemon all files go to a single soffice invocation, so
+        LibreOffice starts once per batch instead of once per file. Input
+        base names must be distinct, since each PDF is named after its input.
+        Raises subprocess.CalledProcessError if that invocation fails; it is
+        not retried, since the files can still be converted one by one.
+        Quarantined workbooks are left out, so they cannot stall the batch.
+        """
+        if not self._started:
+            self._start_daemons()
+
+        if self.quarantine_path is not None:
+            healthy = []
+            for input_path in input_paths:
+                try:
+                    self._check_quarantine(input_path)
+                except QuarantinedError:
+                    continue
+                healthy.append(input_path)
+            input_paths = healthy
+            if not input_paths:
+                return {}
+
+        if self.use_daemon:
+            # The daemon is already warm, so a batch is just a loop over it
+            converted = {}
+            for input_path in input_paths:
+                try:
+                    converted[input_path] = self.convert(input_path, outdir, capture_output)
+                except subprocess.CalledProcessError as e:
+                    log.warning(f"⚠️ Batch conversion failed for {os.path.basename(input_path)}: {e}")
+            return converted
+
+        start = time.perf_counter()
+        try:
+            self._convert_with_subprocess(input_paths, outdir, capture_output)
+        except ConversionTimeout as e:
+            # soffice works through its files in order, so it hung on the
+            # first one without a PDF; keep what was written before that
+            hung = next((input_path for input_path in input_paths
+                         if not os.path.exists(_pdf_path_for(input_path, outdir))), None)
+            if hung is not None:
+                log.warning(f"⚠️ Batch conversion hung on {os.path.basename(hung)}: {e}")
+                self._mark_failed(hung, e)
+        self.latencies.append({
+            "file": f"batch of {len(input_paths)}",
+            "backend": "batch",
+            "seconds": time.perf_counter() - start,
+        })
+
+        converted = {}
+        for input_path in input_paths:
+            output_pdf = _pdf_path_for(input_path, outdir)
+            if os.path.exists(output_pdf):
+                converted[input_path] = output_pdf
+        return converted
+
+    def print_latency_report(self):
+        print_latency_report(self.latencies)
+
+    def close(self):
+        for daemon in self._daemons:
+            daemon.stop()
+        self._daemons = []
+        self._idle = queue.Queue()
+        self._started = False
+
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+        if self._quarantine is not None:
+            self._quarantine.close()
+            self._quarantine = None
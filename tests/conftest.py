@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEMO_DIR = os.path.join(REPO_DIR, "Demo")
+
+# The pipeline modules live at the top of the checkout
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def repo_dir():
+    return REPO_DIR
+
+
+@pytest.fixture
+def demo_dir():
+    return DEMO_DIR
@@ -0,0 +1,13 @@
+import sys
+
+import combined_all
+
+
+def test_runs_each_stage_through_the_cli(monkeypatch):
+    calls = []
+    monkeypatch.setattr(combined_all.cli, "main", calls.append)
+    monkeypatch.setattr(sys, "argv", ["combined_all.py", "Demo", "--quiet"])
+
+    combined_all.main()
+
+    assert calls == [["invoices", "Demo", "--quiet"], ["merge", "Demo", "--quiet"], ["extract", "Demo", "--quiet"]]
@@ -0,0 +1,68 @@
+import os
+
+import openpyxl
+import pytest
+
+from extract_packing_lists import format_po_number, scan_packing_slip_blocks, workbook_packing_slip_records
+from workbook_reader import open_workbook
+
+SHEET = "Guess Pack Slip "
+
+
+def _slip_rows(demo_dir, filename):
+    with open_workbook(os.path.join(demo_dir, filename)) as workbook:
+        return list(workbook.iter_rows(workbook.sheet_names.index(SHEET)))
+
+
+def _records(path):
+    with open_workbook(path) as workbook:
+        return [(record.po_number, record.colors, record.cartons, record.pieces, record.sheet)
+                for record in workbook_packing_slip_records(workbook, os.path.basename(path))]
+
+
+@pytest.fixture
+def consolidated(demo_dir, tmp_path):
+    """
+    A workbook like a consolidated shipment: two POs stacked on one packing
+    slip sheet, a third on a second one, and a sheet that is no packing slip
+    """
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    sheets = {
+        "Slip 1": _slip_rows(demo_dir, "IT50811-CA.xls") + [[]] + _slip_rows(demo_dir, "IT51090-CA.xls"),
+        "Notes": [["Shipment notes"], ["PO", "IT00000-CA"]],
+        "Slip 2": _slip_rows(demo_dir, "IT51088-CA.xls"),
+    }
+    for name, rows in sheets.items():
+        sheet = book.create_sheet(name)
+        for row in rows:
+            sheet.append([None if value == '' else value for value in row])
+    path = str(tmp_path / "CONSOLIDATED-CA.xlsx")
+    book.save(path)
+    return path
+
+
+def test_one_record_per_po_block(consolidated):
+    assert _records(consolidated) == [
+        ("IT50811-CA", ["G011", "JBLK", "RHT"], [6, 6, 6], [79, 112, 78], "Slip 1"),
+        ("IT51090-CA", ["G1DQ", "SM4G"], [9, 10], [409, 453], "Slip 1"),
+        ("IT51088-CA", ["OAHT"], [10], [360], "Slip 2"),
+    ]
+
+
+def test_blocks_keep_their_own_totals(demo_dir):
+    rows = _slip_rows(demo_dir, "IT51093-CA.xls") + _slip_rows(demo_dir, "IT51095-CA.xls")
+    layout_cache = {}
+
+    blocks = scan_packing_slip_blocks(iter(rows), format_po=True, layout_cache=layout_cache)
+
+    assert [block["po_number"] for block in blocks] == ["IT-51093", "IT-51095"]
+    assert blocks[0]["total_gross_weight"] == [203.7, 57.0]
+    assert blocks[1]["colors"] == ["G5D7", "G9L5", "JBLK"]
+    assert blocks[1]["total_gross_weight"] == [17.0, 42.2, 103.0]
+    # Both blocks share one totals header layout
+    assert len(layout_cache) == 1
+
+
+def test_format_po_number():
+    assert format_po_number("IT51093-CA") == "IT-51093"
@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from extract_pdf_packing_lists import iter_pdf_table_rows, pdf_packing_slip_records
+
+PDF = "Packing list_GUESS_US.pdf"
+
+# The PO whose TOTAL G.W column is printed on the overflow page after it
+WIDE_PO = "US02-2025-02267"
+
+
+@pytest.fixture(scope="module")
+def pdf_path():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), PDF)
+    if not os.path.exists(path):
+        pytest.skip(f"{PDF} is not in the checkout")
+    return path
+
+
+@pytest.fixture(scope="module")
+def records(pdf_path):
+    return pdf_packing_slip_records(pdf_path)
+
+
+@pytest.fixture(scope="module")
+def printed_totals(pdf_path):
+    """
+    {PO: (cartons, pieces, SUB TOTAL gross weights)} as printed on the
+    slips: the PO under the header row, the TOTAL SHIPMENT cartons and
+    pieces of the GRAND TOTAL row and the TOTAL G.W of every SUB TOTAL row,
+    read from the overflow page level with it when the page stops short
+    """
+    totals = {}
+    previous, po, short_rows = None, None, []
+    for _, rows in iter_pdf_table_rows(pdf_path):
+        if short_rows:
+            for top, weights in short_rows:
+                weights.append(next(float(cells[0]) for overflow_top, cells in rows
+                                    if abs(overflow_top - top) <= 2))
+            short_rows = []
+            continue
+        for top, cells in rows:
+            if previous and 'Ship Mode' in previous and 'PO' in previous:
+                po = cells[2]
+                totals[po] = [None, None, []]
+            if cells and cells[0] == 'SUB TOTAL':
+                if len(cells) > 20:
+                    totals[po][2].append(float(cells[20]))
+                else:
+                    short_rows.append((top, totals[po][2]))
+            elif cells and cells[0] == 'GRAND TOTAL':
+                totals[po][:2] = int(cells[13]), int(cells[14])
+            previous = cells
+    return {po: tuple(total) for po, total in totals.items()}
+
+
+def test_finds_every_po(records, printed_totals):
+    assert len(records) == 15
+    assert [record.po_number for record in records] == list(printed_totals)
+
+
+def test_po_totals_match_printed_totals(records, printed_totals):
+    for record in records:
+        cartons, pieces, weights = printed_totals[record.po_number]
+        assert sum(record.cartons) == cartons, record.po_number
+        assert sum(record.pieces) == pieces, record.po_number
+        assert record.gross_weights == pytest.approx(weights), record.po_number
+
+
+def test_overflow_page_weights_are_stitched(records):
+    # TOTAL G.W of this slip is printed on page 8; its GRAND TOTAL there
+    # (1183.07) disagrees with its own SUB TOTAL rows, which are what a
+    # record holds
+    record = next(record for record in records if record.po_number == WIDE_PO)
+    assert record.sheet == "Page 7"
+    assert record.colors == ["G011", "G2G2", "G524", "JBLK"]
+    assert record.gross_weights == pytest.approx([177.10, 509.78, 184.45, 276.30])
+
+
+def test_workers_match_serial_output(pdf_path, records):
+    parallel = pdf_packing_slip_records(pdf_path, workers=2, pages_per_task=4)
+    assert [record.to_dict(full=True) for record in parallel] == [record.to_dict(full=True) for record in records]
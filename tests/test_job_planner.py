@@ -0,0 +1,34 @@
+import shutil
+
+from job_planner import INVOICE, OTHER, PACKING_LIST, batches_with_unique_names, classify_workbook, plan_jobs
+
+
+def test_plan_skips_lock_files(repo_dir, tmp_path):
+    for filename in ("IT50811-CA.xls", "FFL-COM-INV-8202-GUESS-CA-SEA-FOB-EXPEDITORS-DBBL-24-01.xlsm",
+                     "~$FFL-COM-INV-8202-GUESS-CA-SEA-FOB-EXPEDITORS-DBBL-24-01.xlsm"):
+        shutil.copy(f"{repo_dir}/{filename}", tmp_path / filename)
+    (tmp_path / ".~lock.IT50811-CA.xls#").write_text("")
+    (tmp_path / "notes.txt").write_text("")
+
+    plan = plan_jobs(str(tmp_path))
+
+    assert plan.workbooks == ["FFL-COM-INV-8202-GUESS-CA-SEA-FOB-EXPEDITORS-DBBL-24-01.xlsm", "IT50811-CA.xls"]
+    assert plan.invoices == ["FFL-COM-INV-8202-GUESS-CA-SEA-FOB-EXPEDITORS-DBBL-24-01.xlsm"]
+    assert plan.packing_lists == ["IT50811-CA.xls"]
+
+
+def test_classify_workbook():
+    assert classify_workbook("FFL-COM-INV-8202.xlsm") == INVOICE
+    assert classify_workbook("B255-8202.xls") == OTHER
+    assert classify_workbook("IT50811-CA.xls") == PACKING_LIST
+
+
+def test_batches_never_share_a_pdf_name():
+    paths = ["a/IT1.xls", "b/IT1.xlsx", "a/IT2.xls", "c/IT1.xlsm"]
+
+    batches = batches_with_unique_names(paths, 2)
+
+    assert sorted(path for batch in batches for path in batch) == sorted(paths)
+    for batch in batches:
+        stems = [path.rsplit("/", 1)[1].split(".")[0] for path in batch]
+        assert len(stems) == len(set(stems))
@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pytest
+
+import soffice_converter
+from soffice_converter import PROFILE_PREFIX, kill_orphaned_soffice
+
+pytestmark = pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+
+
+@pytest.fixture
+def pid_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(soffice_converter, "PID_DIR", str(tmp_path / "pids"))
+    return tmp_path / "pids"
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def fake_soffice():
+    """
+    Start processes that look like headless soffice in the process table:
+    a Python sleeping under the name soffice. Their parent is this test,
+    not init.
+    """
+    processes = []
+
+    def start(*args):
+        process = subprocess.Popen(["soffice", "-c", "import time; time.sleep(60)", "--headless", *args],
+                                   executable=sys.executable)
+        processes.append(process)
+        # Wait until /proc shows the new command line
+        deadline = time.monotonic() + 5
+        while "--headless" not in _cmdline(process.pid) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return process
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().decode().split("\0")
+    except OSError:
+        return []
+
+
+def _profile_arg(owner):
+    profile = os.path.join(tempfile.gettempdir(), f"{PROFILE_PREFIX}{owner}_test")
+    return f"-env:UserInstallation=file://{profile}"
+
+
+def _killed(process):
+    try:
+        return process.wait(timeout=5) == -9
+    except subprocess.TimeoutExpired:
+        return False
+
+
+def test_recorded_soffice_of_a_dead_run_is_killed(pid_dir, dead_pid, fake_soffice):
+    orphan = fake_soffice()
+    pid_dir.mkdir()
+    (pid_dir / str(orphan.pid)).write_text(str(dead_pid))
+
+    assert kill_orphaned_soffice() == 1
+    assert _killed(orphan)
+    assert not (pid_dir / str(orphan.pid)).exists()
+
+
+def test_profile_of_a_dead_run_is_killed(pid_dir, dead_pid, fake_soffice):
+    orphan = fake_soffice(_profile_arg(dead_pid))
+
+    assert kill_orphaned_soffice() == 1
+    assert _killed(orphan)
+
+
+def test_live_runs_and_other_instances_are_left_alone(pid_dir, fake_soffice):
+    ours = fake_soffice(_profile_arg(os.getpid()))
+    recorded = fake_soffice()
+    pid_dir.mkdir()
+    (pid_dir / str(recorded.pid)).write_text(str(os.getpid()))
+    users = fake_soffice()
+
+    assert kill_orphaned_soffice() == 0
+    assert ours.poll() is None and recorded.poll() is None and users.poll() is None
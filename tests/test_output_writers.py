@@ -0,0 +1,107 @@
+import csv
+import json
+
+import pytest
+
+import extract_packing_lists
+from extract_packing_lists import extract_and_print_xls_data
+from output_writers import infer_format, open_output_writer
+from packing_records import PackingListRecord
+
+PACKING_LISTS = 8
+COLOR_ROWS = 18
+
+
+def _po_numbers(records):
+    return sorted(record["PO_Number"] for record in records)
+
+
+def test_infer_format():
+    assert infer_format("out.jsonl") == "ndjson"
+    assert infer_format("out.txt", "csv") == "csv"
+    with pytest.raises(ValueError):
+        infer_format("out.txt")
+
+
+@pytest.mark.parametrize("filename", ["records.json", "records.ndjson"])
+def test_json_outputs(demo_dir, tmp_path, capsys, filename):
+    output = tmp_path / filename
+    extract_and_print_xls_data(demo_dir, str(output))
+
+    with open(output, encoding="utf-8") as f:
+        if filename.endswith(".ndjson"):
+            records = [json.loads(line) for line in f]
+        else:
+            records = json.load(f)
+
+    assert len(records) == PACKING_LISTS
+    assert _po_numbers(records)[0] == "IT50811-CA"
+    first = min(records, key=lambda record: record["PO_Number"])
+    assert first["Colors"] == ["G011", "JBLK", "RHT"]
+    assert first["Cartons"] == [6, 6, 6]
+    assert first["Pieces"] == [79, 112, 78]
+    # The shape the scripts have always printed
+    assert first == {"PO_Number": "IT50811-CA", "Colors": ["G011", "JBLK", "RHT"], "Cartons": [6, 6, 6],
+                     "Pieces": [79, 112, 78], "Total_Gross_Weight": ["17.900", "23.950", "18.100"]}
+    # The records went to the file, not to stdout
+    assert "PO_Number" not in capsys.readouterr().out
+
+
+def test_csv_output_has_one_row_per_color(demo_dir, tmp_path):
+    output = tmp_path / "records.csv"
+    extract_and_print_xls_data(demo_dir, str(output))
+
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    assert len(rows) == COLOR_ROWS
+    assert len({row["PO_Number"] for row in rows}) == PACKING_LISTS
+    jblk = [row for row in rows if row["PO_Number"] == "IT50811-CA" and row["Color"] == "JBLK"]
+    assert len(jblk) == 1
+    assert (jblk[0]["Cartons"], jblk[0]["Pieces"], float(jblk[0]["Total_Gross_Weight"])) == ("6", "112", 23.95)
+    assert jblk[0]["Source_File"] == "IT50811-CA.xls"
+
+
+def test_csv_keeps_records_without_colors(tmp_path):
+    output = tmp_path / "records.csv"
+    writer = open_output_writer(str(output))
+    writer.write_records([PackingListRecord("IT00001-CA", [], [], [], [], "IT00001-CA.xls", "Slip")])
+    writer.close()
+
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["PO_Number"], row["Color"]) for row in rows] == [("IT00001-CA", "")]
+
+
+def test_parquet_output(demo_dir, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output = tmp_path / "records.parquet"
+    extract_and_print_xls_data(demo_dir, str(output))
+
+    table = pq.read_table(output)
+    assert table.num_rows == COLOR_ROWS
+    assert str(table.schema.field("Cartons").type) == "int64"
+
+
+def test_interrupted_run_leaves_a_complete_file(demo_dir, tmp_path, monkeypatch):
+    extract = extract_packing_lists.workbook_packing_slip_records
+
+    def interrupted(workbook, filename, format_po=False):
+        yield from extract(workbook, filename, format_po)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(extract_packing_lists, "workbook_packing_slip_records", interrupted)
+    output = tmp_path / "records.json"
+    with pytest.raises(KeyboardInterrupt):
+        extract_and_print_xls_data(demo_dir, str(output))
+
+    with open(output, encoding="utf-8") as f:
+        assert len(json.load(f)) == 1
+
+
+def test_record_dict_round_trip():
+    record = PackingListRecord("IT50811-CA", ["G011"], [6], [79], [17.9], "IT50811-CA.xls", "Guess Pack Slip ")
+
+    assert PackingListRecord.from_dict(record.to_dict()).gross_weights == [17.9]
+    full = PackingListRecord.from_dict(record.to_dict(full=True))
+    assert (full.gross_weights, full.source_file, full.sheet) == ([17.9], "IT50811-CA.xls", "Guess Pack Slip ")
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from packing_records import PackingListRecord
+from reconcile import (Invoice, InvoiceLine, discrepancy_count, folder_records, read_invoice_pdf,
+                       read_invoice_workbook, reconcile)
+
+INVOICE = "FFL-COM-INV-8202-GUESS-CA-SEA-FOB-EXPEDITORS-DBBL-24-01"
+
+LINE_FIELDS = ("po_number", "style", "pieces", "cartons", "unit_price", "amount")
+
+
+def _lines(invoice):
+    # Workbook cells keep float noise such as 825.8299999999999
+    return [tuple(round(value, 2) if isinstance(value, float) else value
+                  for value in (getattr(line, field) for field in LINE_FIELDS))
+            for line in invoice.lines]
+
+
+def _totals(invoice):
+    return {field: round(value, 2) for field, value in invoice.totals.items()}
+
+
+@pytest.fixture
+def pdf_invoice(demo_dir):
+    return read_invoice_pdf(os.path.join(demo_dir, f"{INVOICE}.pdf"))
+
+
+def test_invoice_pdf_reads_like_its_workbook(demo_dir, pdf_invoice):
+    workbook_invoice = read_invoice_workbook(os.path.join(demo_dir, f"{INVOICE}.xlsm"))
+
+    assert len(pdf_invoice.lines) == 9
+    assert _lines(pdf_invoice) == _lines(workbook_invoice)
+    assert _totals(pdf_invoice) == _totals(workbook_invoice) == {
+        "pieces": 4505, "cartons": 134, "amount": 15251.08, "gross_weight": 966.77, "net_weight": 825.59}
+
+
+def test_demo_shipment_reconciles(demo_dir, pdf_invoice):
+    report = reconcile([pdf_invoice], folder_records(demo_dir))
+
+    assert report["matched_pos"] == 8
+    assert discrepancy_count(report) == 0
+    assert [total["field"] for total in report["totals"]] == ["pieces", "cartons", "gross_weight"]
+
+
+def test_exp_form_compares_totals_only(repo_dir, demo_dir):
+    exp_form = read_invoice_pdf(os.path.join(repo_dir, "exp_006533(inv-8202).pdf"))
+
+    report = reconcile([exp_form], folder_records(demo_dir))
+
+    assert report["invoice_lines"] == 0
+    assert report["extra_pos"] == []
+    assert report["totals"] == [{"field": "pieces", "invoice": 4505, "packing_list": 4505, "difference": 0,
+                                 "ok": True}]
+
+
+def _invoice(lines, **totals):
+    invoice = Invoice("INV-1.xlsm")
+    for po_number, pieces, cartons in lines:
+        invoice.lines.append(InvoiceLine(po_number, "STYLE", pieces, cartons, source_file=invoice.source_file))
+    invoice.totals.update(totals)
+    return invoice
+
+
+def _record(po_number, pieces, cartons, weights):
+    return PackingListRecord(po_number, [f"C{index}" for index in range(len(pieces))], cartons, pieces,
+                             weights, f"{po_number}.xls", "Slip")
+
+
+@pytest.fixture
+def records():
+    return [
+        _record("IT51093-CA", [1000, 420], [15, 7], [200.0, 57.0]),
+        _record("IT51095-CA", [800], [22], [160.0]),
+        _record("IT51099-CA", [50], [2], [10.0]),
+    ]
+
+
+def test_mismatched_quantities(records):
+    invoice = _invoice([("IT-51093", 1420, 22), ("IT51095", 803, 21)])
+
+    report = reconcile([invoice], records[:2])
+
+    assert report["matched_pos"] == 2
+    assert [(entry["po"], entry["field"], entry["invoice"], entry["packing_list"], entry["difference"])
+            for entry in report["mismatches"]] == [("IT-51095", "pieces", 803, 800, -3),
+                                                   ("IT-51095", "cartons", 21, 22, 1)]
+    assert report["mismatches"][0]["packing_lists"] == "IT51095-CA.xls"
+
+
+def test_missing_and_extra_pos(records):
+    invoice = _invoice([("IT-51093", 1420, 22), ("IT-51100", 10, 1)])
+
+    report = reconcile([invoice], records)
+
+    assert report["mismatches"] == []
+    assert report["missing_pos"] == [{"po": "IT-51100", "pieces": 10, "cartons": 1, "invoices": "INV-1.xlsm"}]
+    assert [(entry["po"], entry["pieces"], entry["cartons"]) for entry in report["extra_pos"]] == [
+        ("IT-51095", 800, 22), ("IT-51099", 50, 2)]
+    assert discrepancy_count(report) == 3
+
+
+def test_mismatched_totals(records):
+    invoice = _invoice([("IT-51093", 1420, 22), ("IT-51095", 800, 22), ("IT-51099", 50, 2)],
+                       pieces=2270, cartons=47, gross_weight=427.2)
+
+    report = reconcile([invoice], records)
+    totals = {total["field"]: total for total in report["totals"]}
+
+    assert totals["pieces"]["ok"]
+    assert (totals["cartons"]["difference"], totals["cartons"]["ok"]) == (-1, False)
+    # Gross weight is allowed to differ by the rounding tolerance
+    assert totals["gross_weight"]["ok"]
+    assert not reconcile([invoice], records, weight_tolerance=0.1)["totals"][2]["ok"]
+    assert discrepancy_count(report) == 1
@@ -0,0 +1,45 @@
+import multiprocessing
+import os
+
+import pytest
+
+import run_report
+from packing_list_all_processes import extract_packing_slip_file, map_files
+
+
+@pytest.fixture
+def report(monkeypatch):
+    monkeypatch.setattr(run_report, "_profile_target", None)
+    monkeypatch.setattr(run_report, "_profile_dir", None)
+    report = run_report.start_report()
+    yield report
+    run_report._active = None
+
+
+@pytest.fixture(params=["fork", "spawn"])
+def start_method(request):
+    previous = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method(request.param, force=True)
+    yield request.param
+    multiprocessing.set_start_method(previous, force=True)
+
+
+def test_steps_and_counters_merge():
+    report = run_report.RunReport()
+    report.add_step("row_scan", 0.5, 0.25)
+    report.merge({"row_scan": {"count": 2, "wall_seconds": 1.0, "cpu_seconds": 0.5}}, {"ocr_tiles": 3})
+
+    assert report.steps["row_scan"] == {"count": 3, "wall_seconds": 1.5, "cpu_seconds": 0.75}
+    assert report.counters == {"ocr_tiles": 3}
+
+
+def test_pool_workers_report_back(report, start_method, demo_dir, tmp_path):
+    run_report.set_profile_target("IT50811-CA.xls", str(tmp_path))
+    jobs = [(os.path.join(demo_dir, filename), None) for filename in ("IT50811-CA.xls", "IT51088-CA.xls")]
+
+    results = list(map_files(extract_packing_slip_file, jobs, workers=2))
+
+    assert [records[0].source_file for records in results] == ["IT50811-CA.xls", "IT51088-CA.xls"]
+    assert report.steps["extract_packing_slip_file"]["count"] == 2
+    assert report.steps["row_scan"]["count"] == 2
+    assert os.listdir(tmp_path) == ["IT50811-CA.xls.extract_packing_slip_file.prof"]
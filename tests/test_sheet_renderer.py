@@ -0,0 +1,52 @@
+import datetime
+import os
+
+import pdfplumber
+import pytest
+
+from merge_packing_lists import packing_slip_pages
+from sheet_renderer import NativeSheetRenderer, RenderError, format_date, format_number
+
+SHEET = "Guess Pack Slip "
+
+
+@pytest.fixture
+def rendered(demo_dir, tmp_path):
+    with NativeSheetRenderer() as renderer:
+        pdf_path, sheets_only = renderer.convert_sheets(os.path.join(demo_dir, "IT50811-CA.xls"),
+                                                        str(tmp_path), [SHEET])
+    assert sheets_only
+    return pdf_path
+
+
+def test_packing_slip_sheet_renders_to_one_landscape_page(rendered):
+    with pdfplumber.open(rendered) as pdf:
+        assert len(pdf.pages) == 1
+        page = pdf.pages[0]
+        assert page.width > page.height
+        text = page.extract_text()
+
+    assert text.startswith("PACKING SLIP")
+    assert "SEA IT50811-CA XBOP02K3SA1 G011 JBLK RHT 18 269" in text
+    assert "SUB TOTAL G011 5 15 22 23 10 4 6 79 17.90 13.00" in text
+    assert "SUB TOTAL JBLK 7 17 32 32 16 8 6 112 23.95 18.71" in text
+    # Only the requested sheet is drawn
+    assert "Summary Breakdown" not in text
+
+
+def test_rendered_page_passes_the_packing_slip_filter(rendered):
+    assert packing_slip_pages(rendered) == [0]
+
+
+def test_unreadable_workbook_raises_render_error(tmp_path):
+    broken = tmp_path / "IT00000-CA.xls"
+    broken.write_bytes(b"not a workbook")
+
+    with pytest.raises(RenderError):
+        NativeSheetRenderer().convert(str(broken), str(tmp_path))
+
+
+def test_number_and_date_formats():
+    assert format_number(1234.5, "#,##0.00") == "1,234.50"
+    assert format_number(0.25, "0%") == "25%"
+    assert format_date(datetime.datetime(2025, 10, 6, 9, 23), "dd-mmm-yy") == "06-Oct-25"
@@ -0,0 +1,66 @@
+import os
+import subprocess
+
+import pytest
+
+from soffice_converter import SofficeConverter
+
+
+class BrokenDaemon:
+    """
+    Stands in for a SofficeDaemon whose conversion fails
+    """
+
+    def __init__(self, responsive):
+        self._responsive = responsive
+        self.killed = False
+
+    def convert(self, input_path, outdir, sheets=None):
+        raise RuntimeError("Binary URP bridge disposed during call")
+
+    def responsive(self, timeout=5):
+        return self._responsive
+
+    def kill(self):
+        self.killed = True
+
+
+def _converter_with(daemon, tmp_path, monkeypatch):
+    # No soffice on PATH: the per-file fallback fails and no replacement starts
+    monkeypatch.setenv("PATH", str(tmp_path))
+    converter = SofficeConverter(timeout=None, retries=0)
+    converter.use_daemon = True
+    converter._started = True
+    converter._daemons.append(daemon)
+    converter._idle.put(daemon)
+    return converter
+
+
+def _workbook(tmp_path):
+    path = tmp_path / "IT00000-CA.xls"
+    path.write_bytes(b"")
+    return str(path)
+
+
+def test_broken_daemon_is_replaced(tmp_path, monkeypatch):
+    daemon = BrokenDaemon(responsive=False)
+    converter = _converter_with(daemon, tmp_path, monkeypatch)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        converter.convert(_workbook(tmp_path), str(tmp_path))
+
+    assert daemon.killed
+    assert daemon not in converter._daemons
+    assert converter._idle.empty()
+    assert not converter.use_daemon
+
+
+def test_daemon_survives_a_bad_workbook(tmp_path, monkeypatch):
+    daemon = BrokenDaemon(responsive=True)
+    converter = _converter_with(daemon, tmp_path, monkeypatch)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        converter.convert(_workbook(tmp_path), str(tmp_path))
+
+    assert not daemon.killed
+    assert converter._idle.get_nowait() is daemon
@@ -0,0 +1,87 @@
+import datetime
+import os
+
+import openpyxl
+import pytest
+from openpyxl.utils.datetime import CALENDAR_MAC_1904
+
+from extract_packing_lists import workbook_packing_slip_records
+from workbook_reader import open_workbook
+
+
+def _rows(path):
+    with open_workbook(path) as workbook:
+        return {name: list(workbook.iter_rows(idx)) for idx, name in enumerate(workbook.sheet_names)}
+
+
+def _save_as_xlsx(rows_by_sheet, path):
+    """
+    Write the values read from a workbook into a new .xlsx file
+    """
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for name, rows in rows_by_sheet.items():
+        sheet = book.create_sheet(name)
+        for row in rows:
+            sheet.append([None if value == '' else value for value in row])
+    book.save(path)
+
+
+@pytest.fixture
+def xls_path(demo_dir):
+    return os.path.join(demo_dir, "IT50811-CA.xls")
+
+
+def _normalise(rows):
+    """
+    openpyxl pads every row to the sheet width where xlrd stops at the last
+    cell, and it saves floats to 15 significant digits
+    """
+    normalised = []
+    for row in rows:
+        row = [round(value, 9) if isinstance(value, float) else value for value in row]
+        while row and row[-1] == '':
+            row.pop()
+        normalised.append(row)
+    return normalised
+
+
+def test_xlsx_rows_match_xls(xls_path, tmp_path):
+    xls_rows = _rows(xls_path)
+    xlsx_path = str(tmp_path / "IT50811-CA.xlsx")
+    _save_as_xlsx(xls_rows, xlsx_path)
+
+    xlsx_rows = _rows(xlsx_path)
+    assert list(xlsx_rows) == list(xls_rows)
+    for name in xls_rows:
+        assert _normalise(xlsx_rows[name]) == _normalise(xls_rows[name])
+
+
+def test_xlsx_records_match_xls(xls_path, tmp_path):
+    xlsx_path = str(tmp_path / "IT50811-CA.xlsx")
+    _save_as_xlsx(_rows(xls_path), xlsx_path)
+
+    with open_workbook(xls_path) as workbook:
+        expected = [record.to_dict() for record in workbook_packing_slip_records(workbook, "IT50811-CA")]
+    with open_workbook(xlsx_path) as workbook:
+        actual = [record.to_dict() for record in workbook_packing_slip_records(workbook, "IT50811-CA")]
+
+    assert expected
+    assert actual == expected
+
+
+@pytest.mark.parametrize("epoch, origin", [
+    (None, datetime.datetime(1899, 12, 30)),
+    (CALENDAR_MAC_1904, datetime.datetime(1904, 1, 1)),
+])
+def test_dates_become_serial_numbers(tmp_path, epoch, origin):
+    when = datetime.datetime(2024, 1, 15, 12, 0)
+    book = openpyxl.Workbook()
+    if epoch is not None:
+        book.epoch = epoch
+    book.active.append([when, datetime.time(6, 0), True, 3])
+    path = str(tmp_path / "dates.xlsx")
+    book.save(path)
+
+    row = _rows(path)[book.active.title][0]
+    assert row == [(when - origin) / datetime.timedelta(days=1), 0.25, 1, 3.0]
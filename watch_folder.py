@@ -0,0 +1,163 @@
+import os
+import logging
+import sys
+import time
+import errno
+import select
+import struct
+
+from job_planner import is_workbook
+
+log = logging.getLogger(__name__)
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _snapshot(folder):
+    """
+    {filename: (size, mtime_ns)} for every watched workbook in folder
+    """
+    snapshot = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and is_workbook(entry.name):
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class PollingWatcher:
+    """
+    Portable watcher that rescans the folder on every call
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def wait(self, timeout):
+        # Nothing to wake up on; the caller rescans after the timeout
+        time.sleep(timeout)
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux watcher that sleeps until the kernel reports a change in the folder
+    """
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout):
+        """
+        Block up to timeout seconds; True if any watched workbook was touched
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        touched = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+
+            offset = 0
+            while offset < len(data):
+                _, event_mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b"\0").decode(errors="replace")
+                offset += name_length
+                if event_mask & IN_Q_OVERFLOW or is_workbook(name):
+                    touched = True
+        return touched
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(folder):
+    """
+    inotify on Linux, polling everywhere else or if inotify is unavailable
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            log.warning(f"⚠️ inotify unavailable, falling back to polling: {e}")
+    return PollingWatcher(folder)
+
+
+def watch_folder(folder, process_changes, interval=2.0, settle=3.0, process_existing=True):
+    """
+    Call process_changes(changed, removed) with sorted lists of workbook
+    names whenever workbooks in folder are added, modified or deleted.
+
+    A file counts as changed only once its size and mtime have stayed the
+    same for `settle` seconds, so half-copied files are not picked up.
+    Runs until interrupted.
+    """
+    watcher = make_watcher(folder)
+    known = {} if process_existing else _snapshot(folder)
+    pending = {}  # filename -> (size, mtime_ns, first seen with that stat)
+
+    log.info(f"👀 Watching {folder} ({type(watcher).__name__})")
+    try:
+        while True:
+            now = time.monotonic()
+            current = _snapshot(folder)
+
+            for name in list(pending):
+                if name not in current:
+                    pending.pop(name)
+
+            for name, stat in current.items():
+                if known.get(name) == stat:
+                    pending.pop(name, None)
+                elif name not in pending or pending[name][:2] != stat:
+                    pending[name] = stat + (now,)
+
+            ready = sorted(name for name, (size, mtime, seen) in pending.items()
+                           if now - seen >= settle and current.get(name) == (size, mtime))
+            removed = sorted(name for name in known if name not in current)
+
+            if ready or removed:
+                for name in ready:
+                    known[name] = pending.pop(name)[:2]
+                for name in removed:
+                    known.pop(name)
+                process_changes(ready, removed)
+
+            # Wake early on inotify events, but keep ticking while files settle
+            watcher.wait(min(interval, settle) if pending else interval)
+    except KeyboardInterrupt:
+        log.info("\n🛑 Stopped watching")
+    finally:
+        watcher.close()
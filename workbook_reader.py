@@ -0,0 +1,122 @@
+import os
+import datetime
+
+import run_report
+
+XLS_EXTENSIONS = (".xls",)
+OOXML_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def _xlrd_value(value, epoch=None):
+    """
+    Map an openpyxl cell value onto what xlrd's row_values would give for
+    the same cell, so the extractor sees identical rows for either format.
+    Dates, datetimes and times become xlrd's serial day numbers, counted
+    from the workbook's epoch.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        from openpyxl.utils.datetime import CALENDAR_WINDOWS_1900, to_excel
+
+        return float(to_excel(value, epoch or CALENDAR_WINDOWS_1900))
+    return value
+
+
+class XlsWorkbook:
+    """
+    Legacy .xls workbook read with xlrd; sheets are parsed on demand
+    """
+
+    def __init__(self, path):
+        import xlrd
+
+        self.book = xlrd.open_workbook(path, on_demand=True)
+        self.sheet_names = self.book.sheet_names()
+
+    def iter_rows(self, sheet_idx):
+        sheet = self.book.sheet_by_index(sheet_idx)
+        for row_idx in range(sheet.nrows):
+            yield sheet.row_values(row_idx)
+
+    def release_sheet(self, sheet_idx):
+        self.book.unload_sheet(sheet_idx)
+
+    def close(self):
+        self.book.release_resources()
+
+
+class OoxmlWorkbook:
+    """
+    .xlsx/.xlsm workbook streamed with openpyxl in read-only mode: rows are
+    parsed from the sheet XML as they are iterated, no cell model is built
+    """
+
+    def __init__(self, path):
+        import openpyxl
+
+        self.book = openpyxl.load_workbook(path, read_only=True, data_only=True, keep_links=False)
+        # Chartsheets have no rows, so only worksheets are exposed
+        self.sheets = self.book.worksheets
+        self.sheet_names = [sheet.title for sheet in self.sheets]
+
+    def iter_rows(self, sheet_idx):
+        for row in self.sheets[sheet_idx].iter_rows(values_only=True):
+            yield [_xlrd_value(value, self.book.epoch) for value in row]
+
+    def release_sheet(self, sheet_idx):
+        # Read-only sheets keep nothing in memory between rows
+        pass
+
+    def close(self):
+        self.book.close()
+
+
+class WorkbookReader:
+    """
+    One interface over .xls (xlrd) and .xlsx/.xlsm (openpyxl read-only).
+    Rows come back as lists of xlrd-style values: '' for empty cells and
+    floats for numbers.
+    """
+
+    def __init__(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension in XLS_EXTENSIONS:
+            self._workbook = XlsWorkbook(path)
+        elif extension in OOXML_EXTENSIONS:
+            self._workbook = OoxmlWorkbook(path)
+        else:
+            raise ValueError(f"Unsupported workbook format: {extension or path}")
+
+        self.sheet_names = self._workbook.sheet_names
+        self.nsheets = len(self.sheet_names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def iter_rows(self, sheet_idx):
+        """
+        Yield the rows of one sheet, top to bottom
+        """
+        return self._workbook.iter_rows(sheet_idx)
+
+    def release_sheet(self, sheet_idx):
+        self._workbook.release_sheet(sheet_idx)
+
+    def close(self):
+        self._workbook.close()
+
+
+def open_workbook(path):
+    """
+    Open any supported workbook; raises ValueError for other formats
+    """
+    with run_report.step("workbook_open"):
+        return WorkbookReader(path)